@@ -0,0 +1,317 @@
+"""
+Offline benchmark harness for the monitoring and compliance pipelines.
+
+Each scenario runs against the local Gemini/GNews stand-in server, so
+results depend only on the code and the load settings:
+
+    country     - country alert pipeline fed by the simulator's load mode
+    reputation  - reputation alert pipeline fed by the simulator's load mode
+    compliance  - compliance prompt packing + Gemini analysis at a fixed request rate
+    all         - every scenario, each in its own process
+
+Results (throughput, per-stage latency percentiles, Gemini client and
+stand-in stats) are printed and saved to benchmarks/results/.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import threading
+import subprocess
+import urllib.request
+from datetime import datetime
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+BENCH_DIR = Path(__file__).resolve().parent
+PROJECT_ROOT = BENCH_DIR.parent
+RESULTS_DIR = BENCH_DIR / "results"
+
+SERVICE_DIRS = {
+    "country": PROJECT_ROOT / "country_monitoring" / "country_level_threats",
+    "reputation": PROJECT_ROOT / "reputation_monitoring",
+    "compliance": PROJECT_ROOT / "compliance_engine",
+}
+PIPELINE_MODULES = {
+    "country": "alert_pipeline",
+    "reputation": "reputation_alert_pipeline",
+}
+# Inputs the pipelines read relative to their working directory
+PIPELINE_INPUTS = {
+    "country": ["data"],
+    "reputation": ["data", "mock_reputational_news.jsonl"],
+}
+
+POLL_SEC = 1.0
+
+
+# ---------------------------------
+# Helpers
+# ---------------------------------
+def percentiles(samples: list[float]) -> dict:
+    ordered = sorted(samples)
+    if not ordered:
+        return {"count": 0, "p50": None, "p95": None, "p99": None, "max": None}
+
+    def pick(q):
+        return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))], 4)
+
+    return {"count": len(ordered), "p50": pick(0.50), "p95": pick(0.95), "p99": pick(0.99), "max": round(ordered[-1], 4)}
+
+
+def fetch_json(url: str):
+    try:
+        with urllib.request.urlopen(url, timeout=5) as response:
+            return json.loads(response.read())
+    except Exception as e:
+        return {"error": str(e)}
+
+
+def start_standin(port: int) -> subprocess.Popen:
+    """Launch the stand-in server (configured through STANDIN_* env) and wait until it answers"""
+    process = subprocess.Popen(
+        [sys.executable, str(BENCH_DIR / "standin_server.py"), "--port", str(port)],
+        env=os.environ.copy(),
+    )
+    for _ in range(50):
+        if "error" not in fetch_json(f"http://127.0.0.1:{port}/health"):
+            return process
+        time.sleep(0.1)
+    process.terminate()
+    raise RuntimeError("Stand-in server did not start")
+
+
+def point_services_at(standin_url: str):
+    """Route every Gemini and GNews call of this process to the stand-in"""
+    os.environ["GEMINI_BASE_URL"] = standin_url
+    os.environ["GNEWS_BASE_URL"] = standin_url
+    os.environ.setdefault("GEMINI_API_KEY", "standin")
+    os.environ.setdefault("G_NEWS_API_KEY", "standin")
+
+
+def save_result(result: dict) -> Path:
+    RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+    path = RESULTS_DIR / f"{result['scenario']}-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json"
+    path.write_text(json.dumps(result, indent=2), encoding="utf-8")
+    return path
+
+
+def print_latency_table(title: str, histograms: dict):
+    print(f"\n{title}")
+    print(f"  {'stage':<18}{'count':>8}{'p50':>10}{'p95':>10}{'p99':>10}")
+    for name, h in histograms.items():
+        if not h.get("count"):
+            continue
+        print(f"  {name:<18}{h['count']:>8}{h['p50']:>10.3f}{h['p95']:>10.3f}{h['p99']:>10.3f}")
+
+
+# ---------------------------------
+# Monitoring pipeline scenarios
+# ---------------------------------
+def run_pipeline_scenario(args) -> dict:
+    """Run one alert pipeline in-process, push load through it and wait until it settles"""
+    service_dir = SERVICE_DIRS[args.scenario]
+    workdir = Path(tempfile.mkdtemp(prefix=f"bench-{args.scenario}-"))
+    stream_dir = workdir / "stream"
+    stream_dir.mkdir()
+    for name in PIPELINE_INPUTS[args.scenario]:
+        if (service_dir / name).exists():
+            (workdir / name).symlink_to(service_dir / name)
+
+    # Both the pipeline reader and the simulator are configured through env at import
+    os.environ["STREAM_FORMAT"] = "jsonl"
+    os.environ["SUPPLY_CHAIN_STREAM_DIR"] = str(stream_dir)
+    os.environ["STREAM_DIR"] = str(stream_dir)
+    os.environ.setdefault("STREAM_BATCH_SIZE", "50")
+    # Read by Pathway at import; each run starts cold, without snapshots
+    os.environ["PATHWAY_THREADS"] = str(args.threads)
+    os.environ["PATHWAY_PERSISTENCE"] = "off"
+    # Generated rows copy the sample contract dates, which all end by 2026-09-01
+    os.environ.setdefault("CONTRACT_AS_OF", "2025-12-01")
+
+    sys.path.insert(0, str(service_dir))
+    sys.path.insert(0, str(PROJECT_ROOT / "simulate_data_stream"))
+    os.chdir(workdir)
+
+    import pathway as pw
+    __import__(PIPELINE_MODULES[args.scenario])
+    import latency_metrics
+    import gemini_client
+    import stream_simulator
+
+    print(f"📂 Working directory: {workdir} ({args.threads} Pathway worker thread(s))")
+    engine = threading.Thread(
+        target=pw.run, kwargs={"monitoring_level": pw.MonitoringLevel.NONE}, daemon=True
+    )
+    engine.start()
+
+    started = time.monotonic()
+    load = stream_simulator.generate_load(args.rate, args.total, args.profile, args.suppliers, args.seed)
+
+    # Wait for the pipeline to drain: every row ingested and no stage moving for --settle seconds
+    last_counts, last_change = None, time.monotonic()
+    while time.monotonic() - started < args.timeout:
+        snapshot = latency_metrics.snapshot()
+        counts = {name: h["count"] for name, h in snapshot["stages"].items()}
+        if counts != last_counts:
+            last_counts, last_change = counts, time.monotonic()
+        elif counts.get("ingested", 0) >= load["rows"] and time.monotonic() - last_change >= args.settle:
+            break
+        time.sleep(POLL_SEC)
+    else:
+        print(f"⚠️ Timed out after {args.timeout}s before the pipeline settled")
+
+    elapsed = time.monotonic() - started
+    snapshot = latency_metrics.snapshot()
+    ingested = snapshot["stages"]["ingested"]["count"]
+    return {
+        "scenario": args.scenario,
+        "config": vars(args),
+        "load": load,
+        "elapsed_sec": round(elapsed, 2),
+        "ingested_rows_per_sec": round(ingested / elapsed, 2) if elapsed else 0.0,
+        "threats_written": snapshot["stages"]["written"]["count"],
+        "latency": snapshot,
+        "gemini": gemini_client.get_stats(),
+        "standin": fetch_json(f"{args.standin_url}/stats"),
+    }
+
+
+# ---------------------------------
+# Compliance scenario
+# ---------------------------------
+def synthetic_chunks(topic: str, n: int) -> list[dict]:
+    """Retrieved-chunk stand-ins, shaped like retrieve_relevant_chunks output"""
+    sentence = (
+        f"{topic} must provide registration documents, beneficial ownership details, "
+        f"sanctions screening evidence and audited financial statements before contract signature. "
+    )
+    return [
+        {"text": sentence * (3 + i % 4), "source": f"{topic} document {i + 1}", "score": 1.0 / (i + 1)}
+        for i in range(n)
+    ]
+
+
+def run_compliance_scenario(args) -> dict:
+    """
+    Drive generate_analysis (token-budgeted prompt packing + Gemini call) at a fixed
+    request rate. Retrieval needs the Drive-backed document stores, so it is replaced
+    with synthetic retrieved chunks.
+    """
+    sys.path.insert(0, str(SERVICE_DIRS["compliance"]))
+    from app import PathwayComplianceAnalyzer
+    import gemini_client
+
+    # Skip __init__: it connects to Google Drive and builds the document stores
+    analyzer = PathwayComplianceAnalyzer.__new__(PathwayComplianceAnalyzer)
+    analyzer.gemini_api_key = os.environ["GEMINI_API_KEY"]
+
+    policy = synthetic_chunks("Compliance policy", 10)
+    latencies, errors = [], 0
+    lock = threading.Lock()
+
+    def analyze(i: int):
+        nonlocal errors
+        buyer, supplier = f"Buyer {i % 7}", f"Supplier {i % 13}"
+        start = time.perf_counter()
+        result = analyzer.generate_analysis(
+            buyer, synthetic_chunks(buyer, 8), supplier, synthetic_chunks(supplier, 8), policy
+        )
+        with lock:
+            latencies.append(time.perf_counter() - start)
+            if result.startswith("ERROR:"):
+                errors += 1
+
+    print(f"🏋️ Compliance load: {args.requests} analyses at {args.request_rate:g}/s, concurrency {args.concurrency}")
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        for i in range(args.requests):
+            # Open-loop arrivals at a fixed rate
+            time.sleep(max(0.0, started + i / args.request_rate - time.monotonic()))
+            pool.submit(analyze, i)
+    elapsed = time.monotonic() - started
+
+    return {
+        "scenario": "compliance",
+        "config": vars(args),
+        "elapsed_sec": round(elapsed, 2),
+        "analyses_per_sec": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "errors": errors,
+        "latency": {"durations": {"analysis": percentiles(latencies)}},
+        "gemini": gemini_client.get_stats(),
+        "standin": fetch_json(f"{args.standin_url}/stats"),
+    }
+
+
+# ---------------------------------
+# Entry point
+# ---------------------------------
+def parse_args():
+    parser = argparse.ArgumentParser(description="Offline pipeline benchmarks against the Gemini/GNews stand-in")
+    parser.add_argument("--scenario", choices=["country", "reputation", "compliance", "all"], default="all")
+    parser.add_argument("--standin-url", default=os.getenv("STANDIN_URL", ""),
+                        help="use a running stand-in server instead of starting one")
+    parser.add_argument("--standin-port", type=int, default=int(os.getenv("STANDIN_PORT", "8090")))
+    # Monitoring pipelines (simulator load mode)
+    parser.add_argument("--rate", type=float, default=50, help="stream rows per second")
+    parser.add_argument("--total", type=int, default=500, help="stream rows to emit")
+    parser.add_argument("--profile", choices=["steady", "ramp", "burst"], default="steady")
+    parser.add_argument("--suppliers", type=int, default=0, help="synthetic supplier count (0 = master suppliers)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--settle", type=float, default=15, help="seconds without progress before the run ends")
+    parser.add_argument("--threads", type=int, default=int(os.getenv("PATHWAY_THREADS", "1")),
+                        help="Pathway worker threads for the pipeline scenarios")
+    parser.add_argument("--timeout", type=float, default=600, help="maximum seconds per pipeline run")
+    # Compliance
+    parser.add_argument("--requests", type=int, default=50, help="compliance analyses to run")
+    parser.add_argument("--request-rate", type=float, default=5, help="compliance analyses started per second")
+    parser.add_argument("--concurrency", type=int, default=8, help="compliance analyses in flight")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+
+    if args.scenario == "all":
+        # Pathway builds one global dataflow per process, so each scenario gets its own
+        argv, skip = [], False
+        for arg in sys.argv[1:]:
+            if skip:
+                skip = False
+            elif arg == "--scenario":
+                skip = True
+            elif not arg.startswith("--scenario="):
+                argv.append(arg)
+        status = 0
+        for scenario in ("country", "reputation", "compliance"):
+            status |= subprocess.call([sys.executable, __file__, "--scenario", scenario, *argv])
+        sys.exit(status)
+
+    standin = None
+    if not args.standin_url:
+        standin = start_standin(args.standin_port)
+        args.standin_url = f"http://127.0.0.1:{args.standin_port}"
+    point_services_at(args.standin_url)
+
+    try:
+        if args.scenario == "compliance":
+            result = run_compliance_scenario(args)
+        else:
+            result = run_pipeline_scenario(args)
+    finally:
+        if standin:
+            standin.terminate()
+
+    print_latency_table(f"📊 {args.scenario} - stage latency since emission (s)", result["latency"].get("stages", {}))
+    print_latency_table(f"📊 {args.scenario} - step durations (s)", result["latency"].get("durations", {}))
+    print(f"\n✅ Saved {save_result(result)}")
+
+    # The Pathway engine thread never returns on its own
+    sys.stdout.flush()
+    os._exit(0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,322 @@
+"""
+Local stand-in for the Gemini and GNews REST APIs.
+
+Serves generateContent, streamGenerateContent, embedContent,
+batchEmbedContents and GNews /api/v4/search with configurable latency and
+error rates. Responses are derived from a hash of the request, so the same
+input always gets the same answer and benchmark runs are repeatable.
+
+Point the services at it with:
+    GEMINI_BASE_URL=http://localhost:8090
+    GNEWS_BASE_URL=http://localhost:8090
+"""
+import os
+import re
+import json
+import math
+import time
+import random
+import hashlib
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+# ---------------------------------
+# Config (env defaults, see --help)
+# ---------------------------------
+STANDIN_PORT = int(os.getenv("STANDIN_PORT", "8090"))
+STANDIN_LATENCY_MS = float(os.getenv("STANDIN_LATENCY_MS", "150"))        # base latency per call
+STANDIN_JITTER_MS = float(os.getenv("STANDIN_JITTER_MS", "50"))           # +/- uniform jitter
+STANDIN_TOKEN_LATENCY_MS = float(os.getenv("STANDIN_TOKEN_LATENCY_MS", "2"))  # per generated token
+STANDIN_ERROR_RATE = float(os.getenv("STANDIN_ERROR_RATE", "0"))          # fraction answered with 503
+STANDIN_RATE_LIMIT_RATE = float(os.getenv("STANDIN_RATE_LIMIT_RATE", "0"))  # fraction answered with 429
+STANDIN_YES_RATIO = float(os.getenv("STANDIN_YES_RATIO", "0.5"))          # YES share for YES/NO prompts
+STANDIN_SEED = int(os.getenv("STANDIN_SEED", "42"))
+
+EMBEDDING_DIM = 768
+DEFAULT_ANSWER_TOKENS = 200
+STREAM_CHUNK_TOKENS = 20
+
+NEWS_KEYWORDS = [
+    "strike", "sanction", "war", "conflict", "shutdown",
+    "port", "earthquake", "flood", "cyclone", "fire",
+]
+NEWS_TEMPLATES = [
+    ("{Kw} disrupts factory operations in {country}",
+     "Manufacturing output in {country} has been hit after a {kw} forced several plants to halt production."),
+    ("Port congestion in {country} after {kw}",
+     "Cargo handling at major ports in {country} slowed sharply following the {kw}, delaying outbound shipments."),
+    ("{country} logistics networks strained by {kw}",
+     "Road and rail freight across {country} is running behind schedule because of the {kw}."),
+    ("Analysts debate {kw} rhetoric in {country} politics",
+     "Commentators in {country} traded fire over policy, with no impact reported on industry or transport."),
+]
+
+WORDS = (
+    "supplier risk contract shipment policy review compliance port factory region "
+    "audit delay assessment exposure mitigation inventory logistics verification"
+).split()
+
+# Paths look like /v1beta/models/gemini-2.0-flash:generateContent (version optional)
+MODEL_PATH = re.compile(r"/models/([^/:]+):(\w+)$")
+
+
+# ---------------------------------
+# Deterministic responses
+# ---------------------------------
+def digest(text: str) -> bytes:
+    return hashlib.sha256(text.encode("utf-8")).digest()
+
+
+def hash_fraction(text: str) -> float:
+    """Stable value in [0, 1) for a piece of text"""
+    return int.from_bytes(digest(text)[:8], "big") / 2 ** 64
+
+
+def prompt_text(body: dict) -> str:
+    parts = []
+    for content in body.get("contents", []):
+        for part in content.get("parts", []):
+            parts.append(part.get("text", ""))
+    return "\n".join(parts)
+
+
+def generate_text(prompt: str, max_tokens: int) -> str:
+    """Answer a prompt deterministically, shaped like the real callers expect"""
+    if "YES or NO" in prompt:
+        return "YES" if hash_fraction(prompt) < STANDIN_YES_RATIO else "NO"
+
+    rng = random.Random(digest(prompt))
+    n_words = min(max_tokens, DEFAULT_ANSWER_TOKENS)
+    body = " ".join(rng.choice(WORDS) for _ in range(n_words))
+
+    if "RISK LEVEL:" in prompt:
+        # Compliance report format parsed by compliance_engine/api.py
+        risk = rng.choice(["HIGH", "MEDIUM", "LOW"])
+        decision = {"HIGH": "REJECT", "MEDIUM": "CONDITIONAL APPROVAL", "LOW": "APPROVE"}[risk]
+        return (
+            f"RISK LEVEL: {risk}\nRisk Justification: {body[:120]}\n\n"
+            f"POLICY VIOLATIONS DETECTED:\n1. {body[:80]}\n\n"
+            f"FINAL DECISION: {decision}\nDecision Rationale: {body[120:300]}\n\n"
+            f"EXECUTIVE SUMMARY:\n{body[300:]}"
+        )
+    return body
+
+
+def embed_text(text: str) -> list[float]:
+    """Hashed bag-of-words vector, so similar texts get similar embeddings"""
+    vector = [0.0] * EMBEDDING_DIM
+    for word in re.findall(r"[a-z0-9]+", text.lower()):
+        h = int.from_bytes(digest(word)[:4], "big")
+        vector[h % EMBEDDING_DIM] += 1.0 if h & 0x80000000 else -1.0
+    norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+    return [v / norm for v in vector]
+
+
+def search_news(query: str, max_articles: int) -> list[dict]:
+    """GNews-shaped articles for a query like 'China (strike OR war ...)'"""
+    country = query.split(" (")[0].strip() or "Unknown"
+    rng = random.Random(digest(query))
+    articles = []
+    for i in range(max_articles):
+        kw = rng.choice(NEWS_KEYWORDS)
+        title, description = rng.choice(NEWS_TEMPLATES)
+        fields = {"kw": kw, "Kw": kw.capitalize(), "country": country}
+        articles.append({
+            "title": title.format(**fields),
+            "description": description.format(**fields),
+            "content": description.format(**fields),
+            "url": f"https://standin.local/news/{digest(query).hex()[:12]}/{i}",
+            "image": None,
+            "publishedAt": "2026-01-08T09:30:00Z",
+            "source": {"name": "Stand-in News", "url": "https://standin.local"},
+        })
+    return articles
+
+
+# ---------------------------------
+# Fault injection and stats
+# ---------------------------------
+_rng = random.Random(STANDIN_SEED)
+_lock = threading.Lock()
+_stats = {"requests": 0, "errors_injected": 0, "rate_limited": 0, "by_method": {}}
+
+
+def next_fault():
+    """None, 429 or 503 - drawn from a seeded sequence so runs are repeatable"""
+    with _lock:
+        draw = _rng.random()
+    if draw < STANDIN_RATE_LIMIT_RATE:
+        return 429
+    if draw < STANDIN_RATE_LIMIT_RATE + STANDIN_ERROR_RATE:
+        return 503
+    return None
+
+
+def simulated_delay(tokens: int = 0) -> float:
+    with _lock:
+        jitter = _rng.uniform(-STANDIN_JITTER_MS, STANDIN_JITTER_MS)
+    return max(0.0, STANDIN_LATENCY_MS + jitter + tokens * STANDIN_TOKEN_LATENCY_MS) / 1000
+
+
+def count(method: str, fault=None):
+    with _lock:
+        _stats["requests"] += 1
+        _stats["by_method"][method] = _stats["by_method"].get(method, 0) + 1
+        if fault == 429:
+            _stats["rate_limited"] += 1
+        elif fault:
+            _stats["errors_injected"] += 1
+
+
+# ---------------------------------
+# HTTP handler
+# ---------------------------------
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        # Per-request logging would dominate at benchmark rates
+        pass
+
+    def send_json(self, status: int, payload: dict, headers=None):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def send_fault(self, fault: int):
+        if fault == 429:
+            self.send_json(429, {"error": {"code": 429, "status": "RESOURCE_EXHAUSTED"}}, {"Retry-After": "1"})
+        else:
+            self.send_json(503, {"error": {"code": 503, "status": "UNAVAILABLE"}})
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == "/health":
+            return self.send_json(200, {"status": "healthy"})
+        if url.path == "/stats":
+            with _lock:
+                return self.send_json(200, json.loads(json.dumps(_stats)))
+        if url.path == "/api/v4/search":
+            params = parse_qs(url.query)
+            fault = next_fault()
+            count("gnews_search", fault)
+            time.sleep(simulated_delay())
+            if fault:
+                return self.send_fault(fault)
+            articles = search_news(params.get("q", [""])[0], int(params.get("max", ["10"])[0]))
+            # GNews `from`: only articles published at or after it
+            since = params.get("from", [""])[0]
+            articles = [a for a in articles if a["publishedAt"] >= since]
+            return self.send_json(200, {"totalArticles": len(articles), "articles": articles})
+        self.send_json(404, {"error": f"unknown path {url.path}"})
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        length = int(self.headers.get("Content-Length") or 0)
+        body = json.loads(self.rfile.read(length) or b"{}")
+
+        match = MODEL_PATH.search(url.path)
+        if not match:
+            return self.send_json(404, {"error": f"unknown path {url.path}"})
+        model, method = match.groups()
+
+        fault = next_fault()
+        count(method, fault)
+
+        if method == "embedContent":
+            time.sleep(simulated_delay())
+            if fault:
+                return self.send_fault(fault)
+            return self.send_json(200, {"embedding": {"values": embed_text(prompt_text({"contents": [body.get("content", {})]}))}})
+
+        if method == "batchEmbedContents":
+            requests_ = body.get("requests", [])
+            time.sleep(simulated_delay())
+            if fault:
+                return self.send_fault(fault)
+            return self.send_json(200, {"embeddings": [
+                {"values": embed_text(prompt_text({"contents": [r.get("content", {})]}))} for r in requests_
+            ]})
+
+        if method in ("generateContent", "streamGenerateContent"):
+            max_tokens = int(body.get("generationConfig", {}).get("maxOutputTokens", DEFAULT_ANSWER_TOKENS))
+            text = generate_text(prompt_text(body), max_tokens)
+            tokens = len(text.split())
+            if method == "generateContent":
+                time.sleep(simulated_delay(tokens))
+                if fault:
+                    return self.send_fault(fault)
+                return self.send_json(200, candidate(text, model))
+            time.sleep(simulated_delay())
+            if fault:
+                return self.send_fault(fault)
+            return self.stream_text(text, model)
+
+        self.send_json(404, {"error": f"unsupported method {method}"})
+
+    def stream_text(self, text: str, model: str):
+        """Server-sent events, one chunk per STREAM_CHUNK_TOKENS words"""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        words = text.split(" ")
+        for i in range(0, len(words), STREAM_CHUNK_TOKENS):
+            piece = " ".join(words[i:i + STREAM_CHUNK_TOKENS])
+            if i:
+                piece = " " + piece
+            time.sleep(STREAM_CHUNK_TOKENS * STANDIN_TOKEN_LATENCY_MS / 1000)
+            self.wfile.write(f"data: {json.dumps(candidate(piece, model))}\n\n".encode("utf-8"))
+            self.wfile.flush()
+        self.close_connection = True
+
+
+def candidate(text: str, model: str) -> dict:
+    return {
+        "candidates": [{"content": {"role": "model", "parts": [{"text": text}]}, "finishReason": "STOP"}],
+        "modelVersion": model,
+    }
+
+
+def serve(port: int):
+    server = ThreadingHTTPServer(("0.0.0.0", port), StandInHandler)
+    server.daemon_threads = True
+    print(f"🧪 Gemini/GNews stand-in listening on http://0.0.0.0:{port}")
+    print(
+        f"⏱️ latency={STANDIN_LATENCY_MS:.0f}±{STANDIN_JITTER_MS:.0f}ms "
+        f"(+{STANDIN_TOKEN_LATENCY_MS:g}ms/token) | error_rate={STANDIN_ERROR_RATE:g} | "
+        f"rate_limit_rate={STANDIN_RATE_LIMIT_RATE:g} | seed={STANDIN_SEED}"
+    )
+    server.serve_forever()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Local Gemini/GNews stand-in server")
+    parser.add_argument("--port", type=int, default=STANDIN_PORT)
+    parser.add_argument("--latency-ms", type=float, default=STANDIN_LATENCY_MS, help="base latency per call")
+    parser.add_argument("--jitter-ms", type=float, default=STANDIN_JITTER_MS, help="uniform +/- jitter")
+    parser.add_argument("--token-latency-ms", type=float, default=STANDIN_TOKEN_LATENCY_MS, help="extra latency per generated token")
+    parser.add_argument("--error-rate", type=float, default=STANDIN_ERROR_RATE, help="fraction of calls answered with 503")
+    parser.add_argument("--rate-limit-rate", type=float, default=STANDIN_RATE_LIMIT_RATE, help="fraction of calls answered with 429")
+    parser.add_argument("--yes-ratio", type=float, default=STANDIN_YES_RATIO, help="share of YES/NO prompts answered YES")
+    parser.add_argument("--seed", type=int, default=STANDIN_SEED)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    STANDIN_LATENCY_MS = args.latency_ms
+    STANDIN_JITTER_MS = args.jitter_ms
+    STANDIN_TOKEN_LATENCY_MS = args.token_latency_ms
+    STANDIN_ERROR_RATE = args.error_rate
+    STANDIN_RATE_LIMIT_RATE = args.rate_limit_rate
+    STANDIN_YES_RATIO = args.yes_ratio
+    _rng.seed(args.seed)
+    serve(args.port)
@@ -3,7 +3,7 @@ import json
 from typing import Optional
 from fastapi import FastAPI, UploadFile, File, Form, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel
 import shutil
 from pathlib import Path
@@ -274,6 +274,71 @@ async def get_suppliers():
 # ANALYSIS ENDPOINTS
 # ============================================================================
 
+def record_analysis(request: AnalyzeRequest, result: str) -> dict:
+    """Parse an analysis report, cache the supplier score and return the API result payload"""
+    # Parse result to extract key info
+    risk_level = "medium"
+    if "RISK LEVEL: HIGH" in result:
+        risk_level = "high"
+    elif "RISK LEVEL: LOW" in result:
+        risk_level = "low"
+    
+    # Calculate score based on risk
+    score_map = {"high": 55, "medium": 75, "low": 90}
+    score = score_map.get(risk_level, 75)
+    
+    # Extract violations
+    violations = []
+    if "POLICY VIOLATIONS DETECTED:" in result:
+        try:
+            v_section = result.split("POLICY VIOLATIONS DETECTED:")[1]
+            v_section = v_section.split("MANDATORY INFORMATION GAPS:")[0]
+            for line in v_section.strip().split('\n'):
+                line = line.strip()
+                if line and (line[0].isdigit() or line.startswith('-')):
+                    violations.append(line)
+        except:
+            pass
+    
+    # Build evidence list
+    evidence = [
+        "Buyer verification completed",
+        "Supplier screening completed",
+        "Policy compliance check performed"
+    ]
+    
+    if violations:
+        evidence.append(f"{len(violations)} policy violations detected")
+    
+    # CACHE THE RESULTS
+    import datetime
+    analysis_cache[request.supplier_name] = {
+        "score": score,
+        "risk": risk_level,
+        "violations": violations,
+        "timestamp": datetime.datetime.now().isoformat(),
+        "buyer_name": request.buyer_name
+    }
+    
+    # Save cache to disk
+    save_cache()
+    print(f"✓ Analysis cached for {request.supplier_name}")
+    
+    return {
+        "score": score,
+        "risk": risk_level,
+        "explanation": result,
+        "evidence": evidence,
+        "violations": violations if violations else [],
+        "raw_analysis": result
+    }
+
+
+def sse_event(payload: dict) -> str:
+    """Format a payload as a server-sent event"""
+    return f"data: {json.dumps(payload)}\n\n"
+
+
 @app.post("/api/analyze/batch")
 async def analyze_batch(request: AnalyzeRequest):
     """Run compliance analysis and cache results"""
@@ -298,64 +363,9 @@ async def analyze_batch(request: AnalyzeRequest):
         
         print("\n✓ Analysis complete")
         
-        # Parse result to extract key info
-        risk_level = "medium"
-        if "RISK LEVEL: HIGH" in result:
-            risk_level = "high"
-        elif "RISK LEVEL: LOW" in result:
-            risk_level = "low"
-        
-        # Calculate score based on risk
-        score_map = {"high": 55, "medium": 75, "low": 90}
-        score = score_map.get(risk_level, 75)
-        
-        # Extract violations
-        violations = []
-        if "POLICY VIOLATIONS DETECTED:" in result:
-            try:
-                v_section = result.split("POLICY VIOLATIONS DETECTED:")[1]
-                v_section = v_section.split("MANDATORY INFORMATION GAPS:")[0]
-                for line in v_section.strip().split('\n'):
-                    line = line.strip()
-                    if line and (line[0].isdigit() or line.startswith('-')):
-                        violations.append(line)
-            except:
-                pass
-        
-        # Build evidence list
-        evidence = [
-            "Buyer verification completed",
-            "Supplier screening completed",
-            "Policy compliance check performed"
-        ]
-        
-        if violations:
-            evidence.append(f"{len(violations)} policy violations detected")
-        
-        # CACHE THE RESULTS
-        import datetime
-        analysis_cache[request.supplier_name] = {
-            "score": score,
-            "risk": risk_level,
-            "violations": violations,
-            "timestamp": datetime.datetime.now().isoformat(),
-            "buyer_name": request.buyer_name
-        }
-        
-        # Save cache to disk
-        save_cache()
-        print(f"✓ Analysis cached for {request.supplier_name}")
-        
         return JSONResponse({
             "success": True,
-            "result": {
-                "score": score,
-                "risk": risk_level,
-                "explanation": result,
-                "evidence": evidence,
-                "violations": violations if violations else [],
-                "raw_analysis": result
-            },
+            "result": record_analysis(request, result),
             "buyer_name": request.buyer_name,
             "supplier_name": request.supplier_name
         })
@@ -367,6 +377,54 @@ async def analyze_batch(request: AnalyzeRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/api/analyze/stream")
+async def analyze_stream(request: AnalyzeRequest):
+    """Run compliance analysis and stream the report as server-sent events.
+
+    Emits {"type": "chunk", "text": ...} events while Gemini generates, then a final
+    {"type": "result", ...} event with the same payload as /api/analyze/batch. A stream
+    that fails, even partway, ends with an {"type": "error"} event and is not cached.
+    """
+    if not analyzer:
+        raise HTTPException(
+            status_code=400, 
+            detail="System not configured. Please upload Google Drive credentials first."
+        )
+    
+    def event_stream():
+        pieces = []
+        try:
+            for text in analyzer.analyze_transaction_stream(
+                request.buyer_name,
+                request.supplier_name
+            ):
+                pieces.append(text)
+                yield sse_event({"type": "chunk", "text": text})
+            
+            # Only a finished report is parsed and cached
+            result = "".join(pieces)
+            if not result.strip():
+                yield sse_event({"type": "error", "detail": "ERROR: Empty response"})
+                return
+            
+            yield sse_event({
+                "type": "result",
+                "success": True,
+                "result": record_analysis(request, result),
+                "buyer_name": request.buyer_name,
+                "supplier_name": request.supplier_name
+            })
+        except Exception as e:
+            print(f"❌ Streaming analysis error: {e}")
+            yield sse_event({"type": "error", "detail": str(e)})
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 @app.delete("/api/analysis/{supplier_name}")
 async def delete_analysis(supplier_name: str):
     """Delete cached analysis for a supplier"""
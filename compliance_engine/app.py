@@ -4,16 +4,28 @@ import json
 import re
 import subprocess
 from dotenv import load_dotenv
-import requests
 load_dotenv()
 import pathway as pw
 from pathway.xpacks.llm.document_store import DocumentStore
 from pathway.xpacks.llm.parsers import ParseUnstructured
 from pathway.xpacks.llm.splitters import TokenCountSplitter
-from pathway.xpacks.llm.embedders import GeminiEmbedder
+from pathway.xpacks.llm.embedders import GeminiEmbedder, LiteLLMEmbedder
 from pathway.xpacks.llm.llms import LiteLLMChat
 from pathway.xpacks.llm.question_answering import BaseRAGQuestionAnswerer
 from pathway.stdlib.indexing import BruteForceKnnFactory, TantivyBM25Factory, HybridIndexFactory
+import gemini_client
+import pathway_config
+from pathway_config import udf_cache
+from context_packer import pack_context, split_text_into_chunks, POLICY_TOKEN_BUDGET, COMPANY_TOKEN_BUDGET
+
+GEMINI_MODEL = "gemini-2.0-flash-exp"
+ANALYSIS_GENERATION_CONFIG = {"temperature": 0.1, "maxOutputTokens": 3000}
+
+# Optional Gemini endpoint override (e.g. the benchmarks/ stand-in server)
+GEMINI_BASE_URL = os.getenv("GEMINI_BASE_URL")
+LITELLM_ENDPOINT = {"api_base": GEMINI_BASE_URL.rstrip("/") + "/v1beta"} if GEMINI_BASE_URL else {}
+
+POLICY_QUERY = "compliance policy rules requirements violations sanctions fraud anti-corruption identity verification"
 
 class PathwayComplianceAnalyzer:
     def __init__(self):
@@ -42,14 +54,16 @@ class PathwayComplianceAnalyzer:
             object_id=self.company_folder_id,
             service_user_credentials_file=self.credentials_file,
             mode="streaming",
-            with_metadata=True
+            with_metadata=True,
+            name="company_docs",
         )
         
         threat_docs = pw.io.gdrive.read(
             object_id=self.threat_folder_id,
             service_user_credentials_file=self.credentials_file,
             mode="streaming",
-            with_metadata=True
+            with_metadata=True,
+            name="threat_docs",
         )
         
         print("Connected to Google Drive folders")
@@ -81,11 +95,21 @@ class PathwayComplianceAnalyzer:
         
         # Setup embedder
         print("Setting up Gemini embedder...")
-        embedder = GeminiEmbedder(
-            model="models/embedding-001",
-            cache_strategy=pw.udfs.DefaultCache(),
-            retry_strategy=pw.udfs.ExponentialBackoffRetryStrategy(max_retries=3)
-        )
+        if GEMINI_BASE_URL:
+            # GeminiEmbedder's SDK has no endpoint override; LiteLLM calls the same REST API
+            embedder = LiteLLMEmbedder(
+                model="gemini/embedding-001",
+                api_key=self.gemini_api_key,
+                cache_strategy=udf_cache(),
+                retry_strategy=pw.udfs.ExponentialBackoffRetryStrategy(max_retries=3),
+                **LITELLM_ENDPOINT
+            )
+        else:
+            embedder = GeminiEmbedder(
+                model="models/embedding-001",
+                cache_strategy=udf_cache(),
+                retry_strategy=pw.udfs.ExponentialBackoffRetryStrategy(max_retries=3)
+            )
         
         # Setup retriever factory with hybrid search
         print("Configuring hybrid search (KNN + BM25)...")
@@ -121,8 +145,9 @@ class PathwayComplianceAnalyzer:
         llm = LiteLLMChat(
             model="gemini/gemini-2.0-flash-exp",
             retry_strategy=pw.udfs.ExponentialBackoffRetryStrategy(max_retries=2),
-            cache_strategy=pw.udfs.DefaultCache(),
-            temperature=0.1
+            cache_strategy=udf_cache(),
+            temperature=0.1,
+            **LITELLM_ENDPOINT
         )
         
         # Create question answerers for retrieval
@@ -164,12 +189,15 @@ Provide all relevant information from the context."""
     def _run_pathway(self):
         """Run Pathway computation in background"""
         try:
-            pw.run()
+            pathway_config.run()
         except Exception as e:
             print(f"Pathway computation error: {e}")
     
     def retrieve_relevant_chunks(self, query, qa_system, top_k=5):
-        """Retrieve relevant document chunks using Pathway's RAG"""
+        """Retrieve relevant document chunks using Pathway's RAG.
+
+        Returns a list of {"text", "source", "score"} dicts (higher score is more relevant).
+        """
         print(f"   Searching for: {query[:60]}...")
         
         try:
@@ -186,28 +214,40 @@ Provide all relevant information from the context."""
                 # Fallback: use the QA system but extract just the context
                 print("   Using QA system fallback...")
                 response = qa_system.answer(query)
-                return str(response)
+                return split_text_into_chunks(str(response), query)
             
-            # Format results
-            context_parts = []
+            # Normalize results
+            chunks = []
             for idx, result in enumerate(results, 1):
                 if isinstance(result, dict):
                     chunk_text = result.get('text', result.get('chunk', str(result)))
                     metadata = result.get('metadata', {})
                     source = metadata.get('path', metadata.get('name', 'Unknown'))
+                    if 'score' in result:
+                        score = float(result['score'])
+                    elif 'dist' in result:
+                        # Distances are lower-is-better
+                        score = -float(result['dist'])
+                    else:
+                        score = 1.0 / idx
                 else:
                     chunk_text = str(result)
                     source = 'Document'
+                    score = 1.0 / idx
                 
-                context_parts.append(f"[Source {idx}: {source}]\n{chunk_text}\n")
+                chunks.append({"text": chunk_text, "source": source, "score": score})
             
-            return "\n".join(context_parts) if context_parts else self._fallback_retrieval(query, qa_system)
+            return chunks if chunks else self._fallback_retrieval(query, qa_system)
         
         except Exception as e:
             print(f"   Retrieval error: {e}")
             return self._fallback_retrieval(query, qa_system)
     
     def _fallback_retrieval(self, query, qa_system):
+        """Direct Google Drive retrieval, split into lexically scored chunks"""
+        return split_text_into_chunks(self._fallback_retrieval_text(query, qa_system), query)
+    
+    def _fallback_retrieval_text(self, query, qa_system):
         print("   Using fallback direct retrieval...")
         from google.oauth2 import service_account
         from googleapiclient.discovery import build
@@ -305,14 +345,13 @@ Provide all relevant information from the context."""
         """Get compliance policy using Pathway retrieval"""
         print("\nRetrieving compliance policy...")
         
-        policy_query = "compliance policy rules requirements violations sanctions fraud anti-corruption identity verification"
         policy_context = self.retrieve_relevant_chunks(
-            policy_query, 
+            POLICY_QUERY, 
             self.threat_qa, 
             top_k=10
         )
         
-        print(f"Policy retrieved ({len(policy_context)} chars)")
+        print(f"Policy retrieved ({len(policy_context)} chunks)")
         return policy_context
     
     def get_company_content(self, company_name):
@@ -329,7 +368,7 @@ Provide all relevant information from the context."""
             top_k=8
         )
         
-        print(f"   Retrieved ({len(company_context)} chars)")
+        print(f"   Retrieved ({len(company_context)} chunks)")
         return company_context
     
     def analyze_transaction(self, buyer_name, supplier_name):
@@ -361,13 +400,17 @@ Provide all relevant information from the context."""
         
         return analysis
     
-    def generate_analysis(self, buyer_name, buyer_info, supplier_name, supplier_info, policy_text):
-        """Generate analysis using Gemini"""
+    def build_analysis_prompt(self, buyer_name, buyer_info, supplier_name, supplier_info, policy_text):
+        """Build the Gemini compliance prompt.
+
+        Context arguments are retrieved chunk lists (or plain text); each section is
+        packed into its own token budget, most relevant chunks first.
+        """
         
-        # Truncate to fit in context
-        policy_snippet = policy_text[:6000] if len(policy_text) > 6000 else policy_text
-        buyer_snippet = buyer_info[:4000] if len(buyer_info) > 4000 else buyer_info
-        supplier_snippet = supplier_info[:4000] if len(supplier_info) > 4000 else supplier_info
+        # Pack each section into its token budget
+        policy_snippet = pack_context(policy_text, POLICY_TOKEN_BUDGET, POLICY_QUERY)
+        buyer_snippet = pack_context(buyer_info, COMPANY_TOKEN_BUDGET, buyer_name)
+        supplier_snippet = pack_context(supplier_info, COMPANY_TOKEN_BUDGET, supplier_name)
         
         prompt = f"""You are a senior compliance analyst conducting a thorough risk assessment. Analyze this transaction strictly against the provided compliance policy.
 
@@ -439,28 +482,54 @@ Decision Rationale: [2-3 sentences explaining why this decision was made based o
 EXECUTIVE SUMMARY:
 [Concise 2-3 sentence summary of key findings and recommendation]"""
         
+        return prompt
+    
+    def generate_analysis(self, buyer_name, buyer_info, supplier_name, supplier_info, policy_text):
+        """Generate analysis using Gemini"""
+        prompt = self.build_analysis_prompt(buyer_name, buyer_info, supplier_name, supplier_info, policy_text)
+        
         try:
-            url = "https://generativelanguage.googleapis.com/v1beta/models/gemini-2.0-flash-exp:generateContent"
-            
-            response = requests.post(
-                f"{url}?key={self.gemini_api_key}",
-                json={
-                    "contents": [{"parts": [{"text": prompt}]}],
-                    "generationConfig": {"temperature": 0.1, "maxOutputTokens": 3000}
-                },
+            text = gemini_client.generate_content(
+                prompt,
+                model=GEMINI_MODEL,
+                generation_config=ANALYSIS_GENERATION_CONFIG,
+                api_version="v1beta",
+                api_key=self.gemini_api_key,
                 timeout=60
             )
-            
-            if response.status_code == 200:
-                result = response.json()
-                text = result.get("candidates", [{}])[0].get("content", {}).get("parts", [{}])[0].get("text", "")
-                return text if text else "ERROR: Empty response"
-            else:
-                return f"ERROR: API {response.status_code}"
-                
+            return text if text else "ERROR: Empty response"
         except Exception as e:
             return f"ERROR: {str(e)}"
     
+    def generate_analysis_stream(self, buyer_name, buyer_info, supplier_name, supplier_info, policy_text):
+        """
+        Stream the Gemini analysis, yielding text pieces as they are generated.
+        Errors propagate even when the stream fails partway, so callers never
+        mistake a truncated report for a finished one.
+        """
+        prompt = self.build_analysis_prompt(buyer_name, buyer_info, supplier_name, supplier_info, policy_text)
+        
+        yield from gemini_client.stream_generate_content(
+            prompt,
+            model=GEMINI_MODEL,
+            generation_config=ANALYSIS_GENERATION_CONFIG,
+            api_version="v1beta",
+            api_key=self.gemini_api_key
+        )
+    
+    def analyze_transaction_stream(self, buyer_name, supplier_name):
+        """Like analyze_transaction, but yields the Gemini output as it is generated"""
+        print(f"\nStreaming analysis: {buyer_name} <-> {supplier_name}")
+        policy_text = self.get_policy_content()
+        buyer_info = self.get_company_content(buyer_name)
+        supplier_info = self.get_company_content(supplier_name)
+        
+        yield from self.generate_analysis_stream(
+            buyer_name, buyer_info,
+            supplier_name, supplier_info,
+            policy_text
+        )
+    
     def parse_and_display(self, buyer_name, supplier_name, result):
         """Parse and display results in structured format"""
         print("\n\n" + "="*80)
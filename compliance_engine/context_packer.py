@@ -0,0 +1,162 @@
+# context_packer.py
+import os
+import re
+
+# ============================================================
+# CONFIG
+# ============================================================
+# Token budgets per prompt section (override via environment)
+POLICY_TOKEN_BUDGET = int(os.getenv("POLICY_TOKEN_BUDGET", "1200"))
+COMPANY_TOKEN_BUDGET = int(os.getenv("COMPANY_TOKEN_BUDGET", "800"))
+
+# Chunks sharing at least this fraction of their word shingles are duplicates
+DUPLICATE_THRESHOLD = float(os.getenv("CONTEXT_DUPLICATE_THRESHOLD", "0.8"))
+
+SHINGLE_SIZE = 5
+
+# ============================================================
+# TOKEN COUNTING
+# ============================================================
+try:
+    import tiktoken
+    _ENCODING = tiktoken.get_encoding("cl100k_base")
+except Exception:
+    _ENCODING = None
+
+
+def count_tokens(text: str) -> int:
+    """Count tokens with tiktoken when available, else estimate ~4 chars per token"""
+    if not text:
+        return 0
+    if _ENCODING is not None:
+        return len(_ENCODING.encode(text, disallowed_special=()))
+    return (len(text) + 3) // 4
+
+
+def _truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Cut text to at most max_tokens, preferring a sentence or line boundary"""
+    if max_tokens <= 0:
+        return ""
+    if _ENCODING is not None:
+        tokens = _ENCODING.encode(text, disallowed_special=())
+        if len(tokens) <= max_tokens:
+            return text
+        cut = _ENCODING.decode(tokens[:max_tokens])
+    else:
+        if len(text) <= max_tokens * 4:
+            return text
+        cut = text[:max_tokens * 4]
+
+    boundary = max(cut.rfind("\n"), cut.rfind(". "))
+    if boundary > len(cut) // 2:
+        cut = cut[:boundary + 1]
+    return cut.rstrip()
+
+# ============================================================
+# CHUNK HELPERS
+# ============================================================
+def _normalize(text: str) -> list[str]:
+    return re.findall(r"[a-z0-9]+", text.lower())
+
+
+def _shingles(text: str) -> set:
+    words = _normalize(text)
+    if len(words) < SHINGLE_SIZE:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+
+
+def _is_duplicate(shingles: set, kept: list[set]) -> bool:
+    """A chunk is a duplicate if most of it is already covered by a kept chunk"""
+    if not shingles:
+        return True
+    for other in kept:
+        overlap = len(shingles & other)
+        if overlap / len(shingles) >= DUPLICATE_THRESHOLD:
+            return True
+    return False
+
+
+def lexical_score(query: str, text: str) -> float:
+    """Fraction of query terms found in text - used when the retriever gives no score"""
+    query_terms = {w for w in _normalize(query) if len(w) > 3}
+    if not query_terms:
+        return 0.0
+    text_terms = set(_normalize(text))
+    return len(query_terms & text_terms) / len(query_terms)
+
+
+def split_text_into_chunks(text: str, query: str = "", source: str = "Document") -> list[dict]:
+    """
+    Split an unstructured context blob (e.g. fallback retrieval output) into
+    paragraph chunks, scored by lexical overlap with the query.
+    """
+    chunks = []
+    current_source = source
+    for block in re.split(r"\n\s*\n", text):
+        block = block.strip()
+        if not block:
+            continue
+        # Keep track of "[file name]" / "[Source N: ...]" headers
+        header = re.match(r"^\[(?:Source \d+: )?([^\]]+)\]\s*\n?", block)
+        if header:
+            current_source = header.group(1)
+            block = block[header.end():].strip()
+            if not block:
+                continue
+        chunks.append({
+            "text": block,
+            "source": current_source,
+            "score": lexical_score(query, block) if query else 0.0,
+        })
+    return chunks
+
+# ============================================================
+# PACKING
+# ============================================================
+def pack_context(chunks, token_budget: int, query: str = "") -> str:
+    """
+    Fill a token budget with the most relevant retrieved chunks.
+
+    Chunks are dicts with "text", "source" and "score" (higher is better).
+    They are ranked by score, near-duplicates are dropped and chunks are
+    added until the budget is used up. A chunk that does not fit is
+    truncated if a meaningful piece of it fits, and skipped otherwise. A plain string is accepted too and is
+    split into paragraph chunks first.
+    """
+    if isinstance(chunks, str):
+        chunks = split_text_into_chunks(chunks, query)
+
+    ranked = sorted(
+        (c for c in chunks if str(c.get("text", "")).strip()),
+        key=lambda c: c.get("score", 0.0),
+        reverse=True,
+    )
+
+    kept_shingles = []
+    parts = []
+    used = 0
+    for chunk in ranked:
+        text = str(chunk["text"]).strip()
+        shingles = _shingles(text)
+        if _is_duplicate(shingles, kept_shingles):
+            continue
+
+        header = f"[{chunk.get('source', 'Document')}]\n"
+        cost = count_tokens(header + text) + 1
+        remaining = token_budget - used
+        if cost > remaining:
+            # Only worth truncating if a meaningful piece still fits; otherwise
+            # skip it, a smaller lower-ranked chunk may still fit whole
+            if remaining - count_tokens(header) < 50:
+                continue
+            text = _truncate_to_tokens(text, remaining - count_tokens(header) - 1)
+            cost = count_tokens(header + text) + 1
+
+        kept_shingles.append(shingles)
+        parts.append(header + text)
+        used += cost
+        if used >= token_budget:
+            break
+
+    return "\n\n".join(parts)
@@ -1,21 +1,48 @@
 # alert_pipeline.py
 import os
+import re
 import json
+import asyncio
+import functools
 import requests
 import pathway as pw
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 from supply_chain_stream import supply_chain_table
-from llm_validator import is_real_supply_chain_threat
+from llm_validator import is_real_supply_chain_threat, GEMINI_TIMEOUT_SEC
+from gemini_client import GeminiError, retry_budget_sec
+import cassette
+from log_sink import LogSink
+from threat_store import ThreatStore, THREAT_DB
+from live_views import get_view
+from news_scheduler import NewsScheduler, NewsArticleSchema
+from story_index import story_index, normalize
+from pathway_config import udf_cache, state_path, view_state_path, RESUMING
+from latency_metrics import observe_stage, timed
+from risk_scoreboard import build_scoreboard, risk_board, event_time
+from exposure_index import build_exposure, exposure_index
+from geo_index import build_supplier_geo, route_by_geo
+from contract_clock import active_contracts
 
 # ============================================================
 # CONFIG
 # ============================================================
 load_dotenv()
 GNEWS_API_KEY = os.getenv("G_NEWS_API_KEY")  # Match your .env variable name
+GNEWS_BASE_URL = os.getenv("GNEWS_BASE_URL", "https://gnews.io").rstrip("/")  # stand-in server for offline runs
+GNEWS_MAX_ARTICLES = int(os.getenv("GNEWS_MAX_ARTICLES", "10"))  # per poll; the free plan caps this at 10
 FAKE_NEWS_FILE = "data/synthetic_country_disaster.jsonl"
 LOG_FILE = "output/threat_detection.log"
 
+# Async UDF stages: calls in flight, per-call timeout and retries (see README)
+NEWS_FETCH_CAPACITY = int(os.getenv("NEWS_FETCH_CAPACITY", "16"))
+NEWS_FETCH_TIMEOUT_SEC = float(os.getenv("NEWS_FETCH_TIMEOUT_SEC", "30"))
+LLM_VALIDATE_CAPACITY = int(os.getenv("LLM_VALIDATE_CAPACITY", os.getenv("GEMINI_MAX_CONCURRENCY", "8")))
+# Per attempt; longer than gemini_client's own retries, so a call is never abandoned while it still retries
+LLM_VALIDATE_TIMEOUT_SEC = float(os.getenv("LLM_VALIDATE_TIMEOUT_SEC", "0")) or retry_budget_sec(GEMINI_TIMEOUT_SEC) + 30
+UDF_MAX_RETRIES = int(os.getenv("UDF_MAX_RETRIES", "2"))
+
 RISK_KEYWORDS = [
     "strike", "sanction", "war", "conflict", "shutdown", 
     "port", "earthquake", "flood", "cyclone", "fire"
@@ -26,21 +53,15 @@ RISK_KEYWORDS = [
 # ============================================================
 os.makedirs("output", exist_ok=True)
 
-# Initialize log file
-with open(LOG_FILE, "w", encoding="utf-8") as f:
-    f.write(f"=== Threat Detection Log Started at {datetime.now()} ===\n\n")
+# Initialize log file (written in batches by a background thread, see log_sink.py)
+log_sink = LogSink(LOG_FILE, header=f"=== Threat Detection Log Started at {datetime.now()} ===\n\n")
 
-def log(message: str):
-    """Write to both console and log file"""
-    timestamp = datetime.now().strftime("%H:%M:%S")
-    log_msg = f"[{timestamp}] {message}"
-    print(log_msg, flush=True)  # Force flush to see immediately
-    try:
-        with open(LOG_FILE, "a", encoding="utf-8") as f:
-            f.write(log_msg + "\n")
-            f.flush()  # Force write to disk
-    except Exception as e:
-        print(f"ERROR writing to log: {e}")
+def log(message: str, *args, level: str = "INFO", **fields):
+    """
+    Write to both console and log file without blocking the caller.
+    %-style args are formatted lazily; extra keyword fields go into JSON logs.
+    """
+    log_sink.emit(level, message, args, fields)
 
 # ============================================================
 # HELPERS
@@ -50,7 +71,6 @@ def keyword_match(text: str):
     text = text.lower()
     for kw in RISK_KEYWORDS:
         # Use word boundaries to avoid matching "war" in "Warsaw" or "award"
-        import re
         pattern = r'\b' + re.escape(kw) + r'\b'
         if re.search(pattern, text):
             return kw
@@ -59,32 +79,43 @@ def keyword_match(text: str):
 # ============================================================
 # NEWS SOURCES
 # ============================================================
-def fetch_gnews(country: str):
-    """Fetch news articles from GNews API"""
-    log(f"📡 fetch_gnews called for country: {country}")
-    log(f"📡 GNEWS_API_KEY present: {bool(GNEWS_API_KEY)}")
+def fetch_gnews(country: str, since: str | None = None):
+    """
+    Fetch news articles from GNews API, newest first, optionally only those published from `since`.
+    Raises on HTTP and network errors, so a failed poll is not mistaken for a quiet country.
+    """
+    log("📡 fetch_gnews called for country: %s (since %s)", country, since, level="DEBUG")
+    log("📡 GNEWS_API_KEY present: %s", bool(GNEWS_API_KEY), level="DEBUG")
     
     if not GNEWS_API_KEY:
-        log("⚠️ No GNEWS_API_KEY found - skipping GNews")
+        log("⚠️ No GNEWS_API_KEY found - skipping GNews", level="WARNING")
         return []
     
     query = country + " (" + " OR ".join(RISK_KEYWORDS) + ")"
     url = (
-        "https://gnews.io/api/v4/search"
-        f"?q={query}&lang=en&max=3&apikey={GNEWS_API_KEY}"
+        f"{GNEWS_BASE_URL}/api/v4/search"
+        f"?q={query}&lang=en&max={GNEWS_MAX_ARTICLES}&sortby=publishedAt&apikey={GNEWS_API_KEY}"
     )
+    if since:
+        url += f"&from={since}"
     
-    log(f"📡 Making GNews API call to: {url[:80]}...")
+    log("📡 Making GNews API call to: %s...", url[:80], level="DEBUG")
     
     try:
-        r = requests.get(url, timeout=10)
-        r.raise_for_status()
-        articles = r.json().get("articles", [])
+        recorded = cassette.replay("GET", url)
+        if recorded is not None:
+            data = recorded["json"]
+        else:
+            r = requests.get(url, timeout=10)
+            r.raise_for_status()
+            data = r.json()
+            cassette.record("GET", url, None, {"json": data})
+        articles = data.get("articles", [])
         log(f"✅ GNews returned {len(articles)} articles for {country}")
         return articles
     except Exception as e:
-        log(f"❌ GNews error for {country}: {e}")
-        return []
+        log(f"❌ GNews error for {country}: {e}", level="ERROR", country=country)
+        raise
 
 def load_fake_news():
     """Load synthetic news from JSONL file"""
@@ -96,7 +127,7 @@ def load_fake_news():
                     articles.append(json.loads(line))
         log(f"✅ Loaded {len(articles)} synthetic news articles")
     except Exception as e:
-        log(f"❌ Fake news read error: {e}")
+        log(f"❌ Fake news read error: {e}", level="ERROR")
     return articles
 
 FAKE_NEWS = load_fake_news()
@@ -104,100 +135,115 @@ FAKE_NEWS = load_fake_news()
 # ============================================================
 # THREAT PROCESSING
 # ============================================================
-def process_threats_for_supplier(supplier: str, country: str) -> list[dict]:
+def fetch_country_news(country: str, since: str | None) -> list:
+    """GNews fetch used by the news scheduler; errors propagate so it retries at the same interval"""
+    with timed("news_fetch"):
+        return fetch_gnews(country, since)
+
+def find_candidates(supplier: str, country: str, emitted_at: float = 0.0) -> list[dict]:
     """
-    Check news sources for threats and validate with LLM.
-    Returns list of validated threats.
+    Keep the keyword-matching synthetic articles for a supplier's country.
+    Returns candidate threats for LLM validation. GNews articles arrive
+    separately, through the news scheduler stream.
+
+    emitted_at is when the first stream row of this supplier/country was
+    written; each stage reached is recorded against it in latency_metrics.
     
     IMPORTANT: All dict values MUST be plain Python types (str, int, float, bool)
     NOT Pathway types, as they will be used in downstream UDFs.
     """
-    threats = []
+    candidates = []
     seen_headlines = set()  # Track duplicates
     
     # Convert Pathway types to plain Python strings
     supplier = str(supplier)
     country = str(country)
+    emitted_at = float(emitted_at or 0.0)
+    observe_stage("grouped", emitted_at)
     
     log(f"🔍 Checking: {supplier} | {country}")
     
-    # Check GNews
-    for art in fetch_gnews(country):
-        headline = str(art.get("title", ""))
-        description = str(art.get("description", ""))
-        
-        # Skip duplicates
-        if headline in seen_headlines:
-            log(f"⏭️ Skipping duplicate: {headline[:50]}...")
-            continue
-        
-        kw = keyword_match(headline + " " + description)
-        
-        if not kw:
-            continue
-        
-        seen_headlines.add(headline)
-        log(f"⚠️ Keyword match [{kw}]: {headline[:50]}...")
-        
-        # LLM validation
-        is_threat = is_real_supply_chain_threat(country, headline, description)
-        log(f"   LLM validation result: {is_threat}")
-        
-        if is_threat:
-            log(f"🚨 REAL THREAT | {supplier} | {country} | {kw}")
-            threats.append({
-                "supplier": str(supplier),  # Ensure plain string
-                "country": str(country),    # Ensure plain string
-                "threat_type": str(kw),     # Ensure plain string
-                "headline": str(headline),  # Ensure plain string
-                "description": str(description),  # Ensure plain string
-                "source": "gnews",
-            })
-        else:
-            log(f"✅ LLM rejected: Not a supply chain threat")
+    articles = [
+        (str(art.get("headline", "")), str(art.get("description", "")), "synthetic", str(art.get("published_at", "")))
+        for art in FAKE_NEWS
+        if art.get("country", "").lower() == country.lower()
+    ]
+    observe_stage("news_fetched", emitted_at)
     
-    # Check Synthetic News
-    for art in FAKE_NEWS:
-        if art.get("country", "").lower() != country.lower():
-            continue
-            
-        headline = str(art.get("headline", ""))
-        description = str(art.get("description", ""))
-        
+    for headline, description, source, published_at in articles:
         # Skip duplicates
         if headline in seen_headlines:
-            log(f"⏭️ Skipping duplicate: {headline[:50]}...")
+            log("⏭️ Skipping duplicate: %.50s...", headline, level="DEBUG")
             continue
-            
+        
         kw = keyword_match(headline + " " + description)
         
         if not kw:
             continue
         
         seen_headlines.add(headline)
-        log(f"⚠️ Keyword match [{kw}]: {headline[:50]}...")
-        
-        # LLM validation
-        is_threat = is_real_supply_chain_threat(country, headline, description)
-        log(f"   LLM validation result: {is_threat}")
-        
-        if is_threat:
-            log(f"🚨 REAL THREAT | {supplier} | {country} | {kw}")
-            threats.append({
-                "supplier": str(supplier),  # Ensure plain string
-                "country": str(country),    # Ensure plain string
-                "threat_type": str(kw),     # Ensure plain string
-                "headline": str(headline),  # Ensure plain string
-                "description": str(description),  # Ensure plain string
-                "source": "synthetic",
-            })
-        else:
-            log(f"✅ LLM rejected: Not a supply chain threat")
+        log("⚠️ Keyword match [%s]: %.50s...", kw, headline)
+        observe_stage("keyword_filtered", emitted_at)
+        candidates.append({
+            "threat_type": str(kw),
+            "headline": headline,
+            "description": description,
+            "source": source,
+            "published_at": published_at,
+        })
     
-    if threats:
-        log(f"✅ Found {len(threats)} validated threat(s) for {supplier}")
+    return candidates
+
+def validate_candidate(supplier: str, country: str, threat_type: str, headline: str, description: str,
+                       story_id: str, emitted_at: float = 0.0) -> bool:
+    """
+    LLM check of one candidate; False when rejected. Raises GeminiError when
+    Gemini gave no verdict, so the stage retries it and never caches a failure.
+    Near-duplicates of an already validated story reuse its verdict.
+    """
+    try:
+        with timed("llm_validate"):
+            is_threat = story_index.resolve(
+                story_id, lambda: is_real_supply_chain_threat(country, headline, description)
+            )
+    except GeminiError as e:
+        log(f"❌ No LLM verdict (Gemini unavailable after retries): {e}", level="ERROR", supplier=supplier, country=country)
+        raise
+    observe_stage("llm_validated", emitted_at)
+    log("   LLM validation result: %s", is_threat, level="DEBUG")
     
-    return threats
+    if is_threat:
+        log(f"🚨 REAL THREAT | {supplier} | {country} | {threat_type}", level="WARNING", supplier=supplier, country=country, threat_type=threat_type)
+    else:
+        log("✅ LLM rejected: Not a supply chain threat", level="DEBUG")
+    return bool(is_threat)
+
+# ============================================================
+# ASYNC UDF STAGES
+# ============================================================
+# The HTTP clients are blocking, so each stage runs them on its own thread pool
+# sized to its capacity; the Pathway worker only awaits the results.
+fetch_pool = ThreadPoolExecutor(max_workers=NEWS_FETCH_CAPACITY, thread_name_prefix="news-fetch")
+validate_pool = ThreadPoolExecutor(max_workers=LLM_VALIDATE_CAPACITY, thread_name_prefix="llm-validate")
+
+def async_stage(pool: ThreadPoolExecutor, func, timeout: float):
+    """
+    `func` run on `pool` with a per-attempt timeout and retries. Only results
+    are cached: a call that still fails after its retries raises instead.
+    """
+    @functools.wraps(func)  # also names the disk cache after func
+    async def call(*args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(pool, func, *args)
+
+    return pw.udfs.async_options(
+        timeout=timeout,
+        retry_strategy=pw.udfs.ExponentialBackoffRetryStrategy(max_retries=UDF_MAX_RETRIES),
+        cache_strategy=udf_cache(),
+    )(call)
+
+fetch_stage = async_stage(fetch_pool, find_candidates, NEWS_FETCH_TIMEOUT_SEC)
+validate_stage = async_stage(validate_pool, validate_candidate, LLM_VALIDATE_TIMEOUT_SEC)
 
 # ============================================================
 # PATHWAY PIPELINE
@@ -207,46 +253,235 @@ log("🚀 Starting Supply Chain Threat Alert Pipeline")
 log("=" * 60)
 log(f"📂 Working directory: {os.getcwd()}")
 log(f"📂 Output directory: {os.path.abspath('output')}")
-log(f"📂 CSV will be written to: {os.path.abspath('output/validated_threats.csv')}")
+log(f"📂 Threat store: {os.path.abspath(THREAT_DB)}")
+
+# Only contracts active today; expired ones are retracted when their end date
+# passes, so no news fetches or validations are spent on them (see contract_clock.py)
+active_supply_chain = active_contracts(supply_chain_table)
 
 # Get unique supplier/country combinations
-unique_suppliers = supply_chain_table.groupby(
+unique_suppliers = active_supply_chain.groupby(
     pw.this.supplier_firm,
     pw.this.source_country
 ).reduce(
     supplier=pw.this.supplier_firm,
     country=pw.this.source_country,
+    # Earliest emission in the group; stable once set, so later rows of the
+    # same supplier don't re-trigger threat processing
+    emitted_at=pw.reducers.min(pw.this.emitted_at),
 )
 
-# Process threats for each supplier/country
-threats_with_lists = unique_suppliers.select(
+# Distinct countries, pushed into the proxy's /countries view
+countries = active_supply_chain.select(
+    country=pw.this.source_country.str.strip()
+).filter(
+    pw.this.country != ""
+).groupby(pw.this.country).reduce(country=pw.this.country)
+get_view("countries").attach(countries, "country", view_state_path("countries.json"), resume=RESUMING)
+
+# Distinct suppliers, used by the proxy to scope RAG questions (rag_filters.py)
+supplier_names = unique_suppliers.select(
+    supplier=pw.this.supplier.str.strip()
+).filter(
+    pw.this.supplier != ""
+).groupby(pw.this.supplier).reduce(supplier=pw.this.supplier)
+get_view("suppliers").attach(supplier_names, "supplier", view_state_path("suppliers.json"), resume=RESUMING)
+
+# Stage 1: synthetic news + keyword filter per supplier/country, many suppliers in flight.
+# Both stages are cached so a replay after restart doesn't repeat Gemini calls.
+# A stage that fails after its retries drops that row instead of stopping the worker.
+@pw.udf(executor=pw.udfs.async_executor(capacity=NEWS_FETCH_CAPACITY))
+async def fetch_candidates_udf(supplier: str, country: str, emitted_at: float) -> list[dict]:
+    try:
+        return await fetch_stage(supplier, country, emitted_at)
+    except Exception as e:
+        log(f"❌ Candidate lookup failed after retries: {e!r}", level="ERROR", supplier=supplier, country=country)
+        return []
+
+# Stage 2: one LLM validation per candidate article; None when there is no verdict
+@pw.udf(executor=pw.udfs.async_executor(capacity=LLM_VALIDATE_CAPACITY))
+async def validate_candidate_udf(supplier: str, country: str, threat_type: str, headline: str, description: str,
+                                 story_id: str, emitted_at: float) -> bool | None:
+    try:
+        return await validate_stage(supplier, country, threat_type, headline, description, story_id, emitted_at)
+    except Exception as e:
+        log(f"❌ Candidate dropped, no LLM verdict after retries: {e!r}", level="ERROR", supplier=supplier, country=country)
+        return None
+
+# Near-duplicate cluster of an article within its country, shared across suppliers and sources
+@pw.udf
+def story_id_udf(headline: str, description: str, country: str) -> str:
+    return story_index.story_id(headline, description, country)
+
+# Fetch candidates for each supplier/country
+candidates_by_supplier = unique_suppliers.select(
     supplier=pw.this.supplier,
     country=pw.this.country,
-    threats_list=pw.apply(
-        process_threats_for_supplier,
+    emitted_at=pw.this.emitted_at,
+    candidates=fetch_candidates_udf(
         pw.this.supplier,
-        pw.this.country
+        pw.this.country,
+        pw.this.emitted_at
     )
 )
 
-# Flatten to get one row per threat
-validated_threats = threats_with_lists.flatten(pw.this.threats_list).select(
-    supplier=pw.this.threats_list["supplier"],
-    country=pw.this.threats_list["country"],
-    threat_type=pw.this.threats_list["threat_type"],
-    headline=pw.this.threats_list["headline"],
-    description=pw.this.threats_list["description"],
-    source=pw.this.threats_list["source"],
+# Flatten to get one row per candidate article
+synthetic_candidates = candidates_by_supplier.flatten(pw.this.candidates).select(
+    supplier=pw.this.supplier,
+    country=pw.this.country,
+    threat_type=pw.this.candidates["threat_type"].as_str(),
+    headline=pw.this.candidates["headline"].as_str(),
+    description=pw.this.candidates["description"].as_str(),
+    source=pw.this.candidates["source"].as_str(),
+    published_at=pw.this.candidates["published_at"].as_str(),
+    emitted_at=pw.this.emitted_at,
+)
+
+# GNews: polled per active country on an adaptive schedule (see news_scheduler.py)
+news_scheduler = NewsScheduler(
+    fetch_news=fetch_country_news,
+    active_countries=lambda: get_view("countries").snapshot()[0],
+    state_file=state_path("news_watermarks.json"),
+    log=log,
+    enabled=bool(GNEWS_API_KEY),
+)
+news_articles = pw.io.python.read(news_scheduler, schema=NewsArticleSchema, name="gnews_scheduler")
+
+@pw.udf
+def match_keyword(headline: str, description: str) -> str:
+    return keyword_match(headline + " " + description) or ""
+
+news_matches = news_articles.select(
+    *pw.this,
+    threat_type=match_keyword(pw.this.headline, pw.this.description),
+).filter(pw.this.threat_type != "")
+
+# Each matching article is a candidate for every supplier in its country,
+# including suppliers that appear after the article arrived
+suppliers_by_country = unique_suppliers.select(*pw.this, country_key=pw.this.country.str.strip())
+gnews_candidates = suppliers_by_country.join(
+    news_matches, pw.left.country_key == pw.right.country
+).select(
+    supplier=pw.left.supplier,
+    country=pw.left.country,
+    threat_type=pw.right.threat_type,
+    headline=pw.right.headline,
+    description=pw.right.description,
+    source="gnews",
+    published_at=pw.right.published_at,
+    # Latency runs from when the candidate could first exist: the later of the
+    # supplier's first stream row and the scheduler feeding in the article
+    emitted_at=pw.if_else(
+        pw.left.emitted_at > pw.right.emitted_at, pw.left.emitted_at, pw.right.emitted_at
+    ),
+)
+
+# Only suppliers whose region, city or port dependency the article can affect (see geo_index.py)
+supplier_geo = build_supplier_geo(active_supply_chain)
+candidates = route_by_geo(
+    pw.Table.concat_reindex(synthetic_candidates, gnews_candidates),
+    supplier_geo,
+).select(
+    *pw.this,
+    story_id=story_id_udf(pw.this.headline, pw.this.description, pw.this.country),
+)
+
+# Validate each candidate (once per story cluster) and keep the real threats;
+# candidates left without a verdict are dropped
+validated_threats = candidates.select(
+    *pw.this,
+    is_threat=validate_candidate_udf(
+        pw.this.supplier,
+        pw.this.country,
+        pw.this.threat_type,
+        pw.this.headline,
+        pw.this.description,
+        pw.this.story_id,
+        pw.this.emitted_at
+    )
+).filter(pw.coalesce(pw.this.is_threat, False)).without(pw.this.is_threat)
+
+# One row per headline per country, listing every affected supplier, so the
+# store and the RAG index hold each story once and readers need no dedup
+@pw.udf
+def headline_key(headline: str) -> str:
+    return " ".join(normalize(headline))
+
+@pw.udf
+def distinct_sorted(values: tuple) -> list[str]:
+    return sorted(set(values))
+
+grouped_threats = validated_threats.select(
+    *pw.this,
+    headline_key=headline_key(pw.this.headline),
+).groupby(
+    pw.this.country,
+    pw.this.headline_key
+).reduce(
+    country=pw.this.country,
+    threat_type=pw.reducers.any(pw.this.threat_type),
+    headline=pw.reducers.any(pw.this.headline),
+    description=pw.reducers.any(pw.this.description),
+    source=pw.reducers.any(pw.this.source),
+    story_id=pw.reducers.any(pw.this.story_id),
+    # Newest publish time of the story's articles ("" when unknown)
+    published_at=pw.reducers.max(pw.this.published_at),
+    supplier_tuple=pw.reducers.sorted_tuple(pw.this.supplier),
+    emitted_at=pw.reducers.min(pw.this.emitted_at),
+).with_columns(
+    suppliers=distinct_sorted(pw.this.supplier_tuple),
+).without(pw.this.supplier_tuple)
+
+# Keep the current set of threats in SQLite (retractions applied, see threat_store.py)
+threat_store = ThreatStore(
+    columns=["country", "threat_type", "headline", "description", "source", "suppliers", "story_id", "emitted_at"],
+    indexes=["country", "detected_at"],
+    name_columns=["suppliers"],
+    reset=not RESUMING,
 )
+threat_store.attach(grouped_threats)
+
+# Latency: row ingested by Pathway, validated threat written to output
+def record_ingested(key, row, time, is_addition):
+    if is_addition:
+        observe_stage("ingested", row["emitted_at"])
+
+def record_written(key, row, time, is_addition):
+    if is_addition:
+        observe_stage("written", row["emitted_at"])
 
-# Write to CSV
-pw.io.csv.write(validated_threats, "output/validated_threats.csv")
+pw.io.subscribe(supply_chain_table, on_change=record_ingested)
+pw.io.subscribe(grouped_threats, on_change=record_written)
+
+# Countries with fresh threats are polled more often
+def record_threat_country(key, row, time, is_addition):
+    if is_addition:
+        news_scheduler.record_threat(row["country"])
+
+pw.io.subscribe(validated_threats, on_change=record_threat_country)
+
+# Per-supplier risk: counts by type and recency-weighted severity (see risk_scoreboard.py)
+@pw.udf
+def seen_at(published_at: str, emitted_at: float) -> float:
+    return event_time(published_at, emitted_at)
+
+risk_scores = build_scoreboard(validated_threats.select(
+    supplier=pw.this.supplier.str.strip(),
+    story_id=pw.this.story_id,
+    threat_type=pw.this.threat_type,
+    seen_at=seen_at(pw.this.published_at, pw.this.emitted_at),
+))
+risk_board.attach(risk_scores, view_state_path("risk_scores.json"), resume=RESUMING)
+
+# Buyers exposed to threatened suppliers, with quantities per contract (see exposure_index.py)
+contract_exposure, buyer_exposure = build_exposure(validated_threats, active_supply_chain)
+exposure_index.attach(contract_exposure, buyer_exposure, view_state_path("exposure.json"), resume=RESUMING)
 
 # Log each validated threat
 @pw.udf
-def log_threat(supplier: str, country: str, threat_type: str, headline: str, source: str) -> str:
+def log_threat(suppliers: list[str], country: str, threat_type: str, headline: str, source: str) -> str:
     # Convert all to plain strings
-    supplier = str(supplier)
+    suppliers = ", ".join(str(s) for s in suppliers)
     country = str(country)
     threat_type = str(threat_type)
     headline = str(headline)
@@ -256,7 +491,7 @@ def log_threat(supplier: str, country: str, threat_type: str, headline: str, sou
     log("")
     log("=" * 60)
     log("💥 THREAT ALERT VALIDATED")
-    log(f"   Supplier: {supplier}")
+    log(f"   Suppliers: {suppliers}")
     log(f"   Country: {country}")
     log(f"   Type: {threat_type.upper()}")
     log(f"   Source: {source}")
@@ -264,9 +499,9 @@ def log_threat(supplier: str, country: str, threat_type: str, headline: str, sou
     log("=" * 60)
     return "logged"
 
-validated_threats.select(
+grouped_threats.select(
     log_result=log_threat(
-        pw.this.supplier,
+        pw.this.suppliers,
         pw.this.country,
         pw.this.threat_type,
         pw.this.headline,
@@ -276,7 +511,7 @@ validated_threats.select(
 
 log("✅ Pipeline configured. Now monitoring for threats...")
 log("🔍 Check output/threat_detection.log for detailed logs")
-log("📊 Validated threats saved to output/validated_threats.csv")
+log(f"📊 Validated threats kept in {THREAT_DB}")
 
 # ============================================================
 # RUN
@@ -0,0 +1,121 @@
+# cassette.py
+# Record/replay layer for outbound Gemini and GNews calls. Responses are stored
+# as one JSON file per request, keyed by a hash of the normalized request, so a
+# recorded session can be replayed without network access or API costs.
+import os
+import json
+import hashlib
+import threading
+from pathlib import Path
+from urllib.parse import urlsplit, parse_qsl, urlencode
+
+# ============================================================
+# CONFIG
+# ============================================================
+# off              - no recording, every call goes to the network
+# record           - every call goes to the network and its response is saved
+# replay           - only recorded responses are served; a miss raises CassetteMiss
+# replay_or_record - recorded responses are served, misses are fetched and saved
+HTTP_CASSETTE_MODE = os.getenv("HTTP_CASSETTE_MODE", "off").lower()
+HTTP_CASSETTE_DIR = Path(os.getenv("HTTP_CASSETTE_DIR", "cassettes"))
+
+# Query parameters holding credentials never become part of the key
+SECRET_PARAMS = {"key", "apikey", "api_key", "token"}
+
+MODES = {"off", "record", "replay", "replay_or_record"}
+if HTTP_CASSETTE_MODE not in MODES:
+    raise ValueError(f"Unknown HTTP_CASSETTE_MODE: {HTTP_CASSETTE_MODE} (expected {', '.join(sorted(MODES))})")
+
+
+class CassetteMiss(Exception):
+    """Raised in replay mode when a request has no recorded response"""
+
+# ============================================================
+# SHARED STATE
+# ============================================================
+_lock = threading.Lock()
+_entries = {}
+_stats = {"hits": 0, "misses": 0, "recorded": 0}
+
+
+def get_stats() -> dict:
+    with _lock:
+        return {"mode": HTTP_CASSETTE_MODE, **_stats}
+
+# ============================================================
+# HELPERS
+# ============================================================
+def normalize_request(method: str, url: str, body=None) -> dict:
+    """
+    Canonical form of a request: host and credentials are dropped, query
+    parameters sorted and the JSON body serialized with sorted keys, so the
+    same call recorded against production replays against a stand-in too.
+    """
+    parts = urlsplit(url)
+    query = sorted((k, v) for k, v in parse_qsl(parts.query) if k.lower() not in SECRET_PARAMS)
+    return {
+        "method": method.upper(),
+        "path": parts.path,
+        "query": urlencode(query),
+        "body": json.dumps(body, sort_keys=True, separators=(",", ":")) if body is not None else "",
+    }
+
+
+def request_key(method: str, url: str, body=None) -> str:
+    request = normalize_request(method, url, body)
+    return hashlib.sha256(json.dumps(request, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def _path(key: str) -> Path:
+    return HTTP_CASSETTE_DIR / key[:2] / f"{key}.json"
+
+
+def _load(key: str):
+    with _lock:
+        if key in _entries:
+            return _entries[key]
+    path = _path(key)
+    if not path.exists():
+        return None
+    entry = json.loads(path.read_text(encoding="utf-8"))
+    with _lock:
+        _entries[key] = entry
+    return entry
+
+# ============================================================
+# PUBLIC API
+# ============================================================
+def replay(method: str, url: str, body=None):
+    """
+    Recorded response for a request, or None when the call should go to the
+    network. Raises CassetteMiss in replay mode if nothing was recorded.
+    """
+    if HTTP_CASSETTE_MODE not in ("replay", "replay_or_record"):
+        return None
+    key = request_key(method, url, body)
+    entry = _load(key)
+    with _lock:
+        _stats["hits" if entry is not None else "misses"] += 1
+    if entry is None and HTTP_CASSETTE_MODE == "replay":
+        request = normalize_request(method, url, body)
+        raise CassetteMiss(f"No recorded response for {request['method']} {request['path']} ({key[:12]})")
+    return entry["response"] if entry is not None else None
+
+
+def record(method: str, url: str, body, response: dict):
+    """Save a response (any JSON-serializable dict) for later replay"""
+    if HTTP_CASSETTE_MODE not in ("record", "replay_or_record"):
+        return
+    key = request_key(method, url, body)
+    entry = {"request": normalize_request(method, url, body), "response": response}
+
+    path = _path(key)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # Write-then-rename so concurrent readers never see a partial file
+    tmp = path.with_suffix(f".{threading.get_ident()}.tmp")
+    tmp.write_text(json.dumps(entry), encoding="utf-8")
+    os.replace(tmp, path)
+
+    with _lock:
+        _entries[key] = entry
+        _stats["recorded"] += 1
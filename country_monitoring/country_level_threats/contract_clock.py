@@ -0,0 +1,73 @@
+# contract_clock.py
+# Active-contract filter for the supply chain stream. A one-row clock table
+# holds today's date and is updated when the date changes; joining the stream
+# against it keeps only rows whose start_date <= today <= end_date, so expired
+# contracts are retracted from every downstream group (news fetches, LLM
+# validation, exposure) when their end date passes.
+import os
+import time
+from datetime import datetime, timezone
+
+import pathway as pw
+
+# ============================================================
+# CONFIG
+# ============================================================
+CONTRACT_FILTER = os.getenv("CONTRACT_FILTER", "on").lower() not in ("off", "0", "false", "no")
+# Fixed "today" (YYYY-MM-DD) for replays of historical data; empty follows the UTC date
+CONTRACT_AS_OF = os.getenv("CONTRACT_AS_OF", "").strip()
+CONTRACT_CLOCK_TICK_SEC = float(os.getenv("CONTRACT_CLOCK_TICK_SEC", "60"))
+
+
+class ClockSchema(pw.Schema):
+    clock: int = pw.column_definition(primary_key=True)
+    today: str
+
+
+def today() -> str:
+    return CONTRACT_AS_OF or datetime.now(timezone.utc).date().isoformat()
+
+
+class DailyClock(pw.io.python.ConnectorSubject):
+    """Emits today's date as the single clock row, again whenever the date changes"""
+
+    deletions_enabled = False
+
+    def __init__(self):
+        # Upsert session: a row with the same primary key replaces the previous date
+        super().__init__(session_type="upsert")
+
+    def run(self):
+        current = None
+        while True:
+            date = today()
+            if date != current:
+                self.next(clock=0, today=date)
+                current = date
+            if CONTRACT_AS_OF:
+                return
+            time.sleep(CONTRACT_CLOCK_TICK_SEC)
+
+
+@pw.udf
+def is_active(start_date: str, end_date: str, today: str) -> bool:
+    """ISO dates compare as strings; a missing start or end date leaves that side open"""
+    start_date, end_date = start_date.strip()[:10], end_date.strip()[:10]
+    return (not start_date or start_date <= today) and (not end_date or today <= end_date)
+
+
+def active_contracts(supply_chain: pw.Table) -> pw.Table:
+    """
+    Rows of `supply_chain` whose contract is active today, with the same ids
+    and columns. Rows that stay active are unchanged when the date moves, so
+    only expiring or starting contracts propagate downstream.
+    """
+    if not CONTRACT_FILTER:
+        return supply_chain
+    clock = pw.io.python.read(DailyClock(), schema=ClockSchema, name="contract_clock")
+    return supply_chain.with_columns(clock=0).join(
+        clock, pw.left.clock == pw.right.clock, id=pw.left.id
+    ).select(
+        *pw.left.without("clock"),
+        active=is_active(pw.left.start_date, pw.left.end_date, pw.right.today),
+    ).filter(pw.this.active).without(pw.this.active)
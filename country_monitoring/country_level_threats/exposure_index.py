@@ -0,0 +1,231 @@
+# exposure_index.py
+# Buyer exposure to validated threats, maintained incrementally by the Pathway
+# graph: threatened (supplier, country) pairs are joined to the contracts of
+# the supply chain stream, and the exposed quantity is summed per contract and
+# per buyer. A new threat, a retracted one or a changed contract row updates
+# only the affected rows; the proxy serves them from memory.
+import json
+import threading
+
+from state_saver import StateSaver
+
+
+# ============================================================
+# PATHWAY TABLES
+# ============================================================
+def build_exposure(threats, supply_chain):
+    """
+    (contract_exposure, buyer_exposure) tables from validated threats
+    (`supplier`, `country`, `story_id`, `threat_type`) and the supply chain
+    stream. Quantities are summed per unit, since tons and units don't add up.
+    """
+    import pathway as pw
+
+    @pw.udf
+    def quantities_by_unit(pairs: tuple) -> str:
+        return json.dumps({unit: quantity for unit, quantity in sorted(pairs)})
+
+    @pw.udf
+    def distinct_sorted(values: tuple) -> list[str]:
+        return sorted(set(values))
+
+    @pw.udf
+    def distinct_flat(tuples: tuple) -> list[str]:
+        return sorted({value for values in tuples for value in values})
+
+    # Threatened suppliers: distinct stories per supplier and country
+    threatened = threats.select(
+        supplier_key=pw.this.supplier.str.strip().str.lower(),
+        country_key=pw.this.country.str.strip().str.lower(),
+        story_id=pw.this.story_id,
+        threat_type=pw.this.threat_type,
+    ).groupby(pw.this.supplier_key, pw.this.country_key, pw.this.story_id).reduce(
+        supplier_key=pw.this.supplier_key,
+        country_key=pw.this.country_key,
+        threat_type=pw.reducers.any(pw.this.threat_type),
+    ).groupby(pw.this.supplier_key, pw.this.country_key).reduce(
+        supplier_key=pw.this.supplier_key,
+        country_key=pw.this.country_key,
+        threats=pw.reducers.count(),
+        threat_type_tuple=pw.reducers.tuple(pw.this.threat_type),
+    ).with_columns(
+        threat_types=distinct_sorted(pw.this.threat_type_tuple),
+    ).without(pw.this.threat_type_tuple)
+
+    # Contract quantities; rows keyed by record_id, so an updated row replaces the old one
+    contracts = supply_chain.select(
+        buyer=pw.this.buyer_firm.str.strip(),
+        contract_id=pw.this.contract_id.str.strip(),
+        supplier=pw.this.supplier_firm.str.strip(),
+        country=pw.this.source_country.str.strip(),
+        unit=pw.this.unit.str.strip(),
+        quantity=pw.this.quantity,
+        supplier_key=pw.this.supplier_firm.str.strip().str.lower(),
+        country_key=pw.this.source_country.str.strip().str.lower(),
+    ).groupby(
+        pw.this.buyer, pw.this.contract_id, pw.this.supplier, pw.this.country, pw.this.unit
+    ).reduce(
+        buyer=pw.this.buyer,
+        contract_id=pw.this.contract_id,
+        supplier=pw.this.supplier,
+        country=pw.this.country,
+        unit=pw.this.unit,
+        quantity=pw.reducers.sum(pw.this.quantity),
+        supplier_key=pw.reducers.any(pw.this.supplier_key),
+        country_key=pw.reducers.any(pw.this.country_key),
+    )
+
+    contract_exposure = contracts.join(
+        threatened,
+        pw.left.supplier_key == pw.right.supplier_key,
+        pw.left.country_key == pw.right.country_key,
+    ).select(
+        buyer=pw.left.buyer,
+        contract_id=pw.left.contract_id,
+        supplier=pw.left.supplier,
+        country=pw.left.country,
+        unit=pw.left.unit,
+        quantity=pw.left.quantity,
+        threats=pw.right.threats,
+        threat_types=pw.right.threat_types,
+    )
+
+    buyer_exposure = contract_exposure.groupby(pw.this.buyer, pw.this.unit).reduce(
+        buyer=pw.this.buyer,
+        unit=pw.this.unit,
+        quantity=pw.reducers.sum(pw.this.quantity),
+        contracts=pw.reducers.count(),
+        supplier_tuple=pw.reducers.tuple(pw.this.supplier),
+    ).groupby(pw.this.buyer).reduce(
+        buyer=pw.this.buyer,
+        contracts=pw.reducers.sum(pw.this.contracts),
+        unit_pairs=pw.reducers.tuple(pw.make_tuple(pw.this.unit, pw.this.quantity)),
+        supplier_tuples=pw.reducers.tuple(pw.this.supplier_tuple),
+    ).select(
+        buyer=pw.this.buyer,
+        contracts=pw.this.contracts,
+        exposed_quantity=quantities_by_unit(pw.this.unit_pairs),
+        suppliers=distinct_flat(pw.this.supplier_tuples),
+    )
+    return contract_exposure, buyer_exposure
+
+
+# ============================================================
+# IN-MEMORY INDEX
+# ============================================================
+class ExposureIndex:
+    """
+    Buyer and contract exposure rows by buyer, fed by pw.io.subscribe.
+    Changes are applied when the Pathway timestamp closes, per worker
+    thread, as in threat_store.py.
+    """
+
+    def __init__(self):
+        self.attached = False
+        self.saver = None
+        self._lock = threading.Lock()
+        self._pending = {}     # thread id -> (upserts, deletes), keyed (kind, id)
+        self._buyers = {}      # buyer (lowercase) -> totals
+        self._contracts = {}   # buyer (lowercase) -> {(contract, supplier, country, unit): row}
+        self._ranked = None    # buyers (lowercase), most exposed contracts first; None until the next read
+
+    def _buffer(self, kind: str, ident: tuple, row, is_addition: bool):
+        with self._lock:
+            upserts, deletes = self._pending.setdefault(threading.get_ident(), ({}, set()))
+            if is_addition:
+                upserts[(kind, ident)] = row
+            else:
+                deletes.add((kind, ident))
+
+    def on_buyer_change(self, key, row: dict, time, is_addition: bool):
+        buyer = str(row["buyer"])
+        self._buffer("buyer", (buyer.lower(),), {
+            "buyer": buyer,
+            "contracts": int(row["contracts"]),
+            "exposed_quantity": json.loads(row["exposed_quantity"]),
+            "suppliers": list(row["suppliers"]),
+        }, is_addition)
+
+    def on_contract_change(self, key, row: dict, time, is_addition: bool):
+        ident = (str(row["buyer"]).lower(), row["contract_id"], row["supplier"], row["country"], row["unit"])
+        self._buffer("contract", ident, {
+            "contract_id": row["contract_id"],
+            "supplier": row["supplier"],
+            "country": row["country"],
+            "quantity": float(row["quantity"]),
+            "unit": row["unit"],
+            "threats": int(row["threats"]),
+            "threat_types": list(row["threat_types"]),
+        }, is_addition)
+
+    def on_time_end(self, time):
+        with self._lock:
+            upserts, deletes = self._pending.pop(threading.get_ident(), ({}, set()))
+            if not upserts and not deletes:
+                return
+            for kind, ident in deletes - upserts.keys():
+                if kind == "buyer":
+                    self._buyers.pop(ident[0], None)
+                else:
+                    contracts = self._contracts.get(ident[0], {})
+                    contracts.pop(ident[1:], None)
+                    if not contracts:
+                        self._contracts.pop(ident[0], None)
+            for (kind, ident), row in upserts.items():
+                if kind == "buyer":
+                    self._buyers[ident[0]] = row
+                else:
+                    self._contracts.setdefault(ident[0], {})[ident[1:]] = row
+            self._ranked = None
+        if self.saver:
+            self.saver.mark_changed()
+
+    @staticmethod
+    def _contract_ident(contract: dict) -> tuple:
+        return (contract["contract_id"], contract["supplier"], contract["country"], contract["unit"])
+
+    def _copy(self) -> dict:
+        # Rows are replaced, never mutated, so copying the containers is enough
+        with self._lock:
+            return {
+                "buyers": dict(self._buyers),
+                "contracts": {buyer: list(contracts.values()) for buyer, contracts in self._contracts.items()},
+            }
+
+    def attach(self, contract_exposure, buyer_exposure, state_file=None, resume: bool = False):
+        """Subscribe to the build_exposure() tables; saved to `state_file` for resumes like live_views"""
+        import pathway as pw
+        if state_file:
+            self.saver = StateSaver(state_file, self._copy)
+            saved = self.saver.load() if resume else None
+            if saved is not None:
+                with self._lock:
+                    self._buyers = saved["buyers"]
+                    self._contracts = {
+                        buyer: {self._contract_ident(c): c for c in contracts}
+                        for buyer, contracts in saved["contracts"].items()
+                    }
+                    self._ranked = None
+        pw.io.subscribe(contract_exposure, on_change=self.on_contract_change, on_time_end=self.on_time_end)
+        pw.io.subscribe(buyer_exposure, on_change=self.on_buyer_change, on_time_end=self.on_time_end)
+        self.attached = True
+
+    def lookup(self, buyer: str) -> dict | None:
+        """Exposure of one buyer with its exposed contracts, None if not exposed"""
+        key = buyer.strip().lower()
+        with self._lock:
+            totals = self._buyers.get(key)
+            if totals is None:
+                return None
+            contracts = sorted(self._contracts.get(key, {}).values(), key=lambda c: c["quantity"], reverse=True)
+        return {**totals, "exposed_contracts": contracts}
+
+    def top(self, limit: int = 50) -> list[dict]:
+        """Buyer totals, most exposed contracts first"""
+        with self._lock:
+            if self._ranked is None:
+                self._ranked = sorted(self._buyers, key=lambda b: self._buyers[b]["contracts"], reverse=True)
+            return [self._buyers[b] for b in self._ranked[:limit]]
+
+
+exposure_index = ExposureIndex()
@@ -1,4 +1,4 @@
-from fastapi import FastAPI, HTTPException, UploadFile, File, Form
+from fastapi import FastAPI, HTTPException, UploadFile, File, Form, Request
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from typing import Optional, List
@@ -7,8 +7,23 @@ from pathlib import Path
 import shutil
 import threading
 import os
-import csv
+import json
 import requests
+from fastapi.responses import StreamingResponse, JSONResponse, Response
+from rag_prompts import RAG_PROMPT_TEMPLATE
+import gemini_client
+import latency_metrics
+import cassette
+import query_router
+from pre_classifier import pre_classifier
+from story_index import story_index
+from risk_scoreboard import risk_board
+from exposure_index import exposure_index
+from stream_log import StreamConsumer
+from threat_store import read_threats, THREAT_DB
+from live_views import get_view, etag_for
+from rag_filters import build_filter, filters_from_prompt
+import pathway_config
 
 app = FastAPI(title="Supply Chain Threat Proxy")
 
@@ -22,10 +37,14 @@ app.add_middleware(
 )
 
 # Paths
-THREATS_CSV = "output/validated_threats.csv"
-SUPPLY_CHAIN_CSV = "data/supply_chain_stream.csv"
 DATA_DIR = Path("data")
 CREDENTIALS_FILE = "credentials.json"
+PATHWAY_URL = "http://localhost:8082"
+
+# Streaming answers call Gemini directly with context retrieved from Pathway
+GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
+GEMINI_MODEL = "gemini-2.0-flash-exp"
+STREAM_CONTEXT_DOCS = int(os.getenv("STREAM_CONTEXT_DOCS", "6"))
 
 # Global state for initialization (mimicking compliance engine)
 config_status = {
@@ -35,10 +54,64 @@ config_status = {
 }
 pathway_thread = None
 
+# Distinct countries and suppliers, pushed in by the Pathway pipeline once it runs
+country_view = get_view("countries")
+supplier_view = get_view("suppliers")
+
+# Fallback before the pipeline starts: reads only records appended since the last request
+stream_consumer = StreamConsumer("country_proxy")
+known_countries = set()
+
 class PromptRequest(BaseModel):
     prompt: str
     max_tokens: Optional[int] = 500
     temperature: Optional[float] = 0.1
+    # Threat metadata filter, e.g. {"country": "China", "supplier": ["Acme"], "since": 1767225600};
+    # when omitted, countries and suppliers named in the prompt are used
+    filters: Optional[dict] = None
+
+def known_names() -> dict:
+    """Countries and suppliers the pipeline has seen, by filter field"""
+    return {"country": country_view.snapshot()[0], "supplier": supplier_view.snapshot()[0]}
+
+def route_lookup(request: PromptRequest) -> Optional[dict]:
+    """Filter fields when the prompt is a plain threat lookup (see query_router.py)"""
+    if request.filters is not None:
+        return None
+    return query_router.route(request.prompt, known_names())
+
+def query_filter(request: PromptRequest) -> Optional[str]:
+    """JMESPath metadata filter for a question (see rag_filters.py)"""
+    filters = request.filters
+    if filters is None:
+        filters = filters_from_prompt(request.prompt, known_names())
+    try:
+        return build_filter(filters)
+    except (TypeError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid filters: {e}")
+
+def sse_event(payload: dict) -> str:
+    """Format a payload as a server-sent event"""
+    return f"data: {json.dumps(payload)}\n\n"
+
+def retrieve_context(query: str, k: int, metadata_filter: Optional[str] = None) -> str:
+    """Fetch the top-k documents for a query from the Pathway document store"""
+    response = requests.post(
+        f"{PATHWAY_URL}/v1/retrieve",
+        json={"query": query, "k": k, "metadata_filter": metadata_filter},
+        timeout=(10, 30)
+    )
+    response.raise_for_status()
+    return "\n\n".join(doc.get("text", "") for doc in response.json())
+
+def stream_gemini(prompt: str, temperature: float, max_tokens: int):
+    """Yield answer text from Gemini streamGenerateContent as it is generated"""
+    yield from gemini_client.stream_generate_content(
+        prompt,
+        model=GEMINI_MODEL,
+        generation_config={"temperature": temperature, "maxOutputTokens": max_tokens},
+        api_key=GEMINI_API_KEY,
+    )
 
 def run_pathway_server():
     """Background task to initialize and run Pathway"""
@@ -61,7 +134,7 @@ def run_pathway_server():
         config_status["message"] = "All systems active"
         
         print("🚀 Pathway pipeline starting...")
-        pw.run()
+        pathway_config.run()
     except Exception as e:
         config_status["message"] = f"Error: {str(e)}"
         config_status["initialized"] = False
@@ -116,13 +189,19 @@ async def upload_supplier_data(
 
 @app.post("/proxy-answer")
 async def proxy_answer(request: PromptRequest):
-    """Proxy requests to Pathway RAG service"""
+    """Answer lookups from the threat store; proxy other questions to Pathway RAG, scoped by their metadata filter"""
+    lookup = route_lookup(request)
+    if lookup:
+        return query_router.answer(request.prompt, lookup, GEMINI_API_KEY)
+    
+    metadata_filter = query_filter(request)
     try:
-        pathway_url = "http://localhost:8082/v2/answer"
+        pathway_url = f"{PATHWAY_URL}/v2/answer"
         payload = {
             "prompt": request.prompt,
             "max_tokens": request.max_tokens,
-            "temperature": request.temperature
+            "temperature": request.temperature,
+            "filters": metadata_filter
         }
         
         # Connection timeout 10s, read timeout 60s
@@ -151,50 +230,121 @@ async def proxy_answer(request: PromptRequest):
             detail=f"Error communicating with Pathway service: {str(e)}"
         )
 
+@app.post("/proxy-answer/stream")
+async def proxy_answer_stream(request: PromptRequest):
+    """Stream a RAG answer as server-sent events.
+
+    Retrieves context from the Pathway document store in a single pass and streams
+    the Gemini answer, emitting {"type": "chunk", "text": ...} events and a final
+    {"type": "done"} event. Lookups are answered from the threat store in one chunk.
+    """
+    lookup = route_lookup(request)
+    if lookup:
+        result = query_router.answer(request.prompt, lookup, GEMINI_API_KEY)
+        events = [sse_event({"type": "chunk", "text": result["response"]}), sse_event({"type": "done"})]
+        return StreamingResponse(iter(events), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+    
+    metadata_filter = query_filter(request)
+    try:
+        context = retrieve_context(request.prompt, STREAM_CONTEXT_DOCS, metadata_filter)
+    except requests.exceptions.ConnectionError:
+        raise HTTPException(
+            status_code=503,
+            detail="Pathway RAG service is not available. Ensure it's initialized."
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error communicating with Pathway service: {str(e)}"
+        )
+    
+    prompt = RAG_PROMPT_TEMPLATE.format(context=context, query=request.prompt)
+    
+    def event_stream():
+        try:
+            for text in stream_gemini(prompt, request.temperature, request.max_tokens):
+                yield sse_event({"type": "chunk", "text": text})
+            yield sse_event({"type": "done"})
+        except Exception as e:
+            yield sse_event({"type": "error", "detail": str(e)})
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @app.get("/threats")
 async def get_threats():
-    """Get all validated threats with deduplication"""
+    """Get all validated threats, one per story with its affected suppliers"""
     try:
         threats = []
-        seen_headlines = set()
         
-        if not Path(THREATS_CSV).exists():
-            return {"threats": []}
-        
-        with open(THREATS_CSV, 'r', encoding='utf-8') as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                headline = row.get("headline", "").strip()
-                if headline and headline not in seen_headlines:
-                    threats.append({
-                        "supplier": row.get("supplier", ""),
-                        "country": row.get("country", ""),
-                        "threat_type": row.get("threat_type", ""),
-                        "headline": headline,
-                        "description": row.get("description", ""),
-                        "source": row.get("source", "")
-                    })
-                    seen_headlines.add(headline)
+        # Live threats only, already deduplicated by the pipeline
+        for row in read_threats():
+            suppliers = json.loads(row.get("suppliers") or "[]")
+            threats.append({
+                "supplier": ", ".join(suppliers),
+                "suppliers": suppliers,
+                "country": row.get("country") or "",
+                "threat_type": row.get("threat_type") or "",
+                "headline": (row.get("headline") or "").strip(),
+                "description": row.get("description") or "",
+                "source": row.get("source") or ""
+            })
         
         return {"threats": threats}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/risk")
+async def get_risk_ranking(limit: int = 20):
+    """Highest-risk suppliers first, from the Pathway-maintained scoreboard (see risk_scoreboard.py)"""
+    return {"suppliers": risk_board.top(max(1, min(limit, 500)))}
+
+@app.get("/risk/{supplier}")
+async def get_supplier_risk(supplier: str):
+    """Risk score, threat counts by type and last-seen time of one supplier (O(1) lookup)"""
+    risk = risk_board.lookup(supplier)
+    if risk is None:
+        # No validated threats for this supplier
+        return {"supplier": supplier, "risk_score": 0.0, "recency_weighted_severity": 0.0,
+                "threats": 0, "by_type": {}, "last_seen": None}
+    return risk
+
+@app.get("/exposure")
+async def get_exposure_ranking(limit: int = 50):
+    """Buyers exposed to current threats, most exposed contracts first (see exposure_index.py)"""
+    return {"buyers": exposure_index.top(max(1, min(limit, 1000)))}
+
+@app.get("/exposure/{buyer}")
+async def get_buyer_exposure(buyer: str):
+    """Exposed quantity per unit and the exposed contracts of one buyer"""
+    exposure = exposure_index.lookup(buyer)
+    if exposure is None:
+        # No contracts with a threatened supplier
+        return {"buyer": buyer, "contracts": 0, "exposed_quantity": {}, "suppliers": [], "exposed_contracts": []}
+    return exposure
+
 @app.get("/countries")
-async def get_countries():
-    """Get unique countries from the stream"""
+async def get_countries(request: Request):
+    """Get unique countries from the stream (supports If-None-Match / 304)"""
     try:
-        countries = set()
-        if not Path(SUPPLY_CHAIN_CSV).exists():
-            return {"countries": []}
-        
-        with open(SUPPLY_CHAIN_CSV, 'r', encoding='utf-8') as f:
-            reader = csv.DictReader(f)
-            for row in reader:
+        if country_view.attached:
+            # Maintained by the Pathway graph, see live_views.py
+            countries, etag = country_view.snapshot()
+        else:
+            # Pipeline not running yet - read new stream records directly
+            for row in stream_consumer.poll():
                 country = row.get("source_country", "").strip()
                 if country:
-                    countries.add(country)
-        return {"countries": sorted(list(countries))}
+                    known_countries.add(country)
+            countries = sorted(known_countries)
+            etag = etag_for(countries)
+        
+        if request.headers.get("if-none-match") == etag:
+            return Response(status_code=304, headers={"ETag": etag})
+        return JSONResponse({"countries": countries}, headers={"ETag": etag})
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -203,7 +353,23 @@ async def health_check():
     return {
         "status": "healthy",
         "initialized": config_status["initialized"],
-        "threats_available": Path(THREATS_CSV).exists()
+        "threats_available": Path(THREAT_DB).exists()
+    }
+
+@app.get("/metrics")
+async def get_metrics():
+    """Per-stage pipeline latency (p50/p95/p99) plus Gemini client, cassette, pre-classifier, query router, geo routing and news scheduler stats"""
+    import news_scheduler  # imports pathway, so loaded on first use like the pipeline
+    import geo_index
+    return {
+        "latency": latency_metrics.snapshot(),
+        "gemini": gemini_client.get_stats(),
+        "cassette": cassette.get_stats(),
+        "pre_classifier": pre_classifier.get_stats(),
+        "stories": story_index.get_stats(),
+        "router": query_router.get_stats(),
+        "geo": geo_index.get_stats(),
+        "news": news_scheduler.get_stats(),
     }
 
 @app.get("/")
@@ -0,0 +1,219 @@
+# gemini_client.py
+# Shared Gemini REST client: one keep-alive session per process, a global
+# concurrency limit, 429-aware exponential backoff and per-call latency stats.
+import os
+import json
+import time
+import random
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+import cassette
+
+# ============================================================
+# CONFIG
+# ============================================================
+# Point at a local stand-in server (benchmarks/standin_server.py) for offline runs
+GEMINI_BASE_URL = os.getenv("GEMINI_BASE_URL", "https://generativelanguage.googleapis.com").rstrip("/")
+
+MAX_CONCURRENCY = int(os.getenv("GEMINI_MAX_CONCURRENCY", "8"))
+MAX_RETRIES = int(os.getenv("GEMINI_MAX_RETRIES", "5"))
+BACKOFF_BASE_SEC = float(os.getenv("GEMINI_BACKOFF_BASE_SEC", "1.0"))
+BACKOFF_MAX_SEC = float(os.getenv("GEMINI_BACKOFF_MAX_SEC", "30"))
+
+# Rate limiting and transient server errors are retried, anything else fails fast
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class GeminiError(Exception):
+    """Raised when a Gemini call fails after all retries"""
+
+# ============================================================
+# SHARED STATE
+# ============================================================
+_session = requests.Session()
+_adapter = HTTPAdapter(pool_connections=4, pool_maxsize=MAX_CONCURRENCY)
+_session.mount("https://", _adapter)
+_session.mount("http://", _adapter)
+
+_semaphore = threading.BoundedSemaphore(MAX_CONCURRENCY)
+
+_stats_lock = threading.Lock()
+_stats = {
+    "calls": 0,
+    "errors": 0,
+    "retries": 0,
+    "rate_limited": 0,
+    "latency_total_sec": 0.0,
+    "latency_max_sec": 0.0,
+}
+
+
+def _record(latency: float, error: bool = False):
+    with _stats_lock:
+        _stats["calls"] += 1
+        _stats["latency_total_sec"] += latency
+        _stats["latency_max_sec"] = max(_stats["latency_max_sec"], latency)
+        if error:
+            _stats["errors"] += 1
+
+
+def get_stats() -> dict:
+    """Snapshot of call counts and latency for this process"""
+    with _stats_lock:
+        stats = dict(_stats)
+    stats["latency_avg_sec"] = stats["latency_total_sec"] / stats["calls"] if stats["calls"] else 0.0
+    stats["max_concurrency"] = MAX_CONCURRENCY
+    return stats
+
+
+def retry_budget_sec(timeout: float) -> float:
+    """Longest a call can take before GeminiError: every attempt times out and every backoff is at its cap"""
+    return (MAX_RETRIES + 1) * timeout + MAX_RETRIES * BACKOFF_MAX_SEC
+
+# ============================================================
+# HELPERS
+# ============================================================
+def _url(model: str, method: str, api_version: str, api_key: str | None, sse: bool = False) -> str:
+    key = api_key or os.getenv("GEMINI_API_KEY")
+    url = f"{GEMINI_BASE_URL}/{api_version}/models/{model}:{method}?key={key}"
+    return url + "&alt=sse" if sse else url
+
+
+def _payload(prompt: str, generation_config: dict | None) -> dict:
+    payload = {"contents": [{"parts": [{"text": prompt}]}]}
+    if generation_config:
+        payload["generationConfig"] = generation_config
+    return payload
+
+
+def _backoff_delay(attempt: int, response=None) -> float:
+    """Exponential backoff with jitter; honours Retry-After when Gemini sends it"""
+    if response is not None:
+        retry_after = response.headers.get("Retry-After")
+        if retry_after:
+            try:
+                return min(float(retry_after), BACKOFF_MAX_SEC)
+            except ValueError:
+                pass
+    delay = min(BACKOFF_MAX_SEC, BACKOFF_BASE_SEC * (2 ** attempt))
+    return delay * random.uniform(0.5, 1.0)
+
+
+def _extract_text(data: dict) -> str:
+    candidates = data.get("candidates") or [{}]
+    parts = candidates[0].get("content", {}).get("parts", [])
+    return "".join(part.get("text", "") for part in parts)
+
+
+def _post(url: str, payload: dict, timeout, stream: bool = False) -> requests.Response:
+    """
+    POST with retries. Holds a concurrency slot only while a request is in flight,
+    so callers waiting out a backoff don't block others.
+
+    For stream=True the returned response still holds its slot; the caller must
+    release it with _semaphore.release() once the body has been consumed.
+    """
+    last_error = None
+    for attempt in range(MAX_RETRIES + 1):
+        _semaphore.acquire()
+        keep_slot = False
+        response = None
+        start = time.perf_counter()
+        try:
+            response = _session.post(url, json=payload, timeout=timeout, stream=stream)
+            if response.status_code not in RETRY_STATUSES:
+                if response.status_code >= 400:
+                    # Non-retryable (bad request, auth, unknown model...)
+                    _record(time.perf_counter() - start, error=True)
+                    raise GeminiError(f"Gemini API {response.status_code}: {response.text[:200]}")
+                _record(time.perf_counter() - start)
+                keep_slot = stream
+                return response
+            last_error = GeminiError(f"Gemini API {response.status_code}")
+            response.close()
+        except requests.exceptions.RequestException as e:
+            last_error = GeminiError(f"Gemini request failed: {e}")
+        finally:
+            if not keep_slot:
+                _semaphore.release()
+
+        _record(time.perf_counter() - start, error=True)
+        with _stats_lock:
+            if response is not None and response.status_code == 429:
+                _stats["rate_limited"] += 1
+            if attempt < MAX_RETRIES:
+                _stats["retries"] += 1
+        if attempt < MAX_RETRIES:
+            time.sleep(_backoff_delay(attempt, response))
+
+    raise last_error
+
+def _replay(url: str, payload: dict):
+    """Recorded response from the cassette (see cassette.py), or None to call Gemini"""
+    try:
+        return cassette.replay("POST", url, payload)
+    except cassette.CassetteMiss as e:
+        raise GeminiError(str(e))
+
+# ============================================================
+# PUBLIC API
+# ============================================================
+def generate_content(
+    prompt: str,
+    model: str = "gemini-2.0-flash",
+    generation_config: dict | None = None,
+    api_version: str = "v1",
+    api_key: str | None = None,
+    timeout=30,
+) -> str:
+    """Call generateContent and return the answer text (empty if Gemini returned none)"""
+    url = _url(model, "generateContent", api_version, api_key)
+    payload = _payload(prompt, generation_config)
+
+    recorded = _replay(url, payload)
+    if recorded is not None:
+        return _extract_text(recorded["json"])
+
+    data = _post(url, payload, timeout).json()
+    cassette.record("POST", url, payload, {"json": data})
+    return _extract_text(data)
+
+
+def stream_generate_content(
+    prompt: str,
+    model: str = "gemini-2.0-flash",
+    generation_config: dict | None = None,
+    api_version: str = "v1beta",
+    api_key: str | None = None,
+    timeout=(10, 60),
+):
+    """Call streamGenerateContent and yield answer text as it is generated"""
+    url = _url(model, "streamGenerateContent", api_version, api_key, sse=True)
+    payload = _payload(prompt, generation_config)
+
+    recorded = _replay(url, payload)
+    if recorded is not None:
+        for event in recorded["events"]:
+            text = _extract_text(event)
+            if text:
+                yield text
+        return
+
+    response = _post(url, payload, timeout, stream=True)
+    events = []
+    try:
+        for line in response.iter_lines(decode_unicode=True):
+            # Server-sent events: each payload line starts with "data: "
+            if not line or not line.startswith("data:"):
+                continue
+            event = json.loads(line[len("data:"):].strip())
+            events.append(event)
+            text = _extract_text(event)
+            if text:
+                yield text
+    finally:
+        response.close()
+        _semaphore.release()
+    # Only complete streams are recorded
+    cassette.record("POST", url, payload, {"events": events})
@@ -0,0 +1,177 @@
+# geo_index.py
+# Sub-country routing of news candidates. Places named in an article (regions,
+# cities, ports from data/gazetteer.json plus every region and city seen in
+# the supply chain stream) are matched against each supplier's source_region,
+# source_city and port_dependency, so a flood in one province or a strike at
+# one port is only validated for the suppliers it can affect.
+import os
+import re
+import json
+import threading
+from pathlib import Path
+
+from rag_filters import find_names
+
+# ============================================================
+# CONFIG
+# ============================================================
+GEO_MATCHING = os.getenv("GEO_MATCHING", "on").lower() not in ("off", "0", "false", "no")
+GAZETTEER_FILE = Path(os.getenv("GAZETTEER_FILE", "data/gazetteer.json"))
+# Port disruptions reach suppliers with these port_dependency levels
+GEO_PORT_DEPENDENCY = {
+    level.strip().lower() for level in os.getenv("GEO_PORT_DEPENDENCY", "high,medium").split(",") if level.strip()
+}
+
+PORT_WORDS = re.compile(
+    r"\b(ports?|terminals?|containers?|vessels?|shipping|docks?|dockworkers?|harbou?rs?|cargo)\b", re.IGNORECASE
+)
+
+_lock = threading.Lock()
+_stats = {"routed": 0, "skipped": 0}
+
+
+def get_stats() -> dict:
+    with _lock:
+        return {**_stats, "enabled": GEO_MATCHING}
+
+
+# ============================================================
+# GAZETTEER
+# ============================================================
+class Gazetteer:
+    """
+    Place names per country. A name covers itself plus the places listed for
+    it ("Southern China" -> Guangdong, Shenzhen...); ports are place names too.
+    """
+
+    def __init__(self, path: Path = GAZETTEER_FILE):
+        self.places = {}  # country (lowercase) -> {name (lowercase): covered places (lowercase)}
+        self.ports = {}   # country (lowercase) -> port names (lowercase)
+        if not Path(path).exists():
+            print(f"⚠️ No gazetteer at {path}; only supply chain places are recognised")
+            return
+        data = json.loads(Path(path).read_text(encoding="utf-8"))
+        for country, entry in data.items():
+            places = self.places.setdefault(country.strip().lower(), {})
+            for name, covered in entry.get("places", {}).items():
+                places[name.lower()] = {name.lower(), *(c.lower() for c in covered)}
+            ports = self.ports.setdefault(country.strip().lower(), set())
+            for port in entry.get("ports", []):
+                ports.add(port.lower())
+                places.setdefault(port.lower(), {port.lower()})
+
+    def locate(self, text: str, country: str, known_places=()) -> tuple[set, set]:
+        """(places, ports) named in `text`, within `country`"""
+        country = country.strip().lower()
+        names = dict(self.places.get(country, {}))
+        for place in known_places:
+            if place and place.strip():
+                names.setdefault(place.strip().lower(), {place.strip().lower()})
+        places, ports = set(), set()
+        for name in find_names(text, names):
+            places |= names[name]
+            if name in self.ports.get(country, ()):
+                ports.add(name)
+        return places, ports
+
+
+gazetteer = Gazetteer()
+
+
+def geo_match(text: str, country: str, regions, cities, port_levels, country_places=()) -> bool:
+    """
+    Whether an article in `country` can affect a supplier located in
+    `regions` / `cities` with the given port dependency levels:
+    - it names one of the supplier's regions or cities, or
+    - it is about ports and the supplier depends on ports, unless it only
+      names other places without naming a port, or
+    - it names no place in the country at all (country-wide news).
+    """
+    if not GEO_MATCHING:
+        return True
+    places, ports = gazetteer.locate(text, country, country_places)
+    supplier_places = {p.strip().lower() for p in (*regions, *cities) if p and p.strip()}
+    port_related = bool(ports) or bool(PORT_WORDS.search(text))
+    port_dependent = any(str(level).strip().lower() in GEO_PORT_DEPENDENCY for level in port_levels)
+
+    matched = (
+        bool(places & supplier_places)
+        or (port_related and port_dependent and (bool(ports) or not places))
+        or (not places and not port_related)
+    )
+    with _lock:
+        _stats["routed" if matched else "skipped"] += 1
+    return matched
+
+
+# ============================================================
+# PATHWAY TABLES
+# ============================================================
+def build_supplier_geo(supply_chain):
+    """
+    One row per (supplier_firm, source_country): the supplier's distinct
+    regions, cities and port dependency levels, plus every region and city
+    known in its country.
+    """
+    import pathway as pw
+
+    locations = supply_chain.groupby(
+        pw.this.supplier_firm, pw.this.source_country, pw.this.source_region,
+        pw.this.source_city, pw.this.port_dependency
+    ).reduce(
+        supplier=pw.this.supplier_firm,
+        country=pw.this.source_country,
+        region=pw.this.source_region,
+        city=pw.this.source_city,
+        port_dependency=pw.this.port_dependency,
+    )
+    suppliers = locations.groupby(pw.this.supplier, pw.this.country).reduce(
+        supplier=pw.this.supplier,
+        country=pw.this.country,
+        regions=pw.reducers.tuple(pw.this.region),
+        cities=pw.reducers.tuple(pw.this.city),
+        port_levels=pw.reducers.tuple(pw.this.port_dependency),
+    )
+    country_places = locations.groupby(pw.this.country, pw.this.region, pw.this.city).reduce(
+        country=pw.this.country,
+        region=pw.this.region,
+        city=pw.this.city,
+    ).groupby(pw.this.country).reduce(
+        country=pw.this.country,
+        regions=pw.reducers.tuple(pw.this.region),
+        cities=pw.reducers.tuple(pw.this.city),
+    )
+    return suppliers.join(country_places, pw.left.country == pw.right.country).select(
+        *pw.left,
+        country_regions=pw.right.regions,
+        country_cities=pw.right.cities,
+    )
+
+
+def route_by_geo(candidates, supplier_geo):
+    """Candidates (`supplier`, `country`, `headline`, `description`) whose article can affect the supplier"""
+    import pathway as pw
+
+    if not GEO_MATCHING:
+        return candidates
+
+    @pw.udf
+    def matches(headline: str, description: str, country: str, regions: tuple, cities: tuple,
+                port_levels: tuple, country_regions: tuple, country_cities: tuple) -> bool:
+        return geo_match(
+            f"{headline} {description}", country, regions, cities, port_levels,
+            (*country_regions, *country_cities),
+        )
+
+    return candidates.join(
+        supplier_geo,
+        pw.left.supplier == pw.right.supplier,
+        pw.left.country == pw.right.country,
+    ).select(
+        *pw.left,
+        geo_match=matches(
+            pw.left.headline, pw.left.description, pw.left.country,
+            pw.right.regions, pw.right.cities, pw.right.port_levels,
+            pw.right.country_regions, pw.right.country_cities,
+        ),
+    ).filter(pw.this.geo_match).without(pw.this.geo_match)
@@ -0,0 +1,113 @@
+# latency_metrics.py
+# In-process latency histograms for the alert pipeline, served by the proxy's /metrics.
+#
+# Two kinds of measurements are kept:
+#   stages    - seconds from the simulator emitting a row (emitted_at) until the
+#               record reached that stage: ingested, grouped, news_fetched,
+#               keyword_filtered, llm_validated, written
+#   durations - seconds spent inside one expensive step (news_fetch, llm_validate)
+import time
+import threading
+from collections import deque
+
+STAGES = ["ingested", "grouped", "news_fetched", "keyword_filtered", "llm_validated", "written"]
+
+# Samples kept per histogram for percentile estimates
+RESERVOIR_SIZE = 10000
+
+# Cumulative bucket upper bounds in seconds
+BUCKETS = [0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, float("inf")]
+
+
+class LatencyHistogram:
+    """Bucket counts plus a bounded reservoir of recent samples for p50/p95/p99"""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = [0] * len(BUCKETS)
+        self.samples = deque(maxlen=RESERVOIR_SIZE)
+
+    def observe(self, seconds: float):
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        self.samples.append(seconds)
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                self.buckets[i] += 1
+                break
+
+    def snapshot(self) -> dict:
+        ordered = sorted(self.samples)
+
+        def percentile(q):
+            if not ordered:
+                return None
+            return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))], 4)
+
+        cumulative, running = {}, 0
+        for bound, n in zip(BUCKETS, self.buckets):
+            running += n
+            cumulative["+Inf" if bound == float("inf") else str(bound)] = running
+
+        return {
+            "count": self.count,
+            "mean": round(self.total / self.count, 4) if self.count else None,
+            "max": round(self.max, 4),
+            "p50": percentile(0.50),
+            "p95": percentile(0.95),
+            "p99": percentile(0.99),
+            "buckets": cumulative,
+        }
+
+
+_lock = threading.Lock()
+_stages = {stage: LatencyHistogram() for stage in STAGES}
+_durations = {}
+
+
+def observe_stage(stage: str, emitted_at: float):
+    """Record that a record emitted at `emitted_at` (unix seconds) reached `stage` now"""
+    # Values flattened out of a UDF result arrive wrapped as pw.Json
+    emitted_at = getattr(emitted_at, "value", emitted_at)
+    try:
+        emitted_at = float(emitted_at)
+    except (TypeError, ValueError):
+        return
+    if not emitted_at:
+        # Rows without an emission timestamp (older streams) are not measured
+        return
+    elapsed = max(0.0, time.time() - emitted_at)
+    with _lock:
+        _stages.setdefault(stage, LatencyHistogram()).observe(elapsed)
+
+
+def observe_duration(step: str, seconds: float):
+    """Record time spent in one step, independent of when the record was emitted"""
+    with _lock:
+        _durations.setdefault(step, LatencyHistogram()).observe(seconds)
+
+
+class timed:
+    """Context manager recording the duration of a step: `with timed("news_fetch"): ...`"""
+
+    def __init__(self, step: str):
+        self.step = step
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        observe_duration(self.step, time.perf_counter() - self.start)
+        return False
+
+
+def snapshot() -> dict:
+    with _lock:
+        return {
+            "stages": {name: hist.snapshot() for name, hist in _stages.items()},
+            "durations": {name: hist.snapshot() for name, hist in _durations.items()},
+        }
@@ -0,0 +1,89 @@
+# live_views.py
+# Distinct-value lists (countries, companies) kept up to date by the Pathway
+# graph. The pipeline pushes groupby results in through pw.io.subscribe and
+# the proxy serves the sorted list and its ETag, computed once per change.
+import json
+import hashlib
+import threading
+
+from state_saver import StateSaver
+
+
+def etag_for(values: list) -> str:
+    digest = hashlib.sha1(json.dumps(values).encode("utf-8")).hexdigest()[:16]
+    return f'"{digest}"'
+
+
+class LiveListView:
+    """Sorted distinct values of one column of a Pathway table"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.column = None
+        self.attached = False
+        self.saver = None
+        self._lock = threading.Lock()
+        self._values = {}
+        self._dirty = False     # sorted list and ETag are stale
+        self._unsaved = False   # changed since the save was last scheduled
+        self._sorted = []
+        self._etag = etag_for([])
+
+    def on_change(self, key, row: dict, time, is_addition: bool):
+        with self._lock:
+            if is_addition:
+                self._values[str(key)] = row[self.column]
+            else:
+                self._values.pop(str(key), None)
+            self._dirty = self._unsaved = True
+
+    def on_time_end(self, time):
+        # Sorting waits for the next read; only the save is scheduled here
+        with self._lock:
+            unsaved, self._unsaved = self._unsaved, False
+        if unsaved and self.saver:
+            self.saver.mark_changed()
+
+    def _copy(self) -> dict:
+        with self._lock:
+            return dict(self._values)
+
+    def attach(self, table, column: str, state_file=None, resume: bool = False):
+        """
+        Subscribe to a table holding one row per distinct value in `column`.
+
+        Pathway does not re-send rows emitted before a checkpoint, so with
+        persistence the view is saved to `state_file` and reloaded on resume.
+        """
+        import pathway as pw
+        self.column = column
+        if state_file:
+            self.saver = StateSaver(state_file, self._copy)
+            saved = self.saver.load() if resume else None
+            if saved is not None:
+                with self._lock:
+                    self._values = saved
+                    self._dirty = True
+        pw.io.subscribe(table, on_change=self.on_change, on_time_end=self.on_time_end)
+        self.attached = True
+
+    def snapshot(self) -> tuple[list, str]:
+        """(sorted values, ETag) - recomputed only after a change"""
+        with self._lock:
+            if self._dirty:
+                self._sorted = sorted(set(self._values.values()))
+                self._etag = etag_for(self._sorted)
+                self._dirty = False
+            return self._sorted, self._etag
+
+
+_views = {}
+_views_lock = threading.Lock()
+
+
+def get_view(name: str) -> LiveListView:
+    """Process-wide view by name, shared by the pipeline and the proxy"""
+    with _views_lock:
+        if name not in _views:
+            _views[name] = LiveListView(name)
+        return _views[name]
@@ -1,24 +1,33 @@
 # llm_validator.py
 import os
-import json
-import requests
+import gemini_client
+from pre_classifier import pre_classifier
 
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 if not GEMINI_API_KEY:
     raise RuntimeError("❌ GEMINI_API_KEY not set")
 
 # Gemini 2.0 Flash (fast + cheap, REST)
-GEMINI_URL = (
-    "https://generativelanguage.googleapis.com/v1/models/"
-    "gemini-2.0-flash:generateContent"
-)
+GEMINI_MODEL = "gemini-2.0-flash"
+# Per request; gemini_client retries on top of it
+GEMINI_TIMEOUT_SEC = 10
 
 def is_real_supply_chain_threat(country: str, headline: str, description: str) -> bool:
     """
     Returns True if Gemini says this is a real supply-chain threat,
     False if it is a false positive.
+
+    Raises gemini_client.GeminiError if Gemini is still unavailable after
+    retries, so callers can tell "no verdict" apart from "not a threat".
+
+    Confident cases are answered by the local pre-classifier without a call.
     """
 
+    text = f"{headline}\n{description}"
+    verdict = pre_classifier.decide(text, country)
+    if verdict is not None:
+        return verdict
+
     prompt = f"""
 You are a supply chain risk analyst. Evaluate if this news is a REAL supply chain threat.
 
@@ -42,38 +51,17 @@ REJECT if:
 Answer with ONLY one word: YES or NO
 """
 
-    payload = {
-        "contents": [
-            {
-                "parts": [{"text": prompt}]
-            }
-        ],
-        "generationConfig": {
+    answer = gemini_client.generate_content(
+        prompt,
+        model=GEMINI_MODEL,
+        generation_config={
             "temperature": 0.0,
             "maxOutputTokens": 5
-        }
-    }
-
-    try:
-        resp = requests.post(
-            f"{GEMINI_URL}?key={GEMINI_API_KEY}",
-            headers={"Content-Type": "application/json"},
-            data=json.dumps(payload),
-            timeout=10,
-        )
-
-        resp.raise_for_status()
-        data = resp.json()
-
-        answer = (
-            data["candidates"][0]["content"]["parts"][0]["text"]
-            .strip()
-            .upper()
-        )
-
-        return answer.startswith("YES")
+        },
+        api_key=GEMINI_API_KEY,
+        timeout=GEMINI_TIMEOUT_SEC,
+    )
 
-    except Exception as e:
-        print(f"❌ Gemini validation error: {e}")
-        # Fail-safe: treat as NOT a threat
-        return False
\ No newline at end of file
+    verdict = answer.strip().upper().startswith("YES")
+    pre_classifier.record(text, country, verdict)
+    return verdict
@@ -0,0 +1,150 @@
+# log_sink.py
+# Non-blocking log sink for the alert pipelines. Callers only push a record onto
+# a queue; a background thread formats the records, writes them to the console
+# and the log file in batches and rotates the file by size.
+import os
+import sys
+import json
+import time
+import queue
+import atexit
+import threading
+from datetime import datetime
+from pathlib import Path
+
+# ============================================================
+# CONFIG
+# ============================================================
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()          # DEBUG | INFO | WARNING | ERROR
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text").lower()        # text | json (log file only)
+LOG_MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+LOG_BACKUP_COUNT = int(os.getenv("LOG_BACKUP_COUNT", "5"))
+LOG_FLUSH_SEC = float(os.getenv("LOG_FLUSH_SEC", "0.5"))
+
+LOG_BATCH_SIZE = 500
+LOG_QUEUE_SIZE = 50000
+
+LEVELS = {"DEBUG": 10, "INFO": 20, "WARNING": 30, "ERROR": 40}
+
+
+class LogSink:
+    """
+    Queue-backed writer for one log file.
+
+    emit() never blocks: records below LOG_LEVEL are discarded before any
+    formatting, and if the queue is full the record is dropped and counted.
+    """
+
+    def __init__(self, path: str, header: str = "", timestamps: bool = True):
+        self.path = Path(path)
+        self.timestamps = timestamps
+        self.min_level = LEVELS.get(LOG_LEVEL, LEVELS["INFO"])
+        self.queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+        self.dropped = 0
+        self._dropped_lock = threading.Lock()  # emit() runs on every Pathway worker thread
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # A new run starts a fresh log, like the original "w" open
+        self.file = open(self.path, "w", encoding="utf-8")
+        if header:
+            self.file.write(header)
+            self.file.flush()
+
+        self.worker = threading.Thread(target=self._run, name=f"log-sink-{self.path.name}", daemon=True)
+        self.worker.start()
+        atexit.register(self.close)
+
+    def enabled(self, level: str) -> bool:
+        return LEVELS.get(level, LEVELS["INFO"]) >= self.min_level
+
+    def emit(self, level: str, message: str, args=(), fields=None):
+        """Queue a record; %-style args are only formatted by the writer thread"""
+        if LEVELS.get(level, LEVELS["INFO"]) < self.min_level:
+            return
+        try:
+            self.queue.put_nowait((time.time(), level, message, args, fields))
+        except queue.Full:
+            with self._dropped_lock:
+                self.dropped += 1
+
+    def close(self):
+        """Drain the queue and close the file (runs at interpreter exit)"""
+        if self.file is None:
+            return
+        self.queue.put(None)
+        self.worker.join(timeout=5)
+
+    # ============================================================
+    # WRITER THREAD
+    # ============================================================
+    def _run(self):
+        while True:
+            try:
+                first = self.queue.get(timeout=LOG_FLUSH_SEC)
+            except queue.Empty:
+                continue
+            batch = [first]
+            while len(batch) < LOG_BATCH_SIZE:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            stop = None in batch
+            self._write([record for record in batch if record is not None])
+            if stop:
+                self.file.close()
+                self.file = None
+                return
+
+    def _write(self, records):
+        with self._dropped_lock:
+            dropped, self.dropped = self.dropped, 0
+        if dropped:
+            records.append((time.time(), "WARNING", f"⚠️ {dropped} log records dropped (queue full)", (), None))
+        if not records:
+            return
+
+        console_lines, file_lines = [], []
+        for created, level, message, args, fields in records:
+            if args:
+                try:
+                    message = message % args
+                except (TypeError, ValueError):
+                    message = f"{message} {args}"
+            text = f"[{datetime.fromtimestamp(created).strftime('%H:%M:%S')}] {message}" if self.timestamps else message
+            console_lines.append(text)
+            if LOG_FORMAT == "json":
+                file_lines.append(json.dumps({
+                    "ts": datetime.fromtimestamp(created).isoformat(timespec="milliseconds"),
+                    "level": level,
+                    "msg": message,
+                    **(fields or {}),
+                }, ensure_ascii=False, default=str))
+            else:
+                file_lines.append(text)
+
+        try:
+            sys.stdout.write("\n".join(console_lines) + "\n")
+            sys.stdout.flush()
+        except Exception:
+            pass
+
+        try:
+            self.file.write("\n".join(file_lines) + "\n")
+            self.file.flush()
+            if self.file.tell() >= LOG_MAX_BYTES:
+                self._rotate()
+        except Exception as e:
+            print(f"ERROR writing to log: {e}", flush=True)
+
+    def _rotate(self):
+        """threat.log -> threat.log.1 -> ... -> threat.log.N (oldest dropped)"""
+        self.file.close()
+        for i in range(LOG_BACKUP_COUNT - 1, 0, -1):
+            older = self.path.with_name(f"{self.path.name}.{i}")
+            if older.exists():
+                os.replace(older, self.path.with_name(f"{self.path.name}.{i + 1}"))
+        if LOG_BACKUP_COUNT > 0:
+            os.replace(self.path, self.path.with_name(f"{self.path.name}.1"))
+        self.file = open(self.path, "w", encoding="utf-8")
@@ -0,0 +1,182 @@
+# news_scheduler.py
+# Polls GNews for every active country on its own adaptive interval and feeds
+# the new articles into the Pathway graph as a stream. Each country keeps a
+# publishedAt watermark, so a poll only asks for articles newer than the last
+# one seen. Intervals shrink after a validated threat and grow while a country
+# stays quiet.
+import os
+import json
+import time
+import threading
+from pathlib import Path
+
+import pathway as pw
+
+# ============================================================
+# CONFIG
+# ============================================================
+NEWS_POLL_MIN_SEC = float(os.getenv("NEWS_POLL_MIN_SEC", "300"))      # after a recent threat
+NEWS_POLL_BASE_SEC = float(os.getenv("NEWS_POLL_BASE_SEC", "900"))    # when new articles keep arriving
+NEWS_POLL_MAX_SEC = float(os.getenv("NEWS_POLL_MAX_SEC", "3600"))     # upper bound for quiet countries
+NEWS_HOT_WINDOW_SEC = float(os.getenv("NEWS_HOT_WINDOW_SEC", "3600")) # how long a threat keeps a country "hot"
+NEWS_SCHEDULER_TICK_SEC = float(os.getenv("NEWS_SCHEDULER_TICK_SEC", "5"))
+
+
+class NewsArticleSchema(pw.Schema):
+    country: str
+    headline: str
+    description: str
+    url: str
+    published_at: str
+    emitted_at: float  # when the scheduler fed the article in, for latency_metrics stages
+
+
+# ============================================================
+# SHARED STATE
+# ============================================================
+_lock = threading.Lock()
+_stats = {"polls": 0, "articles": 0, "empty_polls": 0, "failed_polls": 0, "countries": 0}
+
+
+def get_stats() -> dict:
+    with _lock:
+        return dict(_stats)
+
+
+class CountryState:
+    """Watermark and polling interval of one country"""
+
+    def __init__(self, watermark: str = "", interval: float = NEWS_POLL_BASE_SEC,
+                 last_poll: float = 0.0, last_threat: float = 0.0):
+        self.watermark = watermark      # newest publishedAt seen (ISO 8601, compares as a string)
+        self.interval = interval
+        self.last_poll = last_poll
+        self.last_threat = last_threat
+
+    @property
+    def next_due(self) -> float:
+        return self.last_poll + self.interval
+
+    def to_dict(self) -> dict:
+        return dict(vars(self))
+
+
+class NewsScheduler(pw.io.python.ConnectorSubject):
+    """
+    Stream of new GNews articles, one row per article.
+
+    `fetch_news(country, since)` returns GNews articles published after
+    `since`; `active_countries()` returns the countries currently in the
+    supply chain stream. A disabled scheduler (no GNews key) emits nothing.
+    """
+
+    def __init__(self, fetch_news, active_countries, state_file, log=print, enabled: bool = True):
+        super().__init__()
+        self.enabled = enabled
+        self.fetch_news = fetch_news
+        self.active_countries = active_countries
+        self.state_file = Path(state_file)
+        self.log_message = log
+        self._states = self._load()
+
+    # ============================================================
+    # STATE FILE
+    # ============================================================
+    def _load(self) -> dict:
+        if not self.state_file.exists():
+            return {}
+        try:
+            data = json.loads(self.state_file.read_text(encoding="utf-8"))
+            return {country: CountryState(**state) for country, state in data.items()}
+        except (ValueError, TypeError) as e:
+            self.log_message(f"⚠️ Ignoring unreadable news watermarks {self.state_file}: {e}")
+            return {}
+
+    def _save(self):
+        # Write-then-rename so a crash never leaves a truncated file
+        with _lock:
+            data = {country: state.to_dict() for country, state in self._states.items()}
+        self.state_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.state_file.with_suffix(".tmp")
+        tmp.write_text(json.dumps(data, indent=2), encoding="utf-8")
+        os.replace(tmp, self.state_file)
+
+    # ============================================================
+    # SCHEDULING
+    # ============================================================
+    def record_threat(self, country: str):
+        """A validated threat for `country`: poll it again soon"""
+        now = time.time()
+        with _lock:
+            state = self._states.setdefault(country.strip(), CountryState())
+            state.last_threat = now
+            state.interval = NEWS_POLL_MIN_SEC
+
+    def _next_interval(self, state: CountryState, new_articles: int, now: float) -> float:
+        if now - state.last_threat < NEWS_HOT_WINDOW_SEC:
+            return NEWS_POLL_MIN_SEC
+        if new_articles:
+            return NEWS_POLL_BASE_SEC
+        return min(NEWS_POLL_MAX_SEC, max(state.interval, NEWS_POLL_BASE_SEC) * 2)
+
+    def _due(self, now: float) -> list[str]:
+        due = []
+        with _lock:
+            for country in self.active_countries():
+                state = self._states.setdefault(country, CountryState())
+                if state.next_due <= now:
+                    due.append(country)
+            _stats["countries"] = len(self._states)
+        # Most overdue first
+        return sorted(due, key=lambda c: self._states[c].next_due)
+
+    def poll_country(self, country: str):
+        """Fetch articles newer than the country's watermark and emit them"""
+        with _lock:
+            state = self._states[country]
+            since = state.watermark
+        articles = self.fetch_news(country, since or None)
+
+        # Strictly newer than the watermark; GNews `from` is inclusive
+        fresh = [a for a in articles if str(a.get("publishedAt", "")) > since]
+        emitted_at = time.time()
+        for article in fresh:
+            self.next(
+                country=country,
+                headline=str(article.get("title", "")),
+                description=str(article.get("description", "")),
+                url=str(article.get("url", "")),
+                published_at=str(article.get("publishedAt", "")),
+                emitted_at=emitted_at,
+            )
+
+        now = time.time()
+        with _lock:
+            if fresh:
+                state.watermark = max(str(a.get("publishedAt", "")) for a in fresh)
+            state.interval = self._next_interval(state, len(fresh), now)
+            state.last_poll = now
+            _stats["polls"] += 1
+            _stats["articles"] += len(fresh)
+            _stats["empty_polls"] += 0 if fresh else 1
+        self.log_message(f"📰 {country}: {len(fresh)} new article(s), next poll in {state.interval / 60:.0f} min")
+
+    def run(self):
+        if not self.enabled:
+            self.log_message("⚠️ No GNEWS_API_KEY found - news scheduler disabled")
+            return
+        self.log_message("📰 News scheduler started")
+        while True:
+            due = self._due(time.time())
+            for country in due:
+                try:
+                    self.poll_country(country)
+                except Exception as e:
+                    # Not a quiet country: keep its interval and try again when it is due
+                    self.log_message(f"❌ News poll failed for {country}: {e}")
+                    with _lock:
+                        self._states[country].last_poll = time.time()
+                        _stats["failed_polls"] += 1
+            if due:
+                self._save()
+            time.sleep(NEWS_SCHEDULER_TICK_SEC)
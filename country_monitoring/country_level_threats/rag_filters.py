@@ -0,0 +1,73 @@
+# rag_filters.py
+# Metadata filters for RAG queries. Threat documents carry doc_type="threat"
+# plus suppliers / companies, country, threat_type, category and timestamp
+# metadata; a filter narrows retrieval to matching threats and always keeps
+# the policy documents.
+import re
+
+# Request fields and how they match threat metadata
+LIST_FIELDS = {"supplier": "suppliers", "company": "companies"}  # value must be in the metadata list
+EQUAL_FIELDS = {"country": "country", "threat_type": "threat_type", "category": "category"}
+
+
+def literal(value) -> str:
+    """JMESPath raw string literal"""
+    return "'" + str(value).replace("\\", "\\\\").replace("'", "\\'") + "'"
+
+
+def _any_of(values, clause) -> str:
+    values = [values] if isinstance(values, (str, int, float)) else list(values)
+    clauses = [clause(v) for v in values if v not in (None, "")]
+    if not clauses:
+        return ""
+    return clauses[0] if len(clauses) == 1 else "(" + " || ".join(clauses) + ")"
+
+
+def build_filter(filters: dict | None) -> str | None:
+    """
+    JMESPath metadata filter for /v1/retrieve and /v2/answer, e.g.
+    {"country": "China", "supplier": ["Acme", "Globex"], "since": 1767225600}.
+    Values may be a string or a list (any of). Policies always match.
+    """
+    if not filters:
+        return None
+    conditions = []
+    for field, value in filters.items():
+        if value in (None, "", []):
+            continue
+        if field in LIST_FIELDS:
+            key = LIST_FIELDS[field]
+            condition = _any_of(value, lambda v: f"contains({key}, {literal(v)})")
+        elif field in EQUAL_FIELDS:
+            key = EQUAL_FIELDS[field]
+            condition = _any_of(value, lambda v: f"{key} == {literal(v)}")
+        elif field == "since":
+            condition = f"timestamp >= `{float(value)}`"
+        else:
+            raise ValueError(f"Unknown filter field: {field}")
+        if condition:
+            conditions.append(condition)
+    if not conditions:
+        return None
+    return f"doc_type != 'threat' || ({' && '.join(conditions)})"
+
+
+def find_names(prompt: str, names) -> list[str]:
+    """Known names (suppliers, countries...) mentioned in a prompt, longest match first"""
+    text = prompt.lower()
+    found = []
+    for name in sorted({n for n in names if n}, key=len, reverse=True):
+        pattern = r"(?<![a-z0-9])" + re.escape(name.lower()) + r"(?![a-z0-9])"
+        if re.search(pattern, text) and not any(name.lower() in f.lower() for f in found):
+            found.append(name)
+    return found
+
+
+def filters_from_prompt(prompt: str, known: dict) -> dict:
+    """Filter fields for names in the prompt, e.g. known={"country": [...], "supplier": [...]}"""
+    filters = {}
+    for field, names in known.items():
+        found = find_names(prompt, names)
+        if found:
+            filters[field] = found
+    return filters
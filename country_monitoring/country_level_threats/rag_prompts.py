@@ -0,0 +1,25 @@
+# rag_prompts.py
+# Prompt templates shared by the Pathway RAG server and the streaming proxy endpoint
+
+RAG_PROMPT_TEMPLATE = """You are a supply chain risk management assistant.
+
+Use the following context to answer the question about supply chain threats and policies.
+
+Context:
+{context}
+
+Question: {query}
+
+Provide a clear, actionable answer that:
+1. Identifies relevant threats and their severity based on policy rules
+2. Recommends specific actions from policy documents
+3. Highlights which suppliers/countries are affected
+4. Suggests escalation procedures from policy guidelines
+5. References specific policy sections when applicable
+
+If you find matching policy information, say: "Based on [Policy Name] policy section [Section Name]..."
+
+If the context doesn't contain enough information to answer, say "I don't have enough information to answer this question."
+
+Answer:
+"""
@@ -0,0 +1,151 @@
+# story_index.py
+# Near-duplicate story clustering for the alert pipelines. Articles are
+# fingerprinted with SimHash over their normalized headline and description;
+# syndicated variants of one story land in the same cluster, which is
+# validated once and its verdict reused for every member.
+import os
+import re
+import hashlib
+import threading
+from collections import OrderedDict
+
+# ============================================================
+# CONFIG
+# ============================================================
+# Largest Hamming distance (of 64 bits) between fingerprints of one story
+STORY_MAX_DISTANCE = int(os.getenv("STORY_MAX_DISTANCE", "6"))
+STORY_INDEX_SIZE = int(os.getenv("STORY_INDEX_SIZE", "50000"))
+
+# 8 bands of 8 bits: two fingerprints within distance 7 share at least one band
+BANDS = 8
+BAND_BITS = 64 // BANDS
+HEADLINE_WEIGHT = 2
+
+STOPWORDS = {
+    "a", "an", "the", "and", "or", "of", "in", "on", "at", "to", "for", "from", "by", "with",
+    "as", "is", "are", "was", "were", "be", "been", "it", "its", "this", "that", "after",
+    "amid", "over", "into", "says", "said", "new",
+}
+TOKEN = re.compile(r"[a-z0-9]+")
+
+
+def normalize(text: str) -> list[str]:
+    """Lowercased content words, with a trailing plural 's' dropped"""
+    words = []
+    for word in TOKEN.findall(text.lower()):
+        if word in STOPWORDS or len(word) < 2:
+            continue
+        if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]
+        words.append(word)
+    return words
+
+
+def _hash64(word: str) -> int:
+    return int.from_bytes(hashlib.blake2b(word.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def simhash(headline: str, description: str = "") -> int:
+    """64-bit SimHash; word order is ignored, headline words count double"""
+    weights = {}
+    for word in normalize(headline):
+        weights[word] = weights.get(word, 0) + HEADLINE_WEIGHT
+    for word in normalize(description):
+        weights[word] = weights.get(word, 0) + 1
+    totals = [0] * 64
+    for word, weight in weights.items():
+        h = _hash64(word)
+        for bit in range(64):
+            totals[bit] += weight if h >> bit & 1 else -weight
+    return sum(1 << bit for bit in range(64) if totals[bit] > 0)
+
+
+def _bands(fingerprint: int) -> list[int]:
+    mask = (1 << BAND_BITS) - 1
+    return [fingerprint >> (i * BAND_BITS) & mask for i in range(BANDS)]
+
+
+class StoryIndex:
+    """
+    Cluster lookup by fingerprint within a scope (the country or company a
+    verdict depends on), plus the verdict of each cluster.
+
+    resolve() runs the validation once per cluster: concurrent members wait
+    for the first one instead of calling the LLM themselves.
+    """
+
+    def __init__(self, max_distance: int = STORY_MAX_DISTANCE, size: int = STORY_INDEX_SIZE):
+        self.max_distance = max_distance
+        self.size = size
+        self._lock = threading.Lock()
+        self._stories = OrderedDict()  # story id -> (scope, fingerprint), oldest first
+        self._buckets = {}             # (scope, band, value) -> set of story ids
+        self._verdicts = {}            # story id -> bool
+        self._pending = {}             # story id -> threading.Event
+        self.stats = {"articles": 0, "stories": 0, "verdicts_reused": 0}
+
+    def story_id(self, headline: str, description: str, scope: str) -> str:
+        """Id of the story cluster an article belongs to (a new one if no near-duplicate)"""
+        scope = scope.strip().lower()
+        fingerprint = simhash(headline, description)
+        with self._lock:
+            self.stats["articles"] += 1
+            best, best_distance = None, self.max_distance + 1
+            for band, value in enumerate(_bands(fingerprint)):
+                for candidate in self._buckets.get((scope, band, value), ()):
+                    distance = (fingerprint ^ self._stories[candidate][1]).bit_count()
+                    if distance < best_distance:
+                        best, best_distance = candidate, distance
+            if best is not None:
+                return best
+
+            story = f"{scope}:{fingerprint:016x}"
+            self._stories[story] = (scope, fingerprint)
+            for band, value in enumerate(_bands(fingerprint)):
+                self._buckets.setdefault((scope, band, value), set()).add(story)
+            self.stats["stories"] += 1
+            if len(self._stories) > self.size:
+                self._evict()
+            return story
+
+    def _evict(self):
+        story, (scope, fingerprint) = self._stories.popitem(last=False)
+        for band, value in enumerate(_bands(fingerprint)):
+            bucket = self._buckets.get((scope, band, value))
+            if bucket is not None:
+                bucket.discard(story)
+                if not bucket:
+                    del self._buckets[(scope, band, value)]
+        self._verdicts.pop(story, None)
+
+    def resolve(self, story: str, validate) -> bool:
+        """Verdict for a story cluster, calling `validate()` only for its first member"""
+        while True:
+            with self._lock:
+                if story in self._verdicts:
+                    self.stats["verdicts_reused"] += 1
+                    return self._verdicts[story]
+                event = self._pending.get(story)
+                if event is None:
+                    event = self._pending[story] = threading.Event()
+                    break
+            # Another worker is validating this story; if it fails, try ourselves
+            event.wait()
+
+        try:
+            verdict = validate()
+            with self._lock:
+                if story in self._stories:
+                    self._verdicts[story] = verdict
+            return verdict
+        finally:
+            with self._lock:
+                self._pending.pop(story, None)
+            event.set()
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            return {**self.stats, "indexed": len(self._stories)}
+
+
+story_index = StoryIndex()
@@ -1,4 +1,5 @@
 import pathway as pw
+from stream_log import STREAM_FORMAT, SUPPLY_CHAIN_CSV, SUPPLY_CHAIN_STREAM_DIR
 
 # -----------------------------
 # 1. Define schema (NO __key__)
@@ -30,15 +31,33 @@ class SupplyChainSchema(pw.Schema):
     primary_transport_mode: str      # sea, air, road, rail
     port_dependency: str  
 
+    # Unix time the simulator wrote the row (latency metrics); 0 if absent
+    emitted_at: float = pw.column_definition(default_value=0.0)
+
 
 # -----------------------------
-# 2. Read CSV as LIVE stream
+# 2. Read stream as LIVE table
 # -----------------------------
-supply_chain_table = pw.io.csv.read(
-    "data/supply_chain_stream.csv",
-    schema=SupplyChainSchema,
-    mode="streaming",
-)
+# csv:   data/supply_chain_stream.csv, appended row by row
+# jsonl: data/supply_chain_stream/, append-only JSON-lines segments;
+#        each segment is read once, so only new records are consumed.
+#        The directory can be the single log shared with the other
+#        monitoring pipeline; Pathway tracks this reader's own offset.
+
+if STREAM_FORMAT == "jsonl":
+    supply_chain_table = pw.io.jsonlines.read(
+        SUPPLY_CHAIN_STREAM_DIR,
+        schema=SupplyChainSchema,
+        mode="streaming",
+        name="supply_chain_stream",  # stable id for persistence snapshots
+    )
+else:
+    supply_chain_table = pw.io.csv.read(
+        SUPPLY_CHAIN_CSV,
+        schema=SupplyChainSchema,
+        mode="streaming",
+        name="supply_chain_stream",
+    )
 
 # -----------------------------
 # 3. Assign primary key
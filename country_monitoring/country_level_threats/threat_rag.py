@@ -5,13 +5,17 @@ import pathway as pw
 from dotenv import load_dotenv
 
 from pathway.xpacks.llm.document_store import DocumentStore
-from pathway.xpacks.llm.embedders import GeminiEmbedder
+from pathway.xpacks.llm.embedders import GeminiEmbedder, LiteLLMEmbedder
 from pathway.xpacks.llm.llms import LiteLLMChat
 from pathway.xpacks.llm.question_answering import AdaptiveRAGQuestionAnswerer
 from pathway.stdlib.indexing import BruteForceKnnFactory, TantivyBM25Factory, HybridIndexFactory, BruteForceKnnMetricKind
 
+from rag_prompts import RAG_PROMPT_TEMPLATE
+from pathway_config import udf_cache
+from risk_scoreboard import event_time
+
 # Import validated threats from alert pipeline
-from alert_pipeline import validated_threats
+from alert_pipeline import grouped_threats
 
 # ============================================================
 # CONFIG
@@ -22,6 +26,10 @@ THREAT_POLICIES_FOLDER_ID = os.getenv("THREAT_POLICIES_FOLDER_ID")
 GOOGLE_CREDS = os.getenv("GOOGLE_APPLICATION_CREDENTIALS")
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 
+# Optional Gemini endpoint override (e.g. the benchmarks/ stand-in server)
+GEMINI_BASE_URL = os.getenv("GEMINI_BASE_URL")
+LITELLM_ENDPOINT = {"api_base": GEMINI_BASE_URL.rstrip("/") + "/v1beta"} if GEMINI_BASE_URL else {}
+
 if not THREAT_POLICIES_FOLDER_ID:
     raise RuntimeError("❌ THREAT_POLICIES_FOLDER_ID missing")
 if not GOOGLE_CREDS:
@@ -44,6 +52,7 @@ policies_raw = pw.io.gdrive.read(
     ],
     with_metadata=True,
     refresh_interval=300,  # Refresh every 5 minutes
+    name="threat_policies",
 )
 
 # Parse JSONL policies into structured text and return as bytes
@@ -176,7 +185,7 @@ print("🚨 Formatting validated threats as documents...")
 
 @pw.udf
 def format_threat_document_to_bytes(
-    supplier: str,
+    suppliers: list[str],
     country: str, 
     threat_type: str,
     headline: str,
@@ -185,7 +194,7 @@ def format_threat_document_to_bytes(
 ) -> bytes:
     """Format threat alert as a readable document and return as bytes"""
     # Convert all inputs to strings explicitly to handle Pathway types
-    supplier = str(supplier) if supplier is not None else "Unknown"
+    suppliers = ", ".join(str(s) for s in suppliers) if suppliers else "Unknown"
     country = str(country) if country is not None else "Unknown"
     threat_type = str(threat_type) if threat_type is not None else "unknown"
     headline = str(headline) if headline is not None else "No headline"
@@ -196,7 +205,7 @@ def format_threat_document_to_bytes(
 ACTIVE THREAT ALERT
 ===================
 
-Supplier: {supplier}
+Affected Suppliers: {suppliers}
 Country: {country}
 Threat Type: {threat_type.upper()}
 Source: {source}
@@ -207,27 +216,47 @@ Description: {description}
 """
     return text.encode('utf-8')
 
-# Create threats documents with data column (bytes)
-threats_docs = validated_threats.select(
+# Threat metadata for filtered retrieval (see rag_filters.py)
+GEOPOLITICAL_THREATS = {"war", "sanction", "conflict"}
+
+@pw.udf
+def threat_metadata(
+    suppliers: list[str],
+    country: str,
+    threat_type: str,
+    published_at: str | None,
+    emitted_at: float
+) -> dict:
+    """
+    Metadata of a threat document; the category matches the policy files and
+    the timestamp is when the article was published (stream time if unknown)
+    """
+    threat_type = str(threat_type or "unknown").lower()
+    return {
+        "doc_type": "threat",
+        "suppliers": [str(s) for s in suppliers] if suppliers else [],
+        "country": str(country or "").strip(),
+        "threat_type": threat_type,
+        "category": "geopolitical" if threat_type in GEOPOLITICAL_THREATS else "operational",
+        "timestamp": event_time(published_at, emitted_at),
+    }
+
+threats_docs = grouped_threats.select(
     data=format_threat_document_to_bytes(
-        pw.this.supplier,
+        pw.this.suppliers,
         pw.this.country,
         pw.this.threat_type,
         pw.this.headline,
         pw.this.description,
         pw.this.source
-    )
-)
-
-# Add empty metadata to threats - using pw.this reference properly
-@pw.udf
-def create_empty_metadata_dict(data: bytes) -> dict:
-    """Create empty metadata dict - needs at least one arg from table"""
-    return {}
-
-threats_docs = threats_docs.select(
-    data=pw.this.data,
-    _metadata=create_empty_metadata_dict(pw.this.data)
+    ),
+    _metadata=threat_metadata(
+        pw.this.suppliers,
+        pw.this.country,
+        pw.this.threat_type,
+        pw.this.published_at,
+        pw.this.emitted_at
+    ),
 )
 
 # ============================================================
@@ -239,10 +268,20 @@ print("📚 Building document store with hybrid indexing...")
 all_docs = pw.Table.concat_reindex(policies_docs, threats_docs)
 
 # Create embedder
-embedder = GeminiEmbedder(
-    api_key=GEMINI_API_KEY,
-    model="models/text-embedding-004"
-)
+if GEMINI_BASE_URL:
+    # GeminiEmbedder's SDK has no endpoint override; LiteLLM calls the same REST API
+    embedder = LiteLLMEmbedder(
+        model="gemini/text-embedding-004",
+        api_key=GEMINI_API_KEY,
+        cache_strategy=udf_cache(),
+        **LITELLM_ENDPOINT,
+    )
+else:
+    embedder = GeminiEmbedder(
+        api_key=GEMINI_API_KEY,
+        model="models/text-embedding-004",
+        cache_strategy=udf_cache(),
+    )
 
 # Create KNN index factory
 knn_index = BruteForceKnnFactory(
@@ -277,6 +316,8 @@ llm = LiteLLMChat(
     model="gemini/gemini-2.0-flash-exp",
     api_key=GEMINI_API_KEY,
     temperature=0.1,
+    cache_strategy=udf_cache(),
+    **LITELLM_ENDPOINT,
 )
 
 rag_app = AdaptiveRAGQuestionAnswerer(
@@ -285,28 +326,7 @@ rag_app = AdaptiveRAGQuestionAnswerer(
     n_starting_documents=3,  # Start with 3 documents
     factor=2,  # Double each iteration
     max_iterations=4,  # Max 4 iterations (3, 6, 12, 24 docs)
-    prompt_template="""You are a supply chain risk management assistant.
-
-Use the following context to answer the question about supply chain threats and policies.
-
-Context:
-{context}
-
-Question: {query}
-
-Provide a clear, actionable answer that:
-1. Identifies relevant threats and their severity based on policy rules
-2. Recommends specific actions from policy documents
-3. Highlights which suppliers/countries are affected
-4. Suggests escalation procedures from policy guidelines
-5. References specific policy sections when applicable
-
-If you find matching policy information, say: "Based on [Policy Name] policy section [Section Name]..."
-
-If the context doesn't contain enough information to answer, say "I don't have enough information to answer this question."
-
-Answer:
-"""
+    prompt_template=RAG_PROMPT_TEMPLATE,
 )
 
 # ============================================================
@@ -0,0 +1,183 @@
+# threat_store.py
+# Current set of validated threats in SQLite. The pipeline applies Pathway's
+# insertions and retractions to it, so the table only holds live threats
+# (unlike a csv diff log that grows with every change).
+import os
+import json
+import time
+import sqlite3
+import threading
+from pathlib import Path
+
+THREAT_DB = os.getenv("THREAT_DB", "output/threats.db")
+
+
+def _plain(value):
+    """SQLite-friendly value from a Pathway cell (pw.Json, str, number...)"""
+    value = getattr(value, "value", value)
+    if value is None or isinstance(value, (str, int, float)):
+        return value
+    return json.dumps(value, default=str)
+
+
+def _names(value) -> set[str]:
+    """Lowercase names of a list cell (Python list, pw.Json or JSON text)"""
+    value = getattr(value, "value", value)
+    if isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except ValueError:
+            value = [value]
+    if not isinstance(value, (list, tuple)):
+        return set()
+    return {str(name).strip().lower() for name in value if str(name).strip()}
+
+
+def _now() -> float:
+    # on_time_end's `time` argument (named by pw.io.subscribe) shadows the module
+    return time.time()
+
+
+class ThreatStore:
+    """
+    Writer side of the store, fed by pw.io.subscribe.
+
+    Changes are collected per Pathway timestamp and committed in one
+    transaction when the timestamp closes. An update arrives as a retraction
+    plus an insertion of the same key, so a key is deleted only if it was
+    retracted without being re-inserted at that timestamp.
+
+    With several Pathway worker threads each worker calls on_change and
+    on_time_end for its own shard, so changes are buffered per thread and a
+    worker only commits its own.
+
+    List columns in `name_columns` (suppliers, companies) are also kept one
+    row per (threat key, lowercase name) in an indexed threat_<column> table,
+    updated in the same transaction, so read_threats can filter on them.
+    """
+
+    def __init__(self, columns: list[str], indexes: list[str], path: str = THREAT_DB, reset: bool = True,
+                 name_columns: list[str] = ()):
+        self.columns = list(columns)
+        self.name_columns = list(name_columns)
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._pending = {}  # thread id -> (upserts, deletes)
+
+        self.conn = sqlite3.connect(self.path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        existing = [row[1] for row in self.conn.execute("PRAGMA table_info(threats)")]
+        if reset or (existing and existing != ["key", *self.columns, "detected_at"]):
+            # Fresh run (or new columns): the pipeline re-emits every threat. When
+            # resuming from a Pathway checkpoint only new changes arrive, so the
+            # table is kept.
+            self.conn.execute("DROP TABLE IF EXISTS threats")
+            for column in self.name_columns:
+                self.conn.execute(f'DROP TABLE IF EXISTS "threat_{column}"')
+        column_defs = ", ".join(f'"{c}"' for c in self.columns)
+        self.conn.execute(f'CREATE TABLE IF NOT EXISTS threats (key TEXT PRIMARY KEY, {column_defs}, detected_at REAL)')
+        for column in indexes:
+            self.conn.execute(f'CREATE INDEX IF NOT EXISTS idx_threats_{column} ON threats ("{column}")')
+        for column in self.name_columns:
+            missing = not _table_exists(self.conn, f"threat_{column}")
+            self.conn.execute(f'CREATE TABLE IF NOT EXISTS "threat_{column}" (key TEXT NOT NULL, name TEXT NOT NULL)')
+            self.conn.execute(f'CREATE INDEX IF NOT EXISTS "idx_threat_{column}_name" ON "threat_{column}" (name, key)')
+            self.conn.execute(f'CREATE INDEX IF NOT EXISTS "idx_threat_{column}_key" ON "threat_{column}" (key)')
+            if missing:
+                # Resuming with a store written before this table existed
+                self.conn.executemany(
+                    f'INSERT INTO "threat_{column}" (key, name) VALUES (?, ?)',
+                    [(key, name) for key, value in self.conn.execute(f'SELECT key, "{column}" FROM threats')
+                     for name in _names(value)],
+                )
+        self.conn.commit()
+
+    def on_change(self, key, row: dict, time, is_addition: bool):
+        with self._lock:
+            upserts, deletes = self._pending.setdefault(threading.get_ident(), ({}, set()))
+            if is_addition:
+                upserts[str(key)] = row
+            else:
+                deletes.add(str(key))
+
+    def on_time_end(self, time):
+        with self._lock:
+            upserts, deletes = self._pending.pop(threading.get_ident(), ({}, set()))
+        deletes = deletes - upserts.keys()
+        if not upserts and not deletes:
+            return
+
+        now = _now()
+        placeholders = ", ".join("?" for _ in range(len(self.columns) + 2))
+        column_list = ", ".join(f'"{c}"' for c in self.columns)
+        with self._lock, self.conn:
+            self.conn.executemany("DELETE FROM threats WHERE key = ?", [(k,) for k in deletes])
+            self.conn.executemany(
+                f"INSERT OR REPLACE INTO threats (key, {column_list}, detected_at) VALUES ({placeholders})",
+                [(k, *(_plain(row.get(c)) for c in self.columns), now) for k, row in upserts.items()],
+            )
+            for column in self.name_columns:
+                self.conn.executemany(
+                    f'DELETE FROM "threat_{column}" WHERE key = ?', [(k,) for k in (*deletes, *upserts)]
+                )
+                self.conn.executemany(
+                    f'INSERT INTO "threat_{column}" (key, name) VALUES (?, ?)',
+                    [(k, name) for k, row in upserts.items() for name in _names(row.get(column))],
+                )
+
+    def attach(self, table):
+        """Subscribe the store to a Pathway table"""
+        import pathway as pw
+        pw.io.subscribe(table, on_change=self.on_change, on_time_end=self.on_time_end)
+
+
+def _table_exists(conn, name: str) -> bool:
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (name,)).fetchone() is not None
+
+
+def read_threats(filters: dict | None = None, order_by: str = "detected_at", descending: bool = False,
+                 limit: int | None = None, path: str = THREAT_DB) -> list[dict]:
+    """
+    Live threats matching equality filters, e.g. read_threats({"country": "China"});
+    a list value matches any of its items. A filter on a name column, e.g.
+    {"suppliers": ["Acme"]}, matches threats listing any of the names (any
+    case) through the indexed threat_<column> table.
+    """
+    if not Path(path).exists():
+        return []
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    conn.row_factory = sqlite3.Row
+    try:
+        columns = {row["name"] for row in conn.execute("PRAGMA table_info(threats)")}
+        if not columns:
+            return []
+        filters = filters or {}
+        for column in [*filters, order_by]:
+            if column not in columns:
+                raise ValueError(f"Unknown column: {column}")
+
+        query = "SELECT * FROM threats"
+        conditions, params = [], []
+        for column, value in filters.items():
+            if _table_exists(conn, f"threat_{column}"):
+                names = sorted(_names(list(value) if isinstance(value, (list, tuple, set)) else [value]))
+                conditions.append(
+                    f'key IN (SELECT key FROM "threat_{column}" WHERE name IN ({", ".join("?" for _ in names)}))'
+                )
+                params.extend(names)
+            elif isinstance(value, (list, tuple, set)):
+                conditions.append(f'"{column}" IN ({", ".join("?" for _ in value)})')
+                params.extend(value)
+            else:
+                conditions.append(f'"{column}" = ?')
+                params.append(value)
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += f' ORDER BY "{order_by}" {"DESC" if descending else "ASC"}, rowid'
+        if limit:
+            query += f" LIMIT {int(limit)}"
+        return [dict(row) for row in conn.execute(query, params)]
+    finally:
+        conn.close()
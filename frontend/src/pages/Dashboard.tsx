@@ -86,7 +86,7 @@ export default function Dashboard() {
         const companies = (await repCompaniesRes.json()).companies || [];
         const threats = (await repThreatsRes.json()).threats || [];
 
-        const companiesWithThreats = new Set(threats.map(t => t.supplier || t.company));
+        const companiesWithThreats = new Set(threats.flatMap(t => t.suppliers || [t.supplier || t.company]));
         setReputationalStats({
           total: companies.length,
           withThreats: companiesWithThreats.size
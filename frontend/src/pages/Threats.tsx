@@ -26,6 +26,7 @@ interface Message {
 
 interface ValidatedThreat {
   supplier: string;
+  suppliers?: string[];
   country: string;
   threat_type: string;
   headline: string;
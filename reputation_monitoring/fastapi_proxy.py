@@ -1,12 +1,27 @@
-from fastapi import FastAPI, HTTPException, UploadFile, File, Form
+from fastapi import FastAPI, HTTPException, UploadFile, File, Form, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse, JSONResponse, Response
 from pydantic import BaseModel
+from typing import Optional
 import requests
 import os
-import csv
+import json
 import shutil
 import threading
 from pathlib import Path
+from rag_prompts import RAG_PROMPT_TEMPLATE
+import gemini_client
+import latency_metrics
+import cassette
+import query_router
+from pre_classifier import pre_classifier
+from story_index import story_index
+from risk_scoreboard import risk_board
+from stream_log import StreamConsumer
+from threat_store import read_threats, THREAT_DB
+from live_views import get_view, etag_for
+from rag_filters import build_filter, filters_from_prompt
+import pathway_config
 
 app = FastAPI(title="Reputation Monitoring Proxy API")
 
@@ -21,10 +36,19 @@ app.add_middleware(
 
 # Paths
 PATHWAY_URL = "http://localhost:8002"
-THREATS_CSV = "output/validated_threats.csv"
-STREAM_CSV = "data/supply_chain_stream.csv"
 CREDENTIALS_FILE = "credentials.json"
 
+# Streaming answers call Gemini directly with context retrieved from Pathway
+GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
+GEMINI_MODEL = "gemini-2.0-flash-exp"
+STREAM_CONTEXT_DOCS = int(os.getenv("STREAM_CONTEXT_DOCS", "10"))
+STREAM_TEMPERATURE = 0.1
+STREAM_MAX_TOKENS = 1000
+# Streamed text held back until this long, so "I don't know" answers are replaced before any is sent
+STREAM_HOLDBACK_CHARS = int(os.getenv("STREAM_HOLDBACK_CHARS", "80"))
+
+NO_THREATS_ANSWER = "There are no reputational threats for this supplier."
+
 # Global state
 config_status = {
     "initialized": False,
@@ -33,9 +57,66 @@ config_status = {
 }
 pathway_thread = None
 
+# Distinct companies, pushed in by the Pathway pipeline once it runs
+company_view = get_view("companies")
+
+# Fallback before the pipeline starts: reads only records appended since the last request
+stream_consumer = StreamConsumer("reputation_proxy")
+known_companies = set()
+
 class QueryRequest(BaseModel):
     prompt: str
     return_context_docs: bool = False
+    # Threat metadata filter, e.g. {"company": "Acme", "category": "Finance", "since": 1767225600};
+    # when omitted, companies named in the prompt are used
+    filters: Optional[dict] = None
+
+def known_names() -> dict:
+    """Companies the pipeline has seen, by filter field"""
+    return {"company": company_view.snapshot()[0]}
+
+def route_lookup(request: QueryRequest) -> Optional[dict]:
+    """Filter fields when the prompt is a plain threat lookup (see query_router.py)"""
+    if request.filters is not None:
+        return None
+    return query_router.route(request.prompt, known_names())
+
+def query_filter(request: QueryRequest) -> Optional[str]:
+    """JMESPath metadata filter for a question (see rag_filters.py)"""
+    filters = request.filters
+    if filters is None:
+        filters = filters_from_prompt(request.prompt, known_names())
+    try:
+        return build_filter(filters)
+    except (TypeError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid filters: {e}")
+
+def is_no_answer(answer: str) -> bool:
+    """Whether the model answered "I don't know" style, shown as NO_THREATS_ANSWER instead"""
+    return "I don't" in answer or "I do not" in answer or "not enough information" in answer.lower()
+
+def sse_event(payload: dict) -> str:
+    """Format a payload as a server-sent event"""
+    return f"data: {json.dumps(payload)}\n\n"
+
+def retrieve_context(query: str, k: int, metadata_filter: Optional[str] = None) -> str:
+    """Fetch the top-k documents for a query from the Pathway document store"""
+    response = requests.post(
+        f"{PATHWAY_URL}/v1/retrieve",
+        json={"query": query, "k": k, "metadata_filter": metadata_filter},
+        timeout=(10, 30)
+    )
+    response.raise_for_status()
+    return "\n\n".join(doc.get("text", "") for doc in response.json())
+
+def stream_gemini(prompt: str, temperature: float, max_tokens: int):
+    """Yield answer text from Gemini streamGenerateContent as it is generated"""
+    yield from gemini_client.stream_generate_content(
+        prompt,
+        model=GEMINI_MODEL,
+        generation_config={"temperature": temperature, "maxOutputTokens": max_tokens},
+        api_key=GEMINI_API_KEY,
+    )
 
 def run_pathway_server():
     """Background task to initialize and run Reputation Pathway"""
@@ -57,7 +138,7 @@ def run_pathway_server():
         config_status["message"] = "Reputation monitoring active"
         
         print("🚀 Reputation Pathway pipeline starting...")
-        pw.run()
+        pathway_config.run()
     except Exception as e:
         config_status["message"] = f"Error: {str(e)}"
         config_status["initialized"] = False
@@ -93,68 +174,136 @@ async def get_config_status():
 
 @app.post("/proxy-answer")
 async def proxy_answer(request: QueryRequest):
-    """Proxy endpoint for querying the RAG system."""
+    """Answer lookups from the threat store; proxy other questions to the RAG system, scoped by their metadata filter."""
+    lookup = route_lookup(request)
+    if lookup:
+        result = query_router.answer(request.prompt, lookup, GEMINI_API_KEY)
+        if not result["threats"]:
+            result["response"] = NO_THREATS_ANSWER
+        return result
+    
+    payload = {**request.dict(), "filters": query_filter(request)}
     try:
         response = requests.post(
             f"{PATHWAY_URL}/v2/answer",
-            json=request.dict(),
+            json=payload,
             timeout=60, # Increased timeout
         )
         response.raise_for_status()
         data = response.json()
         
         # INTERCEPTION: Handle "I don't know" style responses
-        answer = data.get("result", "")
-        if "I don't" in answer or "I do not" in answer or "not enough information" in answer.lower():
-            data["result"] = "There are no reputational threats for this supplier."
+        if is_no_answer(data.get("result", "")):
+            data["result"] = NO_THREATS_ANSWER
             
         return data
     except requests.exceptions.RequestException as e:
         raise HTTPException(status_code=500, detail=f"Pathway API error: {str(e)}")
 
+@app.post("/proxy-answer/stream")
+async def proxy_answer_stream(request: QueryRequest):
+    """Stream a RAG answer as server-sent events.
+
+    Retrieves context from the Pathway document store in a single pass and streams
+    the Gemini answer, emitting {"type": "chunk", "text": ...} events and a final
+    {"type": "done"} event. Lookups are answered from the threat store in one chunk.
+    "I don't know" style answers are replaced as in /proxy-answer: the first
+    STREAM_HOLDBACK_CHARS are held back, and if the phrase only shows up later a
+    {"type": "replace", "text": ...} event carries the full replacement answer.
+    """
+    lookup = route_lookup(request)
+    if lookup:
+        result = query_router.answer(request.prompt, lookup, GEMINI_API_KEY)
+        response = result["response"] if result["threats"] else NO_THREATS_ANSWER
+        events = [sse_event({"type": "chunk", "text": response}), sse_event({"type": "done"})]
+        return StreamingResponse(iter(events), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+    
+    metadata_filter = query_filter(request)
+    try:
+        context = retrieve_context(request.prompt, STREAM_CONTEXT_DOCS, metadata_filter)
+    except requests.exceptions.RequestException as e:
+        raise HTTPException(status_code=500, detail=f"Pathway API error: {str(e)}")
+    
+    prompt = RAG_PROMPT_TEMPLATE.format(context=context, query=request.prompt)
+    
+    def event_stream():
+        try:
+            answer, sent = "", 0
+            for text in stream_gemini(prompt, STREAM_TEMPERATURE, STREAM_MAX_TOKENS):
+                answer += text
+                if len(answer) >= STREAM_HOLDBACK_CHARS and not is_no_answer(answer):
+                    yield sse_event({"type": "chunk", "text": answer[sent:]})
+                    sent = len(answer)
+            if is_no_answer(answer):
+                yield sse_event({"type": "replace" if sent else "chunk", "text": NO_THREATS_ANSWER})
+            elif sent < len(answer):
+                yield sse_event({"type": "chunk", "text": answer[sent:]})
+            yield sse_event({"type": "done"})
+        except Exception as e:
+            yield sse_event({"type": "error", "detail": str(e)})
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @app.get("/threats")
 async def get_threats():
-    """Get all validated threats from CSV with deduplication"""
+    """Get all validated threats from the threat store, one per story with its companies"""
     try:
         threats = []
-        seen_headlines = set()
-        if not Path(THREATS_CSV).exists():
-            return {"threats": []}
-            
-        with open(THREATS_CSV, 'r', encoding='utf-8') as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                headline = row.get("headline", "").strip()
-                if headline and headline not in seen_headlines:
-                    threats.append({
-                        "supplier": row.get("company", row.get("supplier", "")),
-                        "country": row.get("category", row.get("country", "")), 
-                        "threat_type": row.get("threat_type", ""),
-                        "headline": headline,
-                        "description": row.get("description", ""),
-                        "source": row.get("source", ""),
-                        "timestamp": row.get("timestamp", "")
-                    })
-                    seen_headlines.add(headline)
+        # Live threats only, already deduplicated by the pipeline
+        for row in read_threats():
+            companies = json.loads(row.get("companies") or "[]")
+            threats.append({
+                "supplier": ", ".join(companies),
+                "suppliers": companies,
+                "country": row.get("category") or "",
+                "threat_type": row.get("threat_type") or "",
+                "headline": (row.get("headline") or "").strip(),
+                "description": row.get("description") or "",
+                "source": row.get("source") or "",
+                "timestamp": row.get("timestamp") or ""
+            })
         return {"threats": threats}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/risk")
+async def get_risk_ranking(limit: int = 20):
+    """Highest-risk companies first, from the Pathway-maintained scoreboard (see risk_scoreboard.py)"""
+    return {"suppliers": risk_board.top(max(1, min(limit, 500)))}
+
+@app.get("/risk/{supplier}")
+async def get_supplier_risk(supplier: str):
+    """Risk score, threat counts by type and last-seen time of one company (O(1) lookup)"""
+    risk = risk_board.lookup(supplier)
+    if risk is None:
+        # No validated threats for this company
+        return {"supplier": supplier, "risk_score": 0.0, "recency_weighted_severity": 0.0,
+                "threats": 0, "by_type": {}, "last_seen": None}
+    return risk
+
 @app.get("/companies")
-async def get_companies():
-    """Get unique companies from reputation stream"""
+async def get_companies(request: Request):
+    """Get unique companies from reputation stream (supports If-None-Match / 304)"""
     try:
-        companies = set()
-        if not Path(STREAM_CSV).exists():
-            return {"companies": []}
-            
-        with open(STREAM_CSV, 'r', encoding='utf-8') as f:
-            reader = csv.DictReader(f)
-            for row in reader:
+        if company_view.attached:
+            # Maintained by the Pathway graph, see live_views.py
+            companies, etag = company_view.snapshot()
+        else:
+            # Pipeline not running yet - read new stream records directly
+            for row in stream_consumer.poll():
                 company = row.get("supplier_firm", "").strip()
                 if company:
-                    companies.add(company)
-        return {"companies": sorted(list(companies))}
+                    known_companies.add(company)
+            companies = sorted(known_companies)
+            etag = etag_for(companies)
+        
+        if request.headers.get("if-none-match") == etag:
+            return Response(status_code=304, headers={"ETag": etag})
+        return JSONResponse({"companies": companies}, headers={"ETag": etag})
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -163,22 +312,31 @@ async def health_check():
     return {
         "status": "healthy", 
         "initialized": config_status["initialized"],
-        "threats_available": Path(THREATS_CSV).exists()
+        "threats_available": Path(THREAT_DB).exists()
+    }
+
+@app.get("/metrics")
+async def get_metrics():
+    """Per-stage pipeline latency (p50/p95/p99), Gemini client, cassette, pre-classifier and query router stats"""
+    return {
+        "latency": latency_metrics.snapshot(),
+        "gemini": gemini_client.get_stats(),
+        "cassette": cassette.get_stats(),
+        "pre_classifier": pre_classifier.get_stats(),
+        "stories": story_index.get_stats(),
+        "router": query_router.get_stats(),
     }
 
 @app.get("/fake-industries")
 async def get_fake_industries():
     """Get latest 5 fake industry threats"""
     try:
-        threats = []
-        if os.path.exists(THREATS_CSV):
-            with open(THREATS_CSV, 'r', encoding='utf-8') as f:
-                reader = csv.DictReader(f)
-                threats = [row for row in reader]
-        
-        fake_threats = [t for t in threats if t.get('category') == 'fake']
-        fake_threats.sort(key=lambda x: x.get('timestamp', ''), reverse=True)
-        return {"fake_industries": fake_threats[:5]}
+        # Served from the (category, timestamp) indexes of the threat store
+        fake_threats = read_threats({"category": "fake"}, order_by="timestamp", descending=True, limit=5)
+        for threat in fake_threats:
+            threat.pop("key", None)
+            threat["companies"] = json.loads(threat.get("companies") or "[]")
+        return {"fake_industries": fake_threats}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
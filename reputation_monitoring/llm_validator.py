@@ -1,17 +1,16 @@
 # llm_validator.py
 import os
-import json
-import requests
+import gemini_client
+from pre_classifier import pre_classifier
 
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 if not GEMINI_API_KEY:
     raise RuntimeError("❌ GEMINI_API_KEY not set")
 
 # Gemini 2.0 Flash (fast + cheap, REST)
-GEMINI_URL = (
-    "https://generativelanguage.googleapis.com/v1/models/"
-    "gemini-2.0-flash:generateContent"
-)
+GEMINI_MODEL = "gemini-2.0-flash"
+# Per request; gemini_client retries on top of it
+GEMINI_TIMEOUT_SEC = 10
 
 
 def is_real_reputational_threat(
@@ -28,8 +27,18 @@ def is_real_reputational_threat(
     - fake: fraud, impersonation, unverifiable claims
     - legitimate: operational issues, complaints, clarifications
     - restricted: accessibility concerns, policy issues
+
+    Raises gemini_client.GeminiError if Gemini is still unavailable after
+    retries, so callers can tell "no verdict" apart from "not a threat".
+
+    Confident cases are answered by the local pre-classifier without a call.
     """
 
+    text = f"{headline}\n{content}"
+    verdict = pre_classifier.decide(text, category)
+    if verdict is not None:
+        return verdict
+
     # Build category-specific criteria
     if category == "fake":
         criteria = """
@@ -89,38 +98,17 @@ Content: {content}
 Answer with ONLY one word: YES or NO
 """
 
-    payload = {
-        "contents": [
-            {
-                "parts": [{"text": prompt}]
-            }
-        ],
-        "generationConfig": {
+    answer = gemini_client.generate_content(
+        prompt,
+        model=GEMINI_MODEL,
+        generation_config={
             "temperature": 0.0,
             "maxOutputTokens": 5
-        }
-    }
-
-    try:
-        resp = requests.post(
-            f"{GEMINI_URL}?key={GEMINI_API_KEY}",
-            headers={"Content-Type": "application/json"},
-            data=json.dumps(payload),
-            timeout=10,
-        )
-
-        resp.raise_for_status()
-        data = resp.json()
-
-        answer = (
-            data["candidates"][0]["content"]["parts"][0]["text"]
-            .strip()
-            .upper()
-        )
-
-        return answer.startswith("YES")
-
-    except Exception as e:
-        print(f"❌ Gemini validation error: {e}")
-        # Fail-safe: treat as NOT a threat
-        return False
+        },
+        api_key=GEMINI_API_KEY,
+        timeout=GEMINI_TIMEOUT_SEC,
+    )
+
+    verdict = answer.strip().upper().startswith("YES")
+    pre_classifier.record(text, category, verdict)
+    return verdict
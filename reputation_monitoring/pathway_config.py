@@ -0,0 +1,71 @@
+# pathway_config.py
+# Shared pw.run() settings: persistence (resume after restart), UDF caching and
+# worker threads.
+import os
+from pathlib import Path
+
+# ============================================================
+# CONFIG
+# ============================================================
+PATHWAY_PERSISTENCE = os.getenv("PATHWAY_PERSISTENCE", "on").lower() not in ("off", "0", "false", "no")
+PATHWAY_PERSISTENCE_DIR = os.getenv("PATHWAY_PERSISTENCE_DIR", "output/pstorage")
+PATHWAY_SNAPSHOT_INTERVAL_MS = int(os.getenv("PATHWAY_SNAPSHOT_INTERVAL_MS", "10000"))
+
+# operator   - snapshot operator state too: a restart resumes without recomputing
+# persisting - snapshot inputs only: a restart replays them, UDF caches avoid repeat API calls
+PATHWAY_PERSISTENCE_MODE = os.getenv("PATHWAY_PERSISTENCE_MODE", "operator").lower()
+
+# Worker threads, read by Pathway itself. Groupby results are sharded across
+# workers by key (supplier/country, company), so the UDFs for different keys
+# run in parallel. Multiple processes are not supported: the proxy serves
+# views and metrics from memory shared with the pipeline.
+PATHWAY_THREADS = int(os.getenv("PATHWAY_THREADS", "1"))
+PATHWAY_PROCESSES = int(os.getenv("PATHWAY_PROCESSES", "1"))
+
+# Whether this start resumes from an earlier checkpoint (decided before pw.run writes any)
+RESUMING = PATHWAY_PERSISTENCE and Path(PATHWAY_PERSISTENCE_DIR).is_dir() and any(Path(PATHWAY_PERSISTENCE_DIR).iterdir())
+
+
+def persistence_config():
+    """pw.persistence.Config for pw.run(), or None when persistence is off"""
+    if not PATHWAY_PERSISTENCE:
+        return None
+    import pathway as pw
+    modes = {
+        "operator": pw.PersistenceMode.OPERATOR_PERSISTING,
+        "persisting": pw.PersistenceMode.PERSISTING,
+    }
+    if PATHWAY_PERSISTENCE_MODE not in modes:
+        raise ValueError(f"Unknown PATHWAY_PERSISTENCE_MODE: {PATHWAY_PERSISTENCE_MODE} (expected operator or persisting)")
+    return pw.persistence.Config(
+        pw.persistence.Backend.filesystem(PATHWAY_PERSISTENCE_DIR),
+        snapshot_interval_ms=PATHWAY_SNAPSHOT_INTERVAL_MS,
+        persistence_mode=modes[PATHWAY_PERSISTENCE_MODE],
+    )
+
+
+def run():
+    """pw.run() with this service's worker and persistence settings"""
+    import pathway as pw
+    if PATHWAY_PROCESSES != 1:
+        raise ValueError(f"PATHWAY_PROCESSES={PATHWAY_PROCESSES} is not supported, scale with PATHWAY_THREADS instead")
+    if PATHWAY_THREADS < 1:
+        raise ValueError(f"PATHWAY_THREADS must be at least 1, got {PATHWAY_THREADS}")
+    print(f"⚙️ Pathway workers: {PATHWAY_THREADS} thread(s), persistence {'on' if PATHWAY_PERSISTENCE else 'off'}")
+    pw.run(persistence_config=persistence_config())
+
+
+def udf_cache():
+    """Cache strategy for expensive UDFs: on disk (survives restarts) when persistence is on"""
+    import pathway as pw
+    return pw.udfs.DiskCache() if PATHWAY_PERSISTENCE else pw.udfs.InMemoryCache()
+
+
+def state_path(name: str) -> Path:
+    """File next to the Pathway snapshots for state kept outside the engine"""
+    return Path(PATHWAY_PERSISTENCE_DIR).parent / "state" / name
+
+
+def view_state_path(name: str) -> Path | None:
+    """state_path(name) for views resumed with the checkpoint; None when persistence is off, so nothing is saved"""
+    return state_path(name) if PATHWAY_PERSISTENCE else None
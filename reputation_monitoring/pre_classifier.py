@@ -0,0 +1,285 @@
+# pre_classifier.py
+# CPU-only pre-classifier in front of the Gemini YES/NO validators. Every
+# Gemini verdict is appended to a history file; a hashed TF-IDF + logistic
+# regression model is trained on it in the background and answers the cases
+# it is confident about, so only uncertain ones go to the LLM.
+import os
+import re
+import json
+import math
+import time
+import zlib
+import random
+import threading
+from pathlib import Path
+
+# ============================================================
+# CONFIG
+# ============================================================
+PRECLASSIFIER = os.getenv("PRECLASSIFIER", "on").lower() not in ("off", "0", "false", "no")
+PRECLASSIFIER_HISTORY = Path(os.getenv("PRECLASSIFIER_HISTORY", "output/verdicts.jsonl"))
+PRECLASSIFIER_MODEL = Path(os.getenv("PRECLASSIFIER_MODEL", "output/pre_classifier.json"))
+
+# Probabilities at or beyond these thresholds are answered without Gemini
+PRECLASSIFIER_YES = float(os.getenv("PRECLASSIFIER_YES", "0.95"))
+PRECLASSIFIER_NO = float(os.getenv("PRECLASSIFIER_NO", "0.05"))
+
+PRECLASSIFIER_MIN_SAMPLES = int(os.getenv("PRECLASSIFIER_MIN_SAMPLES", "200"))
+# Confident decisions on a held-out fifth of the history must be at least this accurate
+PRECLASSIFIER_MIN_PRECISION = float(os.getenv("PRECLASSIFIER_MIN_PRECISION", "0.97"))
+PRECLASSIFIER_RETRAIN_EVERY = int(os.getenv("PRECLASSIFIER_RETRAIN_EVERY", "200"))
+# Share of confident cases still sent to Gemini, to keep measuring agreement
+PRECLASSIFIER_AUDIT_RATE = float(os.getenv("PRECLASSIFIER_AUDIT_RATE", "0.05"))
+
+MAX_SAMPLES = 20000
+HASH_BUCKETS = 1 << 18
+EPOCHS = 8
+LEARNING_RATE = 0.5
+L2 = 1e-5
+
+TOKEN = re.compile(r"[a-z0-9]+")
+
+# ============================================================
+# FEATURES
+# ============================================================
+def _bucket(feature: str) -> int:
+    return zlib.crc32(feature.encode("utf-8")) % HASH_BUCKETS
+
+
+def featurize(text: str, context: str) -> dict:
+    """
+    Hashed term counts: unigrams, bigrams and the context (country or
+    category). Whether the context is named in the text matters for the
+    supply chain check ("event in a different country" is a NO).
+    """
+    lowered = text.lower()
+    tokens = TOKEN.findall(lowered)
+    context = context.strip().lower()
+    features = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+    features.append(f"ctx={context}")
+    features.append("ctx:mentioned" if context and context in lowered else "ctx:absent")
+    counts = {}
+    for feature in features:
+        index = _bucket(feature)
+        counts[index] = counts.get(index, 0) + 1
+    return counts
+
+
+def _sigmoid(z: float) -> float:
+    if z < -30:
+        return 0.0
+    if z > 30:
+        return 1.0
+    return 1.0 / (1.0 + math.exp(-z))
+
+
+class Model:
+    """TF-IDF weighting + logistic regression over hashed features"""
+
+    def __init__(self, idf: dict, weights: dict, bias: float, default_idf: float, info: dict):
+        self.idf = idf
+        self.weights = weights
+        self.bias = bias
+        self.default_idf = default_idf
+        self.info = info
+
+    def vector(self, counts: dict) -> dict:
+        vec = {i: (1 + math.log(c)) * self.idf.get(i, self.default_idf) for i, c in counts.items()}
+        norm = math.sqrt(sum(v * v for v in vec.values())) or 1.0
+        return {i: v / norm for i, v in vec.items()}
+
+    def predict(self, counts: dict) -> float:
+        vec = self.vector(counts)
+        return _sigmoid(self.bias + sum(self.weights.get(i, 0.0) * v for i, v in vec.items()))
+
+    def to_dict(self) -> dict:
+        return {
+            "idf": {str(k): v for k, v in self.idf.items()},
+            "weights": {str(k): v for k, v in self.weights.items()},
+            "bias": self.bias,
+            "default_idf": self.default_idf,
+            "info": self.info,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Model":
+        return cls(
+            idf={int(k): v for k, v in data["idf"].items()},
+            weights={int(k): v for k, v in data["weights"].items()},
+            bias=data["bias"],
+            default_idf=data["default_idf"],
+            info=data.get("info", {}),
+        )
+
+
+def fit(samples: list[tuple[dict, int]], seed: int = 0) -> Model:
+    """Train on (feature counts, label) pairs with class-balanced SGD"""
+    n = len(samples)
+    df = {}
+    for counts, _ in samples:
+        for i in counts:
+            df[i] = df.get(i, 0) + 1
+    idf = {i: math.log((n + 1) / (d + 1)) + 1 for i, d in df.items()}
+    model = Model(idf, {}, 0.0, math.log(n + 1) + 1, {})
+
+    positives = sum(label for _, label in samples)
+    class_weight = {1: n / (2 * max(positives, 1)), 0: n / (2 * max(n - positives, 1))}
+    vectors = [(model.vector(counts), label) for counts, label in samples]
+
+    rng = random.Random(seed)
+    weights = model.weights
+    for epoch in range(EPOCHS):
+        rng.shuffle(vectors)
+        rate = LEARNING_RATE / (1 + epoch)
+        for vec, label in vectors:
+            p = _sigmoid(model.bias + sum(weights.get(i, 0.0) * v for i, v in vec.items()))
+            gradient = (p - label) * class_weight[label]
+            for i, v in vec.items():
+                weights[i] = weights.get(i, 0.0) * (1 - rate * L2) - rate * gradient * v
+            model.bias -= rate * gradient
+    return model
+
+
+def evaluate(model: Model, samples: list[tuple[dict, int]]) -> dict:
+    """Coverage and accuracy of the confident decisions on `samples`"""
+    decided = correct = 0
+    for counts, label in samples:
+        p = model.predict(counts)
+        if p >= PRECLASSIFIER_YES or p <= PRECLASSIFIER_NO:
+            decided += 1
+            correct += int((p >= PRECLASSIFIER_YES) == bool(label))
+    return {
+        "holdout": len(samples),
+        "coverage": decided / len(samples) if samples else 0.0,
+        "precision": correct / decided if decided else 0.0,
+    }
+
+# ============================================================
+# PRE-CLASSIFIER
+# ============================================================
+class PreClassifier:
+    """
+    decide() answers confident cases; record() stores Gemini verdicts and
+    retrains in the background every PRECLASSIFIER_RETRAIN_EVERY new ones.
+    A model is only used if its confident decisions were accurate enough on
+    held-out history.
+    """
+
+    def __init__(self, history: Path = PRECLASSIFIER_HISTORY, model_path: Path = PRECLASSIFIER_MODEL):
+        self.history = Path(history)
+        self.model_path = Path(model_path)
+        self._lock = threading.Lock()
+        self._training = False
+        self._since_training = 0
+        self._rng = random.Random()
+        self.model = self._load()
+        self.stats = {"answered_yes": 0, "answered_no": 0, "escalated": 0,
+                      "audited": 0, "audit_agreed": 0, "trainings": 0}
+
+    def _load(self):
+        if not self.model_path.exists():
+            return None
+        try:
+            model = Model.from_dict(json.loads(self.model_path.read_text(encoding="utf-8")))
+        except (ValueError, KeyError) as e:
+            print(f"⚠️ Ignoring unreadable pre-classifier model {self.model_path}: {e}")
+            return None
+        return model if model.info.get("active") else None
+
+    def decide(self, text: str, context: str):
+        """True / False for a confident case, None when Gemini should decide"""
+        model = self.model
+        if not PRECLASSIFIER or model is None:
+            return None
+        p = model.predict(featurize(text, context))
+        with self._lock:
+            if PRECLASSIFIER_NO < p < PRECLASSIFIER_YES or self._rng.random() < PRECLASSIFIER_AUDIT_RATE:
+                self.stats["escalated"] += 1
+                return None
+            self.stats["answered_yes" if p >= PRECLASSIFIER_YES else "answered_no"] += 1
+        return p >= PRECLASSIFIER_YES
+
+    def record(self, text: str, context: str, verdict: bool):
+        """Append a Gemini verdict to the history; retrain when enough are new"""
+        if not PRECLASSIFIER:
+            return
+        line = json.dumps({"text": text, "context": context, "label": int(verdict), "ts": time.time()})
+        model = self.model
+        with self._lock:
+            self.history.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.history, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+            self._since_training += 1
+
+            # Escalated cases the model was confident about are audits
+            if model is not None:
+                p = model.predict(featurize(text, context))
+                if p >= PRECLASSIFIER_YES or p <= PRECLASSIFIER_NO:
+                    self.stats["audited"] += 1
+                    self.stats["audit_agreed"] += int((p >= PRECLASSIFIER_YES) == verdict)
+
+            if self._since_training < PRECLASSIFIER_RETRAIN_EVERY or self._training:
+                return
+            self._since_training = 0
+            self._training = True
+        threading.Thread(target=self._retrain, name="pre-classifier-train", daemon=True).start()
+
+    def _retrain(self):
+        try:
+            info = self.train()
+            print(f"🧠 Pre-classifier retrained: {info}")
+        except Exception as e:
+            print(f"❌ Pre-classifier training failed: {e}")
+        finally:
+            with self._lock:
+                self._training = False
+
+    def train(self) -> dict:
+        """Train on the verdict history, save the model and use it if it passes the holdout check"""
+        samples = []
+        if self.history.exists():
+            with open(self.history, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        row = json.loads(line)
+                        samples.append((featurize(row["text"], row.get("context", "")), int(row["label"])))
+                    except (ValueError, KeyError):
+                        continue
+        samples = samples[-MAX_SAMPLES:]
+        labels = {label for _, label in samples}
+        if len(samples) < PRECLASSIFIER_MIN_SAMPLES or len(labels) < 2:
+            return {"samples": len(samples), "active": False, "reason": "not enough history"}
+
+        random.Random(42).shuffle(samples)
+        split = len(samples) // 5
+        info = evaluate(fit(samples[split:]), samples[:split])
+        info["samples"] = len(samples)
+        info["active"] = info["precision"] >= PRECLASSIFIER_MIN_PRECISION and info["coverage"] > 0
+
+        # The deployed model is refit on all of the history
+        model = fit(samples)
+        model.info = info
+        self.model_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.model_path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(model.to_dict()), encoding="utf-8")
+        os.replace(tmp, self.model_path)
+
+        with self._lock:
+            self.model = model if info["active"] else None
+            self.stats["trainings"] += 1
+        return info
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            stats = dict(self.stats)
+        stats["enabled"] = PRECLASSIFIER
+        stats["model"] = self.model.info if self.model is not None else None
+        return stats
+
+
+pre_classifier = PreClassifier()
+
+
+if __name__ == "__main__":
+    # Offline training: python pre_classifier.py
+    print(json.dumps(pre_classifier.train(), indent=2))
@@ -0,0 +1,127 @@
+# query_router.py
+# Fast path for lookup questions ("what threats affect Acme?", "threats in
+# China"). When a prompt only asks which threats exist for known suppliers,
+# companies or countries, the answer is read from the threat store instead of
+# running the adaptive RAG loop; everything else still goes to Pathway.
+import os
+import re
+import json
+import threading
+
+import gemini_client
+from gemini_client import GeminiError
+from rag_filters import filters_from_prompt
+from threat_store import read_threats
+
+# ============================================================
+# CONFIG
+# ============================================================
+QUERY_ROUTER = os.getenv("QUERY_ROUTER", "on").lower() not in ("off", "0", "false", "no")
+# One short Gemini call to phrase the lookup result; off lists the threats as-is
+ROUTER_SUMMARIZE = os.getenv("ROUTER_SUMMARIZE", "off").lower() in ("on", "1", "true", "yes")
+ROUTER_MAX_THREATS = int(os.getenv("ROUTER_MAX_THREATS", "20"))
+ROUTER_MODEL = os.getenv("ROUTER_MODEL", "gemini-2.0-flash")
+
+# A lookup asks for threats...
+LOOKUP_CUES = re.compile(
+    r"\b(threats?|alerts?|risks?|issues?|incidents?|disruptions?|problems?|news)\b", re.IGNORECASE
+)
+# ...and nothing that needs reasoning over policies
+OPEN_ENDED_CUES = re.compile(
+    r"\b(why|how|should|recommend\w*|explain\w*|compare\w*|mitigat\w*|polic\w*|impact\w*|"
+    r"predict\w*|assess\w*|severity|actions?|what if|suggest\w*|alternatives?)\b",
+    re.IGNORECASE,
+)
+
+# Filter fields and the threat store column each one matches
+LIST_COLUMNS = {"supplier": "suppliers", "company": "companies"}  # JSON lists
+EQUAL_COLUMNS = {"country": "country", "category": "category"}
+
+_lock = threading.Lock()
+_stats = {"lookup": 0, "rag": 0, "summarized": 0}
+
+
+def get_stats() -> dict:
+    with _lock:
+        return {**_stats, "enabled": QUERY_ROUTER}
+
+
+def _count(route: str):
+    with _lock:
+        _stats[route] += 1
+
+
+def route(prompt: str, known: dict) -> dict | None:
+    """
+    Filter fields for a lookup question, e.g. {"country": ["China"]}, or None
+    when the prompt should go to the RAG pipeline. `known` maps filter fields
+    to the names the pipeline has seen (see rag_filters.filters_from_prompt).
+    """
+    filters = None
+    if QUERY_ROUTER and LOOKUP_CUES.search(prompt) and not OPEN_ENDED_CUES.search(prompt):
+        filters = filters_from_prompt(prompt, known) or None
+    _count("lookup" if filters else "rag")
+    return filters
+
+
+def _names(row: dict) -> list[str]:
+    for column in LIST_COLUMNS.values():
+        if row.get(column):
+            return json.loads(row[column])
+    return []
+
+
+def lookup(filters: dict) -> list[dict]:
+    """Live threats matching the filter fields, newest first; names go through the store's name index"""
+    columns = {**EQUAL_COLUMNS, **LIST_COLUMNS}
+    store_filters = {columns[f]: v for f, v in filters.items() if f in columns}
+    return read_threats(store_filters, order_by="detected_at", descending=True)
+
+
+def _describe(filters: dict) -> str:
+    return " / ".join(", ".join(values) for values in filters.values())
+
+
+def format_answer(filters: dict, rows: list[dict]) -> str:
+    """Plain listing of the matching threats"""
+    subject = _describe(filters)
+    if not rows:
+        return f"There are no active threats for {subject}."
+    lines = [f"{len(rows)} active threat(s) for {subject}:"]
+    for row in rows[:ROUTER_MAX_THREATS]:
+        where = row.get("country") or row.get("category") or ""
+        lines.append(
+            f"- [{str(row.get('threat_type') or 'unknown').upper()}] {(row.get('headline') or '').strip()}"
+            f" ({where}; affects {', '.join(_names(row)) or 'unknown'}; source: {row.get('source') or 'unknown'})"
+        )
+    if len(rows) > ROUTER_MAX_THREATS:
+        lines.append(f"...and {len(rows) - ROUTER_MAX_THREATS} more.")
+    return "\n".join(lines)
+
+
+def summarize(prompt: str, listing: str, api_key: str | None) -> str:
+    """One short Gemini call answering the question from the listing; the listing on failure"""
+    try:
+        text = gemini_client.generate_content(
+            f"Answer the question using only these active threats.\n\n{listing}\n\n"
+            f"Question: {prompt}\nAnswer briefly:",
+            model=ROUTER_MODEL,
+            generation_config={"temperature": 0.1, "maxOutputTokens": 300},
+            api_key=api_key,
+        )
+    except GeminiError as e:
+        print(f"⚠️ Lookup summary failed, returning the listing: {e}")
+        return listing
+    if not text.strip():
+        return listing
+    _count("summarized")
+    return text
+
+
+def answer(prompt: str, filters: dict, api_key: str | None = None) -> dict:
+    """Response for a routed lookup, shaped like Pathway's /v2/answer"""
+    rows = lookup(filters)
+    text = format_answer(filters, rows)
+    if ROUTER_SUMMARIZE and rows:
+        text = summarize(prompt, text, api_key)
+    return {"response": text, "route": "lookup", "filters": filters, "threats": len(rows)}
@@ -1,11 +1,23 @@
 # reputation_alert_pipeline.py
 import os
 import json
+import asyncio
+import functools
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 import pathway as pw
 from reputation_stream import supply_chain_stream, contains_risk_keyword, MOCK_NEWS_ARTICLES
-from llm_validator import is_real_reputational_threat
+from llm_validator import is_real_reputational_threat, GEMINI_TIMEOUT_SEC
+from gemini_client import GeminiError, retry_budget_sec
+from latency_metrics import observe_stage, timed
+from log_sink import LogSink
+from threat_store import ThreatStore, THREAT_DB
+from live_views import get_view
+from pathway_config import udf_cache, view_state_path, RESUMING
+from story_index import story_index, normalize
+from risk_scoreboard import build_scoreboard, risk_board, event_time
+from contract_clock import active_contracts
 
 # Load environment variables
 load_dotenv()
@@ -16,48 +28,61 @@ load_dotenv()
 
 LOG_FILE = "output/reputation_threats.log"
 
+# Async UDF stages: calls in flight, per-call timeout and retries (see README)
+NEWS_FETCH_CAPACITY = int(os.getenv("NEWS_FETCH_CAPACITY", "16"))
+NEWS_FETCH_TIMEOUT_SEC = float(os.getenv("NEWS_FETCH_TIMEOUT_SEC", "30"))
+LLM_VALIDATE_CAPACITY = int(os.getenv("LLM_VALIDATE_CAPACITY", os.getenv("GEMINI_MAX_CONCURRENCY", "8")))
+# Per attempt; longer than gemini_client's own retries, so a call is never abandoned while it still retries
+LLM_VALIDATE_TIMEOUT_SEC = float(os.getenv("LLM_VALIDATE_TIMEOUT_SEC", "0")) or retry_budget_sec(GEMINI_TIMEOUT_SEC) + 30
+UDF_MAX_RETRIES = int(os.getenv("UDF_MAX_RETRIES", "2"))
+
 # Ensure output directory exists
 os.makedirs("output", exist_ok=True)
 
-# Initialize log file
-with open(LOG_FILE, "w", encoding="utf-8") as f:
-    f.write(f"=== Reputational Threat Detection Log Started at {datetime.now()} ===\n\n")
+# Initialize log file (written in batches by a background thread, see log_sink.py)
+log_sink = LogSink(
+    LOG_FILE,
+    header=f"=== Reputational Threat Detection Log Started at {datetime.now()} ===\n\n",
+    timestamps=False,
+)
 
 
 # ============================================================
 # LOGGING
 # ============================================================
 
-def log(message: str):
-    """Write to both console and log file"""
-    print(message)
-    try:
-        with open(LOG_FILE, "a", encoding="utf-8") as f:
-            f.write(f"{message}\n")
-    except Exception as e:
-        print(f"⚠️  Log write failed: {e}")
+def log(message: str, *args, level: str = "INFO", **fields):
+    """
+    Write to both console and log file without blocking the caller.
+    %-style args are formatted lazily; extra keyword fields go into JSON logs.
+    """
+    log_sink.emit(level, message, args, fields)
 
 
 # ============================================================
 # THREAT PROCESSING
 # ============================================================
 
-def process_threats_for_company(company: str, industry: str) -> list[dict]:
+def find_candidates(company: str, industry: str, emitted_at: float = 0.0) -> list[dict]:
     """
-    Check mock news for reputational threats and validate with LLM.
-    Returns list of validated threats.
+    Check mock news for a company and keep the articles with risk keywords.
+    Returns candidate threats for LLM validation.
     """
     
-    threats = []
+    candidates = []
+    emitted_at = float(emitted_at or 0.0)
+    observe_stage("grouped", emitted_at)
     
     # Filter news for this company
-    company_news = [
-        article for article in MOCK_NEWS_ARTICLES
-        if article.get("supplier", "").strip().lower() == company.strip().lower()
-    ]
+    with timed("news_fetch"):
+        company_news = [
+            article for article in MOCK_NEWS_ARTICLES
+            if article.get("supplier", "").strip().lower() == company.strip().lower()
+        ]
+    observe_stage("news_fetched", emitted_at)
     
     if not company_news:
-        return threats
+        return candidates
     
     log(f"\n{'='*60}")
     log(f"🔍 Processing supplier: {company} (Industry: {industry})")
@@ -66,8 +91,6 @@ def process_threats_for_company(company: str, industry: str) -> list[dict]:
     for article in company_news:
         headline = article.get("headline", "")
         description = article.get("description", "")
-        threat_type = article.get("threat_type", "reputational_risk")
-        timestamp = article.get("published_at", "")
         
         # Check for risk keywords
         keyword = contains_risk_keyword(headline + " " + description)
@@ -75,40 +98,80 @@ def process_threats_for_company(company: str, industry: str) -> list[dict]:
         if not keyword:
             continue
         
-        log(f"\n   ⚠️  Risk keyword '{keyword}' detected")
-        log(f"   📰 Headline: {headline[:80]}...")
+        log("\n   ⚠️  Risk keyword '%s' detected", keyword)
+        log("   📰 Headline: %.80s...", headline, level="DEBUG")
+        observe_stage("keyword_filtered", emitted_at)
         
-        # Validate with LLM
-        try:
-            is_threat = is_real_reputational_threat(
+        # CRITICAL: Use plain Python types only
+        candidates.append({
+            "threat_type": str(article.get("threat_type", "reputational_risk")),
+            "headline": str(headline),
+            "description": str(description),
+            "timestamp": str(article.get("published_at", "")),
+        })
+    
+    return candidates
+
+
+def validate_candidate(company: str, industry: str, threat_type: str, headline: str, description: str,
+                       story_id: str, emitted_at: float = 0.0) -> bool:
+    """
+    LLM check of one candidate; False when rejected. Raises when there was no
+    verdict, so the stage retries it and never caches a failure.
+    Near-duplicates of an already validated story reuse its verdict.
+    """
+    try:
+        with timed("llm_validate"):
+            is_threat = story_index.resolve(story_id, lambda: is_real_reputational_threat(
                 company=company,
                 category=industry,
                 headline=headline,
                 content=description
-            )
-            
-            if is_threat:
-                log(f"   ✅ LLM VALIDATED as reputational threat")
-                
-                # CRITICAL: Use plain Python types only
-                threats.append({
-                    "company": str(company),
-                    "category": str(industry),
-                    "threat_type": str(threat_type),
-                    "headline": str(headline),
-                    "description": str(description),
-                    "source": "MockNews",
-                    "timestamp": str(timestamp),
-                })
-            else:
-                log(f"   ❌ LLM rejected as false positive")
-                
-        except Exception as e:
-            log(f"   ⚠️  Validation error: {e}")
-    
-    log(f"\n   📊 Total validated threats: {len(threats)}")
+            ))
+    except GeminiError as e:
+        log(f"   ❌ No LLM verdict (Gemini unavailable after retries): {e}", level="ERROR", company=company)
+        raise
+    except Exception as e:
+        log(f"   ⚠️  Validation error: {e}", level="ERROR", company=company)
+        raise
+    observe_stage("llm_validated", emitted_at)
     
-    return threats
+    if is_threat:
+        log("   ✅ LLM VALIDATED as reputational threat", level="WARNING", company=company, threat_type=threat_type)
+    else:
+        log("   ❌ LLM rejected as false positive", level="DEBUG")
+    return bool(is_threat)
+
+
+# ============================================================
+# ASYNC UDF STAGES
+# ============================================================
+
+# The Gemini client is blocking, so each stage runs on its own thread pool
+# sized to its capacity; the Pathway worker only awaits the results.
+fetch_pool = ThreadPoolExecutor(max_workers=NEWS_FETCH_CAPACITY, thread_name_prefix="news-fetch")
+validate_pool = ThreadPoolExecutor(max_workers=LLM_VALIDATE_CAPACITY, thread_name_prefix="llm-validate")
+
+
+def async_stage(pool: ThreadPoolExecutor, func, timeout: float):
+    """
+    `func` run on `pool` with a per-attempt timeout and retries. Only results
+    are cached: a call that still fails after its retries raises instead.
+    """
+    @functools.wraps(func)  # also names the disk cache after func
+    async def call(*args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(pool, func, *args)
+
+    return pw.udfs.async_options(
+        timeout=timeout,
+        retry_strategy=pw.udfs.ExponentialBackoffRetryStrategy(max_retries=UDF_MAX_RETRIES),
+        cache_strategy=udf_cache(),
+    )(call)
+
+
+fetch_stage = async_stage(fetch_pool, find_candidates, NEWS_FETCH_TIMEOUT_SEC)
+validate_stage = async_stage(validate_pool, validate_candidate, LLM_VALIDATE_TIMEOUT_SEC)
 
 
 # ============================================================
@@ -118,38 +181,160 @@ def process_threats_for_company(company: str, industry: str) -> list[dict]:
 log("🚀 Starting Reputational Threat Alert Pipeline")
 log("=" * 60)
 
+# Only contracts active today; expired ones are retracted when their end date
+# passes, so no news lookups or validations are spent on them (see contract_clock.py)
+active_supply_chain = active_contracts(supply_chain_stream)
+
 # Get unique companies from stream
-companies = supply_chain_stream.groupby(
+companies = active_supply_chain.groupby(
     pw.this.supplier_firm, pw.this.supplier_industry
 ).reduce(
     company=pw.this.supplier_firm,
     industry=pw.this.supplier_industry,
+    # Earliest emission for the company, used for latency metrics
+    emitted_at=pw.reducers.min(pw.this.emitted_at),
 )
 
-# Process threats for each company
-threats_by_company = companies.select(
+# Distinct companies, pushed into the proxy's /companies view
+company_names = active_supply_chain.select(
+    company=pw.this.supplier_firm.str.strip()
+).filter(
+    pw.this.company != ""
+).groupby(pw.this.company).reduce(company=pw.this.company)
+get_view("companies").attach(company_names, "company", view_state_path("companies.json"), resume=RESUMING)
+
+# Stage 1: news lookup + keyword filter per company.
+# Both stages are cached so a replay after restart doesn't repeat Gemini calls.
+# A stage that fails after its retries drops that row instead of stopping the worker.
+@pw.udf(executor=pw.udfs.async_executor(capacity=NEWS_FETCH_CAPACITY))
+async def fetch_candidates_udf(company: str, industry: str, emitted_at: float) -> list[dict]:
+    try:
+        return await fetch_stage(company, industry, emitted_at)
+    except Exception as e:
+        log(f"   ❌ Candidate lookup failed after retries: {e!r}", level="ERROR", company=company)
+        return []
+
+# Stage 2: one LLM validation per candidate article, many in flight; None when there is no verdict
+@pw.udf(executor=pw.udfs.async_executor(capacity=LLM_VALIDATE_CAPACITY))
+async def validate_candidate_udf(company: str, industry: str, threat_type: str, headline: str, description: str,
+                                 story_id: str, emitted_at: float) -> bool | None:
+    try:
+        return await validate_stage(company, industry, threat_type, headline, description, story_id, emitted_at)
+    except Exception as e:
+        log(f"   ❌ Candidate dropped, no LLM verdict after retries: {e!r}", level="ERROR", company=company)
+        return None
+
+# Near-duplicate cluster of an article; the verdict depends on the company and its category
+@pw.udf
+def story_id_udf(headline: str, description: str, company: str, category: str) -> str:
+    return story_index.story_id(headline, description, f"{company}|{category}")
+
+# Find candidate articles for each company
+candidates_by_company = companies.select(
     company=pw.this.company,
     industry=pw.this.industry,
-    threats_list=pw.apply(
-        process_threats_for_company,
+    emitted_at=pw.this.emitted_at,
+    candidates=fetch_candidates_udf(
         pw.this.company,
-        pw.this.industry
+        pw.this.industry,
+        pw.this.emitted_at
     )
 )
 
-# Flatten the list of threats
-validated_threats = threats_by_company.flatten(pw.this.threats_list).select(
-    company=pw.this.threats_list["company"],
-    category=pw.this.threats_list["category"],
-    threat_type=pw.this.threats_list["threat_type"],
-    headline=pw.this.threats_list["headline"],
-    description=pw.this.threats_list["description"],
-    source=pw.this.threats_list["source"],
-    timestamp=pw.this.threats_list["timestamp"],
+# Flatten to one row per candidate
+candidates = candidates_by_company.flatten(pw.this.candidates).select(
+    company=pw.this.company,
+    category=pw.this.industry,
+    threat_type=pw.this.candidates["threat_type"].as_str(),
+    headline=pw.this.candidates["headline"].as_str(),
+    description=pw.this.candidates["description"].as_str(),
+    source="MockNews",
+    timestamp=pw.this.candidates["timestamp"].as_str(),
+    emitted_at=pw.this.emitted_at,
+)
+candidates = candidates.select(
+    *pw.this,
+    story_id=story_id_udf(pw.this.headline, pw.this.description, pw.this.company, pw.this.category),
 )
 
-# Write to CSV
-pw.io.csv.write(validated_threats, "output/validated_threats.csv")
+# Validate each candidate (once per story cluster) and keep the real threats;
+# candidates left without a verdict are dropped
+validated_threats = candidates.select(
+    *pw.this,
+    is_threat=validate_candidate_udf(
+        pw.this.company,
+        pw.this.category,
+        pw.this.threat_type,
+        pw.this.headline,
+        pw.this.description,
+        pw.this.story_id,
+        pw.this.emitted_at
+    )
+).filter(pw.coalesce(pw.this.is_threat, False)).without(pw.this.is_threat)
+
+# One row per headline per category, listing every affected company, so the
+# store and the RAG index hold each story once and readers need no dedup
+@pw.udf
+def headline_key(headline: str) -> str:
+    return " ".join(normalize(headline))
+
+@pw.udf
+def distinct_sorted(values: tuple) -> list[str]:
+    return sorted(set(values))
+
+grouped_threats = validated_threats.select(
+    *pw.this,
+    headline_key=headline_key(pw.this.headline),
+).groupby(
+    pw.this.category,
+    pw.this.headline_key
+).reduce(
+    category=pw.this.category,
+    threat_type=pw.reducers.any(pw.this.threat_type),
+    headline=pw.reducers.any(pw.this.headline),
+    description=pw.reducers.any(pw.this.description),
+    source=pw.reducers.any(pw.this.source),
+    timestamp=pw.reducers.max(pw.this.timestamp),
+    story_id=pw.reducers.any(pw.this.story_id),
+    company_tuple=pw.reducers.sorted_tuple(pw.this.company),
+    emitted_at=pw.reducers.min(pw.this.emitted_at),
+).with_columns(
+    companies=distinct_sorted(pw.this.company_tuple),
+).without(pw.this.company_tuple)
+
+# Keep the current set of threats in SQLite (retractions applied, see threat_store.py)
+threat_store = ThreatStore(
+    columns=["category", "threat_type", "headline", "description", "source", "timestamp", "companies", "story_id", "emitted_at"],
+    indexes=["category", "timestamp"],
+    name_columns=["companies"],
+    reset=not RESUMING,
+)
+threat_store.attach(grouped_threats)
+
+# Latency: row ingested by Pathway, validated threat written to output
+def record_ingested(key, row, time, is_addition):
+    if is_addition:
+        observe_stage("ingested", row["emitted_at"])
+
+def record_written(key, row, time, is_addition):
+    if is_addition:
+        observe_stage("written", row["emitted_at"])
+
+pw.io.subscribe(supply_chain_stream, on_change=record_ingested)
+pw.io.subscribe(grouped_threats, on_change=record_written)
+
+# Per-company risk: counts by type and recency-weighted severity (see risk_scoreboard.py)
+@pw.udf
+def seen_at(timestamp: str, emitted_at: float) -> float:
+    return event_time(timestamp, emitted_at)
+
+risk_scores = build_scoreboard(validated_threats.select(
+    supplier=pw.this.company.str.strip(),
+    story_id=pw.this.story_id,
+    threat_type=pw.this.threat_type,
+    seen_at=seen_at(pw.this.timestamp, pw.this.emitted_at),
+))
+risk_board.attach(risk_scores, view_state_path("risk_scores.json"), resume=RESUMING)
 
 
 # ============================================================
@@ -157,7 +342,7 @@ pw.io.csv.write(validated_threats, "output/validated_threats.csv")
 # ============================================================
 
 def log_threat(
-    company: str,
+    companies: tuple,
     category: str,
     threat_type: str,
     headline: str,
@@ -168,7 +353,7 @@ def log_threat(
 {'='*60}
 🚨 VALIDATED THREAT DETECTED
 {'='*60}
-Company:      {company}
+Companies:    {", ".join(companies)}
 Category:     {category}
 Threat Type:  {threat_type}
 Headline:     {headline}
@@ -181,10 +366,10 @@ Time:         {datetime.now()}
 
 
 # Apply logging to each threat
-validated_threats.select(
+grouped_threats.select(
     log_result=pw.apply(
         log_threat,
-        pw.this.company,
+        pw.this.companies,
         pw.this.category,
         pw.this.threat_type,
         pw.this.headline,
@@ -194,5 +379,5 @@ validated_threats.select(
 
 log("✅ Pipeline configured. Now monitoring for threats...")
 log("📁 Log file: " + LOG_FILE)
-log("📊 Validated threats saved to output/validated_threats.csv")
+log(f"📊 Validated threats kept in {THREAT_DB}")
 log("=" * 60)
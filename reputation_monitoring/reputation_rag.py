@@ -6,13 +6,15 @@ import pathway as pw
 from dotenv import load_dotenv
 
 from pathway.xpacks.llm.document_store import DocumentStore
-from pathway.xpacks.llm.embedders import GeminiEmbedder
+from pathway.xpacks.llm.embedders import GeminiEmbedder, LiteLLMEmbedder
 from pathway.xpacks.llm.llms import LiteLLMChat
 from pathway.xpacks.llm.question_answering import AdaptiveRAGQuestionAnswerer
 from pathway.xpacks.llm.vector_store import VectorStoreServer
 from pathway.stdlib.indexing import BruteForceKnnFactory, BruteForceKnnMetricKind
 
-from reputation_alert_pipeline import validated_threats
+from reputation_alert_pipeline import grouped_threats
+from rag_prompts import RAG_PROMPT_TEMPLATE
+from pathway_config import udf_cache
 
 # Load environment variables
 load_dotenv()
@@ -21,6 +23,10 @@ GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 GOOGLE_CREDS = os.getenv("GOOGLE_APPLICATION_CREDENTIALS", "credentials.json")
 REPUTATION_POLICIES_FOLDER_ID = os.getenv("REPUTATION_POLICIES_FOLDER_ID")
 
+# Optional Gemini endpoint override (e.g. the benchmarks/ stand-in server)
+GEMINI_BASE_URL = os.getenv("GEMINI_BASE_URL")
+LITELLM_ENDPOINT = {"api_base": GEMINI_BASE_URL.rstrip("/") + "/v1beta"} if GEMINI_BASE_URL else {}
+
 if not GEMINI_API_KEY:
     raise RuntimeError("❌ GEMINI_API_KEY not set")
 
@@ -44,6 +50,7 @@ policies_raw = pw.io.gdrive.read(
     ],
     with_metadata=True,
     refresh_interval=300,  # Refresh every 5 minutes
+    name="reputation_policies",
 )
 
 
@@ -92,7 +99,7 @@ print("🚨 Formatting validated threats as documents...")
 
 
 def format_threat_document_to_bytes(
-    company: str,
+    companies: tuple,
     category: str, 
     threat_type: str,
     headline: str,
@@ -101,11 +108,12 @@ def format_threat_document_to_bytes(
     timestamp: str
 ) -> bytes:
     """Format threat alert as a readable document and return as bytes"""
+    company = ", ".join(companies)
     
     doc = f"""
 # REPUTATIONAL THREAT ALERT
 
-**Company**: {company}
+**Companies**: {company}
 **Category**: {category}
 **Threat Type**: {threat_type}
 **Timestamp**: {timestamp}
@@ -124,30 +132,48 @@ This alert was validated by AI analysis and represents a genuine reputational co
     return doc.encode("utf-8")
 
 
-# Create threats documents with data column (bytes)
-threats_docs = validated_threats.select(
+# Threat metadata for filtered retrieval (see rag_filters.py)
+def threat_metadata(
+    companies: tuple,
+    category: str,
+    threat_type: str,
+    timestamp: str,
+    emitted_at: float
+) -> dict:
+    """Metadata of a threat document; timestamp is the article's publish time (epoch)"""
+    try:
+        published = datetime.fromisoformat(str(timestamp).replace("Z", "+00:00")).timestamp()
+    except ValueError:
+        published = float(emitted_at or 0.0)
+    return {
+        "doc_type": "threat",
+        "companies": [str(c) for c in companies] if companies else [],
+        "category": str(category or "").strip(),
+        "threat_type": str(threat_type or "unknown").lower(),
+        "timestamp": published,
+    }
+
+
+# Create threats documents with data column (bytes) and metadata
+threats_docs = grouped_threats.select(
     data=pw.apply(
         format_threat_document_to_bytes,
-        pw.this.company,
+        pw.this.companies,
         pw.this.category,
         pw.this.threat_type,
         pw.this.headline,
         pw.this.description,
         pw.this.source,
         pw.this.timestamp
-    )
-)
-
-
-# Add empty metadata to threats to match policies schema
-def create_empty_metadata_dict(data: bytes) -> dict:
-    """Create empty metadata dict - helps with schema compatibility"""
-    return {"source": "alert_pipeline", "timestamp": str(datetime.now())}
-
-
-threats_docs = threats_docs.select(
-    data=pw.this.data,
-    _metadata=pw.apply(create_empty_metadata_dict, pw.this.data)
+    ),
+    _metadata=pw.apply(
+        threat_metadata,
+        pw.this.companies,
+        pw.this.category,
+        pw.this.threat_type,
+        pw.this.timestamp,
+        pw.this.emitted_at
+    ),
 )
 
 
@@ -160,10 +186,20 @@ print("📚 Building document store with hybrid indexing...")
 all_docs = pw.Table.concat_reindex(policies_docs, threats_docs)
 
 # Create embedder
-embedder = GeminiEmbedder(
-    api_key=GEMINI_API_KEY,
-    model="models/text-embedding-004",
-)
+if GEMINI_BASE_URL:
+    # GeminiEmbedder's SDK has no endpoint override; LiteLLM calls the same REST API
+    embedder = LiteLLMEmbedder(
+        model="gemini/text-embedding-004",
+        api_key=GEMINI_API_KEY,
+        cache_strategy=udf_cache(),
+        **LITELLM_ENDPOINT,
+    )
+else:
+    embedder = GeminiEmbedder(
+        api_key=GEMINI_API_KEY,
+        model="models/text-embedding-004",
+        cache_strategy=udf_cache(),
+    )
 
 # Create KNN index factory
 knn_index = BruteForceKnnFactory(
@@ -188,6 +224,8 @@ llm = LiteLLMChat(
     model="gemini/gemini-2.0-flash-exp",
     api_key=GEMINI_API_KEY,
     temperature=0.1,
+    cache_strategy=udf_cache(),
+    **LITELLM_ENDPOINT,
 )
 
 rag_app = AdaptiveRAGQuestionAnswerer(
@@ -196,26 +234,7 @@ rag_app = AdaptiveRAGQuestionAnswerer(
     n_starting_documents=10,  # Start with 10 documents for better coverage
     factor=2,  # Double each iteration
     max_iterations=4,  # Max 4 iterations (10, 20, 40, 80 docs)
-    prompt_template="""
-You are a corporate reputation analyst assistant specializing in threat assessment and policy guidance.
-
-Your task is to provide comprehensive, actionable answers about company reputational threats and policies.
-
-**Instructions:**
-1. **Aggregate information** - If multiple companies or threats are relevant, summarize ALL of them, not just one.
-2. **Include policy guidance** - Always reference relevant policy documents when available.
-3. **Be specific** - Mention company names, categories, and key details from headlines.
-4. **Organize clearly** - Use bullet points.
-5. **Bold important terms** - Bold company names, threat types, and dates.
-6. **No threats found?** - If no relevant threats are found in the context for the specific company or query, respond EXACTLY with: "There are no reputational threats for this supplier." Do not provide any other explanation or "I don't know" style responses.
-
-Context:
-{context}
-
-Question: {query}
-
-Answer:
-""",
+    prompt_template=RAG_PROMPT_TEMPLATE,
 )
 
 
@@ -1,6 +1,7 @@
 import pathway as pw
 import json
 import os
+from stream_log import STREAM_FORMAT, SUPPLY_CHAIN_CSV, SUPPLY_CHAIN_STREAM_DIR
 
 # ============================================================
 # SCHEMA DEFINITIONS
@@ -25,17 +26,33 @@ class SupplyChainSchema(pw.Schema):
     supplier_industry: str 
     primary_transport_mode: str
     port_dependency: str  
+    emitted_at: float = pw.column_definition(default_value=0.0)  # simulator write time, 0 if absent
 
 # ============================================================
 # DATA STREAM
 # ============================================================
 
-# Read Supply Chain CSV as the primary driver stream
-supply_chain_stream = pw.io.csv.read(
-    "data/supply_chain_stream.csv",
-    schema=SupplyChainSchema,
-    mode="streaming",
-)
+# csv:   data/supply_chain_stream.csv, appended row by row
+# jsonl: data/supply_chain_stream/, append-only JSON-lines segments;
+#        each segment is read once, so only new records are consumed.
+#        The directory can be the single log shared with the other
+#        monitoring pipeline; Pathway tracks this reader's own offset.
+
+# Read Supply Chain stream as the primary driver stream
+if STREAM_FORMAT == "jsonl":
+    supply_chain_stream = pw.io.jsonlines.read(
+        SUPPLY_CHAIN_STREAM_DIR,
+        schema=SupplyChainSchema,
+        mode="streaming",
+        name="supply_chain_stream",  # stable id for persistence snapshots
+    )
+else:
+    supply_chain_stream = pw.io.csv.read(
+        SUPPLY_CHAIN_CSV,
+        schema=SupplyChainSchema,
+        mode="streaming",
+        name="supply_chain_stream",
+    )
 
 # Assign primary key
 supply_chain_stream = supply_chain_stream.with_columns(
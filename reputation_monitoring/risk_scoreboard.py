@@ -0,0 +1,197 @@
+# risk_scoreboard.py
+# Per-supplier risk from validated threats, maintained incrementally by the
+# Pathway graph. Each threat adds its severity, decayed exponentially with its
+# age; the proxy looks suppliers up in an in-memory board (O(1)) and ranks
+# them from a list sorted again only when a read follows a change.
+#
+# Decay uses a fixed landmark ("forward decay"): a threat seen at t adds
+# severity * 2^((t - landmark) / half_life), a plain sum that Pathway can
+# update and retract; dividing by 2^((now - landmark) / half_life) at read
+# time gives the recency-weighted severity.
+import os
+import json
+import time
+import threading
+from datetime import datetime
+
+from state_saver import StateSaver
+
+# ============================================================
+# CONFIG
+# ============================================================
+RISK_HALF_LIFE_DAYS = float(os.getenv("RISK_HALF_LIFE_DAYS", "14"))
+RISK_LANDMARK = float(os.getenv("RISK_LANDMARK", "1767225600"))  # 2026-01-01 UTC
+RISK_MAX_SCORE = 100.0
+
+HALF_LIFE_SEC = RISK_HALF_LIFE_DAYS * 86400
+
+# Severity (0-100) by threat type; country keyword types and reputation categories
+THREAT_SEVERITY = {
+    "war": 90, "sanction": 85, "conflict": 80,
+    "earthquake": 75, "cyclone": 70, "flood": 65, "fire": 60,
+    "shutdown": 55, "strike": 50, "port": 40,
+    "fraud_indicators": 85, "operational_issues": 55, "accessibility_concerns": 40,
+}
+DEFAULT_SEVERITY = 50
+
+
+def severity(threat_type: str) -> float:
+    return float(THREAT_SEVERITY.get(str(threat_type or "").strip().lower(), DEFAULT_SEVERITY))
+
+
+def event_time(published_at: str, fallback: float) -> float:
+    """Epoch seconds of an ISO 8601 publish time, `fallback` if missing or unreadable"""
+    try:
+        return datetime.fromisoformat(str(published_at).replace("Z", "+00:00")).timestamp()
+    except ValueError:
+        return float(fallback or 0.0)
+
+
+def forward_weight(threat_type: str, seen_at: float) -> float:
+    """Severity scaled to the landmark, summed by the graph"""
+    return severity(threat_type) * 2 ** ((float(seen_at) - RISK_LANDMARK) / HALF_LIFE_SEC)
+
+
+def decayed(weight_sum: float, now: float | None = None) -> float:
+    """Recency-weighted severity at `now` of a forward-weighted sum"""
+    now = time.time() if now is None else now
+    return weight_sum * 2 ** ((RISK_LANDMARK - now) / HALF_LIFE_SEC)
+
+
+# ============================================================
+# PATHWAY TABLE
+# ============================================================
+def build_scoreboard(threats):
+    """
+    One row per supplier from a table of validated threats with columns
+    `supplier`, `story_id`, `threat_type` and `seen_at` (epoch seconds).
+    Near-duplicate articles of one story count once per supplier.
+    """
+    import pathway as pw
+
+    @pw.udf
+    def weight(threat_type: str, seen_at: float) -> float:
+        return forward_weight(threat_type, seen_at)
+
+    @pw.udf
+    def counts_by_type(pairs: tuple) -> str:
+        return json.dumps({threat_type: count for threat_type, count in sorted(pairs)})
+
+    stories = threats.groupby(pw.this.supplier, pw.this.story_id).reduce(
+        supplier=pw.this.supplier,
+        threat_type=pw.reducers.any(pw.this.threat_type),
+        seen_at=pw.reducers.max(pw.this.seen_at),
+    )
+    by_type = stories.groupby(pw.this.supplier, pw.this.threat_type).reduce(
+        supplier=pw.this.supplier,
+        threat_type=pw.this.threat_type,
+        count=pw.reducers.count(),
+        weight=pw.reducers.sum(weight(pw.this.threat_type, pw.this.seen_at)),
+        last_seen=pw.reducers.max(pw.this.seen_at),
+    )
+    return by_type.groupby(pw.this.supplier).reduce(
+        supplier=pw.this.supplier,
+        threats=pw.reducers.sum(pw.this.count),
+        weight=pw.reducers.sum(pw.this.weight),
+        last_seen=pw.reducers.max(pw.this.last_seen),
+        type_pairs=pw.reducers.tuple(pw.make_tuple(pw.this.threat_type, pw.this.count)),
+    ).select(
+        supplier=pw.this.supplier,
+        threats=pw.this.threats,
+        weight=pw.this.weight,
+        last_seen=pw.this.last_seen,
+        by_type=counts_by_type(pw.this.type_pairs),
+    )
+
+
+# ============================================================
+# IN-MEMORY BOARD
+# ============================================================
+class RiskScoreboard:
+    """
+    Latest scoreboard row per supplier, fed by pw.io.subscribe. Changes are
+    applied when the Pathway timestamp closes (per worker thread, as in
+    threat_store.py), so an update's retraction never removes its insertion.
+    """
+
+    def __init__(self):
+        self.attached = False
+        self.saver = None
+        self._lock = threading.Lock()
+        self._pending = {}   # thread id -> (upserts, deletes)
+        self._rows = {}      # supplier (lowercase) -> row, replaced (never mutated) on change
+        self._ranked = None  # suppliers (lowercase), highest weight first; None until the next read
+
+    def on_change(self, key, row: dict, time, is_addition: bool):
+        supplier = str(row["supplier"]).strip()
+        with self._lock:
+            upserts, deletes = self._pending.setdefault(threading.get_ident(), ({}, set()))
+            if is_addition:
+                upserts[supplier.lower()] = {
+                    "supplier": supplier,
+                    "threats": int(row["threats"]),
+                    "weight": float(row["weight"]),
+                    "last_seen": float(row["last_seen"]),
+                    "by_type": json.loads(row["by_type"]),
+                }
+            else:
+                deletes.add(supplier.lower())
+
+    def on_time_end(self, time):
+        with self._lock:
+            upserts, deletes = self._pending.pop(threading.get_ident(), ({}, set()))
+            if not upserts and not deletes:
+                return
+            for supplier in deletes - upserts.keys():
+                self._rows.pop(supplier, None)
+            self._rows.update(upserts)
+            self._ranked = None
+        if self.saver:
+            self.saver.mark_changed()
+
+    def _copy(self) -> dict:
+        with self._lock:
+            return dict(self._rows)
+
+    def attach(self, table, state_file=None, resume: bool = False):
+        """Subscribe to a build_scoreboard() table; saved to `state_file` for resumes like live_views"""
+        import pathway as pw
+        if state_file:
+            self.saver = StateSaver(state_file, self._copy)
+            saved = self.saver.load() if resume else None
+            if saved is not None:
+                with self._lock:
+                    self._rows = saved
+                    self._ranked = None
+        pw.io.subscribe(table, on_change=self.on_change, on_time_end=self.on_time_end)
+        self.attached = True
+
+    def _score(self, row: dict, now: float) -> dict:
+        severity_now = decayed(row["weight"], now)
+        return {
+            "supplier": row["supplier"],
+            "risk_score": round(min(RISK_MAX_SCORE, severity_now), 1),
+            "recency_weighted_severity": round(severity_now, 2),
+            "threats": row["threats"],
+            "by_type": row["by_type"],
+            "last_seen": row["last_seen"],
+        }
+
+    def lookup(self, supplier: str) -> dict | None:
+        """Current risk of one supplier, None if it has no validated threats"""
+        with self._lock:
+            row = self._rows.get(supplier.strip().lower())
+        return self._score(row, time.time()) if row else None
+
+    def top(self, limit: int = 20) -> list[dict]:
+        """Highest-risk suppliers first"""
+        now = time.time()
+        with self._lock:
+            if self._ranked is None:
+                # Decay scales every supplier alike, so the ranking only changes with the graph
+                self._ranked = sorted(self._rows, key=lambda s: self._rows[s]["weight"], reverse=True)
+            rows = [self._rows[s] for s in self._ranked[:limit]]
+        return [self._score(row, now) for row in rows]
+
+
+risk_board = RiskScoreboard()
@@ -0,0 +1,67 @@
+# state_saver.py
+# Background saver for the in-memory views fed by pw.io.subscribe (live_views,
+# risk_scoreboard, exposure_index). Pathway callbacks only mark the state as
+# changed; a thread takes a copy at most every STATE_SAVE_INTERVAL_SEC and
+# writes it to disk, outside the view's lock.
+import os
+import json
+import time
+import atexit
+import threading
+from pathlib import Path
+
+# ============================================================
+# CONFIG
+# ============================================================
+# Keep well below PATHWAY_SNAPSHOT_INTERVAL_MS, so the files stay about as
+# fresh as the checkpoint they are resumed with
+STATE_SAVE_INTERVAL_SEC = float(os.getenv("STATE_SAVE_INTERVAL_SEC", "2"))
+
+
+class StateSaver:
+    """
+    Saves `snapshot()` as JSON to `path` after changes, at most once per interval.
+
+    `snapshot` must return a copy that later changes to the view don't touch;
+    it is the only part run under the caller's lock.
+    """
+
+    def __init__(self, path, snapshot):
+        self.path = Path(path)
+        self.snapshot = snapshot
+        self._changed = threading.Event()
+        self._write_lock = threading.Lock()
+        self.worker = threading.Thread(target=self._run, name=f"state-saver-{self.path.name}", daemon=True)
+        self.worker.start()
+        atexit.register(self.flush)
+
+    def mark_changed(self):
+        self._changed.set()
+
+    def load(self):
+        """Saved state, or None if there is none"""
+        if not self.path.exists():
+            return None
+        return json.loads(self.path.read_text(encoding="utf-8"))
+
+    def flush(self):
+        """Write now if anything changed since the last save (also runs at interpreter exit)"""
+        if not self._changed.is_set():
+            return
+        with self._write_lock:
+            self._changed.clear()
+            data = self.snapshot()
+            # Write-then-rename so a crash never leaves a truncated file
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_suffix(".tmp")
+            tmp.write_text(json.dumps(data), encoding="utf-8")
+            os.replace(tmp, self.path)
+
+    def _run(self):
+        while True:
+            self._changed.wait()
+            time.sleep(STATE_SAVE_INTERVAL_SEC)
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"❌ Could not save {self.path}: {e}")
@@ -0,0 +1,75 @@
+# stream_log.py
+# Offset-tracking reader for the shared supply chain stream. Every consumer
+# keeps its own offset, so any number of readers share one copy of the log.
+import os
+import csv
+import io
+import json
+import threading
+from pathlib import Path
+
+STREAM_FORMAT = os.getenv("STREAM_FORMAT", "csv").lower()
+SUPPLY_CHAIN_CSV = os.getenv("SUPPLY_CHAIN_CSV", "data/supply_chain_stream.csv")
+SUPPLY_CHAIN_STREAM_DIR = os.getenv("SUPPLY_CHAIN_STREAM_DIR", "data/supply_chain_stream")
+
+
+class StreamConsumer:
+    """
+    Reads records appended to the supply chain stream since the last poll.
+
+    jsonl: the offset is the set of segment files already consumed; segments
+           are immutable once published, so each is read exactly once.
+    csv:   the offset is a byte position; only complete lines are consumed.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self._segments_read = set()
+        self._csv_offset = 0
+        self._csv_header = None
+
+    def poll(self) -> list[dict]:
+        """Return records appended since the previous poll"""
+        with self._lock:
+            if STREAM_FORMAT == "jsonl":
+                return self._poll_segments()
+            return self._poll_csv()
+
+    def _poll_segments(self) -> list[dict]:
+        rows = []
+        segments = sorted(Path(SUPPLY_CHAIN_STREAM_DIR).glob("*.jsonl"))
+        # Forget segments removed by a stream reset
+        self._segments_read &= {segment.name for segment in segments}
+        for segment in segments:
+            if segment.name in self._segments_read:
+                continue
+            with open(segment, "r", encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        rows.append(json.loads(line))
+            self._segments_read.add(segment.name)
+        return rows
+
+    def _poll_csv(self) -> list[dict]:
+        path = Path(SUPPLY_CHAIN_CSV)
+        if not path.exists():
+            return []
+        if path.stat().st_size < self._csv_offset:
+            # Stream was reset (simulator restarted) - start over
+            self._csv_offset = 0
+            self._csv_header = None
+
+        with open(path, "rb") as f:
+            f.seek(self._csv_offset)
+            data = f.read()
+        complete = data[:data.rfind(b"\n") + 1]
+        if not complete:
+            return []
+        self._csv_offset += len(complete)
+
+        lines = complete.decode("utf-8").splitlines()
+        if self._csv_header is None:
+            self._csv_header = next(csv.reader([lines[0]]))
+            lines = lines[1:]
+        return list(csv.DictReader(io.StringIO("\n".join(lines)), fieldnames=self._csv_header))
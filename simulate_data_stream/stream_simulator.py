@@ -1,6 +1,10 @@
 import time
 import csv
+import json
 import os
+import argparse
+import random
+import zlib
 from pathlib import Path
 
 # ---------------------------------
@@ -20,40 +24,167 @@ else:
         PROJECT_ROOT / "reputation_monitoring" / "data" / "supply_chain_stream.csv"
     ]
 
+# Single shared stream: when set, rows are written once to this JSON-lines
+# segment log and every monitoring pipeline reads the same directory with its
+# own offset. Overrides STREAM_FILES and implies STREAM_FORMAT=jsonl.
+STREAM_DIR = os.getenv("STREAM_DIR", "")
+
 MASTER_FILE = Path(os.getenv("MASTER_FILE", PROJECT_ROOT / "simulate_data_stream" / "master_supply_chain.csv"))
 
-INTERVAL_SEC = 2 # seconds
+INTERVAL_SEC = float(os.getenv("INTERVAL_SEC", "2"))  # seconds
+
+# Output format:
+#   csv   - append rows to each STREAM_FILES csv
+#   jsonl - append rows to a segmented JSON-lines log next to each STREAM_FILES
+#           path (data/supply_chain_stream.csv -> data/supply_chain_stream/)
+STREAM_FORMAT = "jsonl" if STREAM_DIR else os.getenv("STREAM_FORMAT", "csv").lower()
+
+# Rows are flushed (csv) or published as a new segment (jsonl) every
+# STREAM_BATCH_SIZE rows, or after STREAM_FLUSH_SEC, whichever comes first
+STREAM_BATCH_SIZE = int(os.getenv("STREAM_BATCH_SIZE", "1"))
+STREAM_FLUSH_SEC = float(os.getenv("STREAM_FLUSH_SEC", "1.0"))
+
+# Columns typed as numbers in SupplyChainSchema (JSON needs real numbers)
+NUMERIC_FIELDS = {"quantity", "emitted_at"}
+
+# Unix time each row is written, used by the monitors' latency metrics
+EMITTED_AT_FIELD = "emitted_at"
+
+# Load generation defaults (see --help)
+LOAD_RATE = float(os.getenv("LOAD_RATE", "100"))                # target rows/s
+LOAD_TOTAL = int(os.getenv("LOAD_TOTAL", "10000"))              # rows to emit
+LOAD_PROFILE = os.getenv("LOAD_PROFILE", "steady")              # steady | ramp | burst
+LOAD_SUPPLIERS = int(os.getenv("LOAD_SUPPLIERS", "0"))          # 0 = master suppliers only
+LOAD_BURST_FACTOR = float(os.getenv("LOAD_BURST_FACTOR", "5"))  # burst rate multiplier
+LOAD_BURST_PERIOD_SEC = float(os.getenv("LOAD_BURST_PERIOD_SEC", "10"))
+LOAD_BURST_DUTY = float(os.getenv("LOAD_BURST_DUTY", "0.2"))    # fraction of period in burst
+
+LOAD_TICK_SEC = 0.05
+LOAD_REPORT_SEC = 5
+
+# Columns that describe where and how a supplier operates; resampled together
+# so synthetic suppliers stay geographically consistent
+SUPPLIER_PROFILE_FIELDS = [
+    "source_country", "source_region", "source_city", "supplier_industry",
+    "primary_transport_mode", "port_dependency",
+]
+
+
+# ---------------------------------
+# Stream writers
+# ---------------------------------
+def stamp(row: dict) -> dict:
+    """Copy of row tagged with the time it enters the stream"""
+    return {**row, EMITTED_AT_FIELD: f"{time.time():.6f}"}
+
+
+class CsvStreamWriter:
+    """Appends rows to a CSV file through a single open handle"""
+
+    def __init__(self, path: Path, fieldnames):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.file = path.open("w", newline="", encoding="utf-8")
+        fieldnames = [name for name in fieldnames if name != EMITTED_AT_FIELD] + [EMITTED_AT_FIELD]
+        self.writer = csv.DictWriter(self.file, fieldnames=fieldnames)
+        self.writer.writeheader()
+        self.file.flush()
+
+    def write(self, row: dict):
+        self.writer.writerow(stamp(row))
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+class JsonlSegmentWriter:
+    """
+    Append-only JSON-lines log split into segment files.
+
+    Rows are written to an open staging file. On flush the segment is moved
+    into the stream directory in one rename, so a reader watching the
+    directory sees each complete segment exactly once and never re-scans
+    rows it has already consumed.
+    """
+
+    def __init__(self, directory: Path):
+        self.directory = directory
+        self.staging = directory.parent / f".{directory.name}.staging"
+        for folder in (self.directory, self.staging):
+            folder.mkdir(parents=True, exist_ok=True)
+            # Reset the stream, like the csv writer rewriting its header
+            for old in folder.glob("*.jsonl"):
+                old.unlink()
+        # Run id keeps segment names unique across simulator restarts
+        self.run_id = int(time.time())
+        self.sequence = 0
+        self.file = None
+        self.staged_path = None
+
+    def write(self, row: dict):
+        if self.file is None:
+            self.sequence += 1
+            self.staged_path = self.staging / f"segment-{self.run_id}-{self.sequence:08d}.jsonl"
+            self.file = self.staged_path.open("w", encoding="utf-8")
+        record = {
+            key: float(value) if key in NUMERIC_FIELDS and value not in (None, "") else value
+            for key, value in stamp(row).items()
+        }
+        self.file.write(json.dumps(record) + "\n")
+
+    def flush(self):
+        if self.file is None:
+            return
+        self.file.close()
+        os.replace(self.staged_path, self.directory / self.staged_path.name)
+        self.file = None
+
+    def close(self):
+        self.flush()
+
+
+def open_writers(fieldnames):
+    if STREAM_DIR:
+        return [JsonlSegmentWriter(Path(STREAM_DIR))]
+    if STREAM_FORMAT == "jsonl":
+        return [JsonlSegmentWriter(stream_file.with_suffix("")) for stream_file in STREAM_FILES]
+    if STREAM_FORMAT == "csv":
+        return [CsvStreamWriter(stream_file, fieldnames) for stream_file in STREAM_FILES]
+    raise ValueError(f"Unknown STREAM_FORMAT: {STREAM_FORMAT} (expected csv or jsonl)")
 
 
 def simulate_stream():
     if not MASTER_FILE.exists():
         raise FileNotFoundError(f"Master CSV not found: {MASTER_FILE}")
 
-    for stream_file in STREAM_FILES:
-        stream_file.parent.mkdir(parents=True, exist_ok=True)
-
     with MASTER_FILE.open(newline="", encoding="utf-8") as f:
         reader = csv.DictReader(f)
         rows = list(reader)
         fieldnames = reader.fieldnames
 
     # Reset stream files
-    for stream_file in STREAM_FILES:
-        with stream_file.open("w", newline="", encoding="utf-8") as f:
-            writer = csv.DictWriter(f, fieldnames=fieldnames)
-            writer.writeheader()
+    writers = open_writers(fieldnames)
 
     print("📡 Stream simulator started")
-    print(f"📂 Writing to {len(STREAM_FILES)} destinations")
+    print(f"📂 Writing {STREAM_FORMAT} to {len(writers)} destinations")
 
     # Limit to 50 records if more
     stream_rows = rows[:50]
-    
+    pending = 0
+    last_flush = time.monotonic()
+
     for i, row in enumerate(stream_rows, start=1):
-        for stream_file in STREAM_FILES:
-            with stream_file.open("a", newline="", encoding="utf-8") as f:
-                writer = csv.DictWriter(f, fieldnames=fieldnames)
-                writer.writerow(row)
+        for writer in writers:
+            writer.write(row)
+        pending += 1
+
+        if pending >= STREAM_BATCH_SIZE or time.monotonic() - last_flush >= STREAM_FLUSH_SEC:
+            for writer in writers:
+                writer.flush()
+            pending = 0
+            last_flush = time.monotonic()
 
         print(
             f"➕ Streamed row {i} | "
@@ -64,14 +195,164 @@ def simulate_stream():
 
         time.sleep(INTERVAL_SEC)
 
+    for writer in writers:
+        writer.close()
+
     print("✅ Streaming complete (50 records maximum reached)")
-    
+
     # Stay alive but stop streaming to prevent Docker from restarting the container
     print("💤 Simulator entering idle state")
     while True:
         time.sleep(3600)
 
 
-if __name__ == "__main__":
-    simulate_stream()
+# ---------------------------------
+# Load generation
+# ---------------------------------
+class RecordSynthesizer:
+    """
+    Synthesizes new supply chain records by resampling the master file.
+
+    Suppliers keep the location/operations profile of a master row; with
+    n_suppliers above the master count, extra suppliers are cloned from
+    master profiles under new names. Buyers and products are resampled
+    independently and quantities are jittered.
+    """
+
+    def __init__(self, rows, n_suppliers: int = 0, seed: int = 42):
+        self.rng = random.Random(seed)
+        self.rows = rows
+        self.buyers = sorted({r["buyer_firm"] for r in rows})
+
+        profiles = {}
+        for row in rows:
+            profiles.setdefault(row["supplier_firm"], {k: row[k] for k in SUPPLIER_PROFILE_FIELDS})
+        self.suppliers = list(profiles.items())
+
+        base = list(self.suppliers)
+        for i in range(len(base), n_suppliers):
+            name, _ = base[i % len(base)]
+            _, profile = self.rng.choice(base)
+            self.suppliers.append((f"{name} {i // len(base) + 1:03d}", dict(profile)))
+
+        self.sequence = 0
+
+    def next_record(self) -> dict:
+        self.sequence += 1
+        template = self.rng.choice(self.rows)
+        supplier, profile = self.rng.choice(self.suppliers)
+        buyer = self.rng.choice(self.buyers)
+        quantity = float(template["quantity"] or 0) * self.rng.uniform(0.5, 1.5)
+
+        record = dict(template)
+        record.update(profile)
+        record.update({
+            "record_id": f"L{self.sequence:09d}",
+            "buyer_firm": buyer,
+            "supplier_firm": supplier,
+            "contract_id": f"CTR-L{zlib.crc32(f'{buyer}|{supplier}'.encode()) % 1_000_000:06d}",
+            "quantity": f"{quantity:.0f}",
+        })
+        return record
 
+
+def rate_multiplier(profile: str, elapsed: float, progress: float) -> float:
+    """Scale factor applied to the target rate at a point of the run"""
+    if profile == "ramp":
+        # 10% of target at the start up to 190% at the end (average ~ target)
+        return 0.1 + 1.8 * progress
+    if profile == "burst":
+        in_burst = (elapsed % LOAD_BURST_PERIOD_SEC) < LOAD_BURST_PERIOD_SEC * LOAD_BURST_DUTY
+        return LOAD_BURST_FACTOR if in_burst else 1.0
+    return 1.0
+
+
+def generate_load(rate: float, total: int, profile: str, n_suppliers: int, seed: int):
+    """Emit `total` synthetic rows at `rate` rows/s shaped by `profile`, then report throughput"""
+    if profile not in ("steady", "ramp", "burst"):
+        raise ValueError(f"Unknown load profile: {profile} (expected steady, ramp or burst)")
+    if not MASTER_FILE.exists():
+        raise FileNotFoundError(f"Master CSV not found: {MASTER_FILE}")
+
+    with MASTER_FILE.open(newline="", encoding="utf-8") as f:
+        reader = csv.DictReader(f)
+        rows = list(reader)
+        fieldnames = reader.fieldnames
+
+    synthesizer = RecordSynthesizer(rows, n_suppliers, seed)
+    writers = open_writers(fieldnames)
+
+    print("🏋️ Load generator started")
+    print(
+        f"🎯 target={rate:.0f} rows/s | total={total} | profile={profile} | "
+        f"suppliers={len(synthesizer.suppliers)} | format={STREAM_FORMAT} | "
+        f"destinations={len(writers)}"
+    )
+
+    sent = 0
+    credit = 0.0
+    start = last_tick = last_report = time.monotonic()
+    reported = 0
+
+    while sent < total:
+        now = time.monotonic()
+        credit += rate * rate_multiplier(profile, now - start, sent / total) * (now - last_tick)
+        last_tick = now
+
+        due = min(int(credit), total - sent)
+        if due:
+            for _ in range(due):
+                record = synthesizer.next_record()
+                for writer in writers:
+                    writer.write(record)
+            for writer in writers:
+                writer.flush()
+            credit -= due
+            sent += due
+
+        if now - last_report >= LOAD_REPORT_SEC:
+            window_rate = (sent - reported) / (now - last_report)
+            print(f"📈 {sent}/{total} rows | {window_rate:.0f} rows/s (last {LOAD_REPORT_SEC}s)")
+            last_report, reported = now, sent
+
+        time.sleep(LOAD_TICK_SEC)
+
+    for writer in writers:
+        writer.close()
+
+    elapsed = time.monotonic() - start
+    achieved = sent / elapsed if elapsed else 0.0
+    print(
+        f"✅ Load complete | rows={sent} | elapsed={elapsed:.1f}s | "
+        f"achieved={achieved:.0f} rows/s | target={rate:.0f} rows/s "
+        f"({achieved / rate * 100:.0f}%)"
+    )
+    return {"rows": sent, "elapsed_sec": elapsed, "achieved_rows_per_sec": achieved}
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Supply chain stream simulator")
+    parser.add_argument(
+        "--mode", choices=["replay", "load"], default=os.getenv("SIMULATOR_MODE", "replay"),
+        help="replay: first 50 master rows every INTERVAL_SEC; load: synthetic rows at a target rate",
+    )
+    parser.add_argument("--rate", type=float, default=LOAD_RATE, help="target rows per second")
+    parser.add_argument("--total", type=int, default=LOAD_TOTAL, help="rows to emit")
+    parser.add_argument(
+        "--profile", choices=["steady", "ramp", "burst"], default=LOAD_PROFILE,
+        help="steady rate, linear ramp, or periodic bursts of LOAD_BURST_FACTOR x rate",
+    )
+    parser.add_argument(
+        "--suppliers", type=int, default=LOAD_SUPPLIERS,
+        help="number of distinct suppliers to synthesize (0 = master suppliers only)",
+    )
+    parser.add_argument("--seed", type=int, default=42, help="random seed for reproducible runs")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.mode == "load":
+        generate_load(args.rate, args.total, args.profile, args.suppliers, args.seed)
+    else:
+        simulate_stream()